@@ -0,0 +1,80 @@
+"""
+IsolationForest lifecycle for the voltage anomaly detector
+Models are fitted on a bounded reference sample, stored per machine under a
+key of the feature set and parameters, and reused to score new rows until
+the features drift away from the reference
+"""
+
+import hashlib
+import json
+import os
+
+import joblib
+import numpy as np
+
+FEATURES = ['voltage', 'voltage_deviation', 'voltage_rolling_std', 'current_voltage_ratio']
+MAX_SAMPLES = 50_000
+DRIFT_THRESHOLD = 1.0
+
+
+def reference_sample(X, max_samples=MAX_SAMPLES, seed=42):
+    """Up to `max_samples` rows of X, drawn uniformly and kept in time order"""
+    if len(X) <= max_samples:
+        return X
+    rows = np.random.default_rng(seed).choice(len(X), max_samples, replace=False)
+    return X[np.sort(rows)]
+
+
+class AnomalyModel:
+    """A fitted IsolationForest plus the feature statistics of its reference sample
+
+    The anomaly threshold is the forest's offset_, the contamination quantile
+    of the reference scores, exactly as IsolationForest.predict applies it.
+    """
+
+    def __init__(self, reference, contamination=0.005, n_estimators=100, random_state=42, n_jobs=-1):
+        # Imported on first fit: runs served from stored models or the result cache skip it
+        from sklearn.ensemble import IsolationForest
+
+        reference = np.asarray(reference)
+        self.forest = IsolationForest(contamination=contamination, n_estimators=n_estimators,
+                                      random_state=random_state, n_jobs=n_jobs).fit(reference)
+        self.mean = reference.mean(axis=0)
+        self.std = reference.std(axis=0)
+
+    def score(self, X):
+        """Scores and anomaly mask of X in a single scoring pass"""
+        scores = self.forest.score_samples(np.asarray(X))
+        return scores, scores < self.forest.offset_
+
+    def drift(self, mean):
+        """Largest shift of the feature means from the reference, in reference standard deviations"""
+        std = np.where(self.std > 0, self.std, 1.0)
+        return float(np.max(np.abs(np.asarray(mean) - self.mean) / std))
+
+
+class ModelStore:
+    """Fitted models on disk, one file per machine and parameter set
+
+    The file name carries a hash of the feature list and the parameters, so
+    changing either trains (and stores) a new model instead of reusing one.
+    """
+
+    def __init__(self, directory, **params):
+        self.directory = directory
+        self.params = params
+        key = json.dumps({'features': FEATURES, **params}, sort_keys=True)
+        self.key = hashlib.sha1(key.encode()).hexdigest()[:12]
+
+    def path(self, machine_id):
+        return os.path.join(self.directory, f"{machine_id}-{self.key}.joblib")
+
+    def load(self, machine_id):
+        path = self.path(machine_id)
+        return joblib.load(path) if os.path.exists(path) else None
+
+    def save(self, machine_id, model):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(machine_id)
+        joblib.dump(model, path + '.tmp')
+        os.replace(path + '.tmp', path)
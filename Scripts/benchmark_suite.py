@@ -0,0 +1,287 @@
+"""
+Offline benchmark suite
+Generates deterministic datasets of increasing size, times generation, loading,
+every detector and saving, stores the results per commit as JSON and compares
+two result files, flagging stages that got slower or bigger than a threshold
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import energy_data_generator
+import generate_energy_data
+from energy_analyzer import DETECTORS, REFERENCE_MACHINES, EnergyMLAnalyzer
+from profiling import Profiler
+
+# Dataset sizes: days x machines at `interval` seconds (analyzer data); the
+# consumption generator uses the same days and machines at 15 minutes. Every
+# size has at least 16 machines, so the reference machines up to Machine_15 exist
+SIZES = {
+    'tiny': {'days': 1, 'machines': 16, 'interval': 30},      # 46,080 rows
+    'small': {'days': 7, 'machines': 20, 'interval': 10},     # 1.2M rows
+    'medium': {'days': 30, 'machines': 100, 'interval': 60},  # 4.3M rows
+    'fleet': {'days': 7, 'machines': 500, 'interval': 60},    # 5.0M rows (loaded as a 10% sample)
+    'year': {'days': 365, 'machines': 20, 'interval': 60},    # 10.5M rows (loaded as a 10% sample)
+}
+DEFAULT_SIZES = ['tiny', 'small']
+CONSUMPTION_INTERVAL_MINUTES = 15
+SEED = 2025
+RESULTS_DIR = 'benchmark_results'
+THRESHOLD = 0.10      # relative change that counts as a regression
+MIN_DELTA_S = 0.05    # ignore timing changes below this (noise on short stages)
+MIN_DELTA_MB = 5.0
+
+
+def git_revision(path='.'):
+    """Short commit hash of the checkout, with '-dirty' for uncommitted changes"""
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=path, capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        commit = git('rev-parse', '--short', 'HEAD')
+        dirty = bool(git('status', '--porcelain', '--untracked-files=no'))
+        branch = git('rev-parse', '--abbrev-ref', 'HEAD')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', None
+    return commit + ('-dirty' if dirty else ''), branch
+
+
+def environment():
+    import scipy
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.node(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scipy': scipy.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def run_size(size, data_dir, profiler, seed=SEED):
+    """One pass over a dataset size: generate both datasets, load, run every detector, save"""
+    spec = SIZES[size]
+    data_file = os.path.join(data_dir, f"{size}.csv")
+
+    generator = energy_data_generator.EnergyDataGenerator(spec['machines'], spec['days'], spec['interval'],
+                                                          seed=seed)
+    with profiler.stage('energy_data_generator', generator.total_samples * generator.num_machines):
+        generator.generate_data(data_file)
+
+    consumption = generate_energy_data.EnergyDataGenerator('2024-01-01', spec['days'], CONSUMPTION_INTERVAL_MINUTES,
+                                                           spec['machines'], engine='vectorized', seed=seed)
+    consumption_file = os.path.join(data_dir, f"{size}_consumption.csv")
+    with profiler.stage('generate_energy_data') as stage:
+        stage['rows'] = consumption.save(consumption.iter_chunks(), consumption_file).total_records
+    os.remove(consumption_file)
+
+    analyzer = EnergyMLAnalyzer(data_file)
+    with profiler.stage('_load_data_smart') as stage:
+        analyzer._df = analyzer._load_data_smart(analyzer.chunk_size)
+        stage['rows'] = len(analyzer._df)
+    for name, (method, _) in DETECTORS.items():
+        if name == 'peak':
+            with profiler.stage(method, len(analyzer.df)):
+                getattr(analyzer, method)()
+        else:
+            machine_id = REFERENCE_MACHINES[name]
+            with profiler.stage(method, analyzer._machine_rows([machine_id])):
+                getattr(analyzer, method)(machine_id)
+    with profiler.stage('save_results'):
+        analyzer.save_results(os.path.join(data_dir, f"{size}_results.json"))
+
+
+def summarize(timing_runs, memory_run=None):
+    """Median time per stage over the timing runs, plus the traced peak of the memory run"""
+    summary = {}
+    for stage in timing_runs[0]:
+        records = [run[stage] for run in timing_runs]
+        wall = statistics.median(r['wall_s'] for r in records)
+        rows = records[0]['rows']
+        summary[stage] = {
+            'wall_s': wall,
+            'wall_min_s': min(r['wall_s'] for r in records),
+            'cpu_s': statistics.median(r['cpu_s'] for r in records),
+            'rows': rows,
+            'rows_per_s': rows / wall if rows and wall > 0 else None,
+            'peak_rss_mb': max(r['peak_rss_mb'] for r in records),
+        }
+        if memory_run is not None:
+            summary[stage]['traced_mb'] = memory_run[stage]['traced_mb']
+    return summary
+
+
+def run_suite(sizes, data_dir, repeat=3, trace_memory=True, seed=SEED, verbose=False):
+    results = {}
+    for size in sizes:
+        runs = []
+        for run in range(repeat + trace_memory):
+            traced = run == repeat  # the extra run measures memory; tracemalloc would distort its timings
+            profiler = Profiler(trace_memory=traced)
+            print(f"   {size}: {'memory' if traced else f'timing {run + 1}/{repeat}'}...", flush=True)
+            with open(os.devnull, 'w') as devnull, contextlib.ExitStack() as quiet:
+                if not verbose:
+                    quiet.enter_context(contextlib.redirect_stdout(devnull))
+                    quiet.enter_context(contextlib.redirect_stderr(devnull))
+                run_size(size, data_dir, profiler, seed)
+            if traced:
+                # Later profilers must not inherit the tracing overhead
+                import tracemalloc
+                tracemalloc.stop()
+            runs.append({r['stage']: r for r in profiler.timings()['stages']})
+        results[size] = summarize(runs[:repeat], runs[repeat] if trace_memory else None)
+    return results
+
+
+def compare(baseline, current, threshold=THRESHOLD, min_delta_s=MIN_DELTA_S, min_delta_mb=MIN_DELTA_MB):
+    """Stage-by-stage changes of the median wall time and traced peak memory
+
+    A change counts as a regression (or an improvement) when it exceeds both
+    the relative threshold and the absolute minimum, so short stages do not
+    flag on timer noise. Returns a list of rows sorted by size and stage.
+    """
+    rows = []
+    for size in [s for s in current['results'] if s in baseline['results']]:
+        before, after = baseline['results'][size], current['results'][size]
+        for stage in [s for s in after if s in before]:
+            for metric, min_delta in (('wall_s', min_delta_s), ('traced_mb', min_delta_mb)):
+                old, new = before[stage].get(metric), after[stage].get(metric)
+                if old is None or new is None:
+                    continue
+                change = (new - old) / old if old > 0 else 0.0
+                status = 'ok'
+                if abs(new - old) >= min_delta and abs(change) > threshold:
+                    status = 'REGRESSION' if new > old else 'improved'
+                rows.append({'size': size, 'stage': stage, 'metric': metric, 'baseline': old, 'current': new,
+                             'change': change, 'status': status})
+    return rows
+
+
+def report(baseline, current, rows):
+    lines = [f"Baseline {baseline['commit']} ({baseline['time']}) -> current {current['commit']} ({current['time']})"]
+    if baseline['environment'] != current['environment']:
+        changed = sorted(k for k in current['environment'] if baseline['environment'].get(k) != current['environment'][k])
+        lines.append(f"⚠️  Different environment ({', '.join(changed)}) - differences may not come from the code")
+    lines.append(f"{'Size':<8} {'Stage':<28} {'Metric':<10} {'Baseline':>10} {'Current':>10} {'Change':>8}  Status")
+    for r in rows:
+        lines.append(f"{r['size']:<8} {r['stage']:<28} {r['metric']:<10} {r['baseline']:>10.3f} {r['current']:>10.3f} "
+                     f"{r['change']:>+8.1%}  {r['status']}")
+    regressions = sum(r['status'] == 'REGRESSION' for r in rows)
+    lines.append(f"{regressions} regression(s), {sum(r['status'] == 'improved' for r in rows)} improvement(s)")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark data generation, loading and every detector on deterministic datasets',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Default sizes (tiny, small), results in benchmark_results/<commit>.json
+  python benchmark_suite.py
+
+  # Every size, then compare against an earlier commit (exit code 1 on regressions)
+  python benchmark_suite.py --sizes all --baseline benchmark_results/1a2b3c4.json
+
+  # Compare two stored runs without benchmarking
+  python benchmark_suite.py --compare benchmark_results/1a2b3c4.json benchmark_results/5d6e7f8.json
+""")
+    parser.add_argument('--sizes', type=str, default=','.join(DEFAULT_SIZES),
+                        help=f"Comma-separated dataset sizes, or 'all' ({', '.join(SIZES)})")
+    parser.add_argument('--repeat', type=int, default=3, help='Timing runs per size; the median is reported')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the extra run that measures peak allocations per stage with tracemalloc')
+    parser.add_argument('--seed', type=int, default=SEED, help='Seed of the generated datasets')
+    parser.add_argument('--data-dir', type=str, default=None,
+                        help='Keep the generated datasets here (default: a temporary directory, removed afterwards)')
+    parser.add_argument('--results-dir', type=str, default=RESULTS_DIR, help='Where <commit>.json is written')
+    parser.add_argument('--baseline', type=str, default=None, help='Result file to compare this run against')
+    parser.add_argument('--compare', type=str, nargs=2, default=None, metavar=('BASELINE', 'CURRENT'),
+                        help='Compare two result files and exit')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='Relative slowdown or memory growth flagged as a regression (0.10 = 10%%)')
+    parser.add_argument('--report', type=str, default=None, help='Also write the comparison report to this file')
+    parser.add_argument('--verbose', action='store_true', help='Show the output of the generators and the analyzer')
+
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+    else:
+        sizes = list(SIZES) if args.sizes == 'all' else args.sizes.split(',')
+        unknown = [size for size in sizes if size not in SIZES]
+        if unknown:
+            parser.error(f"unknown sizes {unknown}, choose from {list(SIZES)}")
+
+        commit, branch = git_revision(os.path.dirname(os.path.abspath(__file__)))
+        print(f"\n⏱️  Benchmarking {commit} on {', '.join(sizes)} ({args.repeat} timing run(s) per size)")
+        data_dir = args.data_dir or tempfile.mkdtemp(prefix='energy_benchmark_')
+        os.makedirs(data_dir, exist_ok=True)
+        started = time.time()
+        try:
+            results = run_suite(sizes, data_dir, args.repeat, not args.no_memory, args.seed, args.verbose)
+        finally:
+            if args.data_dir is None:
+                shutil.rmtree(data_dir, ignore_errors=True)
+
+        current = {
+            'commit': commit,
+            'branch': branch,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+            'duration_s': time.time() - started,
+            'environment': environment(),
+            'settings': {'repeat': args.repeat, 'seed': args.seed, 'sizes': {size: SIZES[size] for size in sizes}},
+            'results': results,
+        }
+        os.makedirs(args.results_dir, exist_ok=True)
+        output = os.path.join(args.results_dir, f"{commit}.json")
+        if os.path.exists(output):
+            # Sizes benchmarked earlier on the same commit are kept, unless run again
+            with open(output) as f:
+                previous = json.load(f)
+            if previous['environment'] == current['environment']:
+                current['settings']['sizes'] = dict(previous['settings']['sizes'], **current['settings']['sizes'])
+                current['results'] = dict(previous['results'], **results)
+        with open(output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+        print(f"\n{'Size':<8} {'Stage':<28} {'Wall s':>8} {'CPU s':>8} {'Rows/s':>12} {'Traced MB':>10}")
+        for size, stages in results.items():
+            for stage, r in stages.items():
+                print(f"{size:<8} {stage:<28} {r['wall_s']:>8.3f} {r['cpu_s']:>8.3f} {r['rows_per_s'] or 0:>12,.0f} "
+                      f"{r.get('traced_mb', float('nan')):>10.1f}")
+        print(f"\n💾 Results saved to {output}")
+
+        if args.baseline is None:
+            return
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    rows = compare(baseline, current, args.threshold)
+    text = report(baseline, current, rows)
+    print(f"\n{text}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(text + '\n')
+    if any(r['status'] == 'REGRESSION' for r in rows):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
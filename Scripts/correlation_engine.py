@@ -0,0 +1,140 @@
+"""
+Machine-to-machine correlation for the fleet-level analyses
+Pearson correlation from masked cross-products accumulated over timestamp
+chunks, reduced to the average, the pairs above a threshold and the
+strongest pairs. Large fleets are processed in machine blocks, so the full
+machines x machines matrix never has to exist.
+"""
+
+import numpy as np
+from scipy import sparse
+
+BLOCK_MACHINES = 1024   # fleets above this size are correlated block by block
+TOP_PAIRS = 20
+
+
+def column_shifts(values, block_rows=100_000):
+    """First value of each column of a (timestamps x machines) array, NaN if it has none"""
+    shift = np.full(values.shape[1], np.nan)
+    for i in range(0, len(values), block_rows):
+        unset = np.isnan(shift)
+        if not unset.any():
+            break
+        chunk = np.asarray(values[i:i + block_rows], dtype=np.float64)
+        found = unset & ~np.isnan(chunk).all(axis=0)
+        first = (~np.isnan(chunk[:, found])).argmax(axis=0)
+        shift[found] = chunk[first, np.flatnonzero(found)]
+    return shift
+
+
+def block_correlation(values, rows, cols, shift=None, block_rows=100_000):
+    """Correlation of machine columns `rows` against `cols`
+
+    Each pair uses only the timestamps where both machines have a value
+    (NaN marks a missing one), like DataFrame.corr() on a pivot. The sums
+    are accumulated over chunks of `block_rows` timestamps, with every
+    column shifted by its first value to keep them well conditioned.
+    """
+    shift = column_shifts(values, block_rows) if shift is None else shift
+    shape = (len(rows), len(cols))
+    n, sx, sy, sxx, syy, sxy = (np.zeros(shape) for _ in range(6))
+    for i in range(0, len(values), block_rows):
+        a = np.asarray(values[i:i + block_rows, rows], dtype=np.float64)
+        b = a if cols is rows else np.asarray(values[i:i + block_rows, cols], dtype=np.float64)
+        ma, mb = ~np.isnan(a), ~np.isnan(b)
+        xa = np.where(ma, a - np.nan_to_num(shift[rows]), 0.0)
+        xb = np.where(mb, b - np.nan_to_num(shift[cols]), 0.0)
+        ma, mb = ma.astype(np.float64), mb.astype(np.float64)
+        n += ma.T @ mb
+        sx += xa.T @ mb
+        sy += ma.T @ xb
+        sxx += (xa * xa).T @ mb
+        syy += ma.T @ (xb * xb)
+        sxy += xa.T @ xb
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (n * sxx - sx * sx) * (n * syy - sy * sy)
+        corr = (n * sxy - sx * sy) / np.sqrt(variance)
+    corr[(n < 2) | ~(variance > 0)] = np.nan
+    return corr
+
+
+class PairSummary:
+    """Running reduction of correlation blocks over distinct machine pairs
+
+    Keeps the pair count and sum for the average, the number of pairs with
+    |r| > threshold, the top_k strongest pairs and, optionally, every pair
+    above the threshold as a sparse matrix.
+    """
+
+    def __init__(self, threshold=0.5, top_k=TOP_PAIRS, keep_pairs=False):
+        self.threshold = threshold
+        self.top_k = top_k
+        self.count = 0
+        self.total = 0.0
+        self.above = 0
+        self.top = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+        self.pairs = [] if keep_pairs else None
+
+    def add(self, corr, rows, cols, diagonal=False):
+        # diagonal: rows and cols are the same machines; only the upper triangle counts
+        defined = ~np.isnan(corr)
+        if diagonal:
+            defined &= np.triu(np.ones(corr.shape, dtype=bool), k=1)
+        i, j = np.nonzero(defined)
+        r = corr[i, j]
+        i, j = np.asarray(rows)[i], np.asarray(cols)[j]
+        self.count += len(r)
+        self.total += r.sum()
+        strong = np.abs(r) > self.threshold
+        self.above += int(strong.sum())
+        if self.pairs is not None:
+            self.pairs.append((i[strong], j[strong], r[strong]))
+
+        ti, tj, tr = (np.concatenate((kept, new)) for kept, new in zip(self.top, (i, j, r)))
+        if len(tr) > self.top_k:
+            keep = np.argpartition(-np.abs(tr), self.top_k)[:self.top_k]
+            ti, tj, tr = ti[keep], tj[keep], tr[keep]
+        self.top = (ti, tj, tr)
+
+    def result(self, machines):
+        ti, tj, tr = self.top
+        order = np.lexsort((tj, ti, -np.abs(tr)))
+        return {
+            'average': self.total / self.count if self.count else np.nan,
+            'above_threshold': self.above,
+            'top_pairs': [[machines[ti[k]], machines[tj[k]], float(tr[k])] for k in order],
+        }
+
+    def sparse_pairs(self, size):
+        """Pairs above the threshold as a (machines x machines) upper-triangular COO matrix"""
+        i, j, r = (np.concatenate(parts) for parts in zip(*self.pairs)) if self.pairs else ([], [], [])
+        return sparse.coo_matrix((r, (i, j)), shape=(size, size))
+
+
+def summarize_matrix(corr, threshold=0.5, top_k=TOP_PAIRS):
+    """PairSummary of a full correlation matrix"""
+    summary = PairSummary(threshold, top_k)
+    everyone = np.arange(corr.shape[0])
+    summary.add(corr, everyone, everyone, diagonal=True)
+    return summary
+
+
+def correlation_summary(values, threshold=0.5, top_k=TOP_PAIRS, block_machines=None, keep_pairs=False,
+                        block_rows=100_000):
+    """PairSummary of all machine pairs of a (timestamps x machines) array
+
+    With more machines than `block_machines` (default BLOCK_MACHINES), the
+    upper triangle is computed one pair of machine blocks at a time, so
+    memory grows with the block size instead of the fleet size squared.
+    """
+    size = values.shape[1]
+    block = block_machines or BLOCK_MACHINES
+    shift = column_shifts(values, block_rows)
+    summary = PairSummary(threshold, top_k, keep_pairs)
+    starts = range(0, size, block)
+    for a in starts:
+        rows = np.arange(a, min(a + block, size))
+        for b in starts[a // block:]:
+            cols = rows if a == b else np.arange(b, min(b + block, size))
+            summary.add(block_correlation(values, rows, cols, shift, block_rows), rows, cols, diagonal=a == b)
+    return summary
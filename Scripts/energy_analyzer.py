@@ -1,233 +1,1231 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import IsolationForest
-from scipy import stats
-from scipy.signal import find_peaks
-from scipy.fft import fft, fftfreq
 import json
+import os
+import pickle
+import copy
 import argparse
+from contextlib import nullcontext
+from energy_streaming import (CorrelationAccumulator, LagCorrelation, Moments, RegressionAccumulator,
+                              ReservoirSample, RollingWindow, csv_end_offset, file_fingerprint, iter_csv_chunks)
+from anomaly_models import DRIFT_THRESHOLD, FEATURES, MAX_SAMPLES, AnomalyModel, ModelStore, reference_sample
+from correlation_engine import summarize_matrix
+from fleet_matrix import FleetMatrix
+from profiling import Profiler
+from result_cache import CACHE_DIR, MAX_CACHE_BYTES, ResultCache, input_fingerprint
+from rolling_features import FeatureEngine
+from spectral_analysis import (HARMONIC_ORDERS, MAX_LAG, SEGMENT_SECONDS, WINDOW_SECONDS, autocorrelation,
+                               dominant_periods, harmonic_content, sample_interval, window_sizes, window_spectra)
 import warnings
 warnings.filterwarnings('ignore')
 
+# Detector name -> (method, columns it reads besides machineId/timestamp);
+# the loader only parses the columns of the selected detectors
+DETECTORS = {
+    'anomalies': ('detect_voltage_anomalies', ['voltage', 'current']),
+    'degradation': ('detect_degradation_trend', ['current', 'powerFactor']),
+    'harmonics': ('detect_harmonics', ['current', 'powerFactor']),
+    'imbalance': ('detect_phase_imbalance', ['current']),
+    'peak': ('optimize_peak_load', ['power']),
+}
+KEY_COLUMNS = ['machineId', 'timestamp']
+COLUMN_DTYPES = {
+    'machineId': 'category',
+    'machineType': 'category',
+    'voltage': 'float32',
+    'current': 'float32',
+    'power': 'float32',
+    'powerFactor': 'float32',
+}
+SAMPLE_THRESHOLD = 5_000_000
+SPECTRAL_BATCH_VALUES = 16_000_000
+CHECKPOINT_VERSION = 4
+AUTOCORR_LAGS = [100, 250, 500, 1000]
+REFERENCE_MACHINES = {
+    'anomalies': 'Machine_05',
+    'degradation': 'Machine_12',
+    'harmonics': 'Machine_08',
+    'imbalance': 'Machine_15',
+}
+# Data each detector reads: one machine's rows, or the timestamp x machine fleet
+# matrix. Detectors only read their input, so the reference run executes them
+# concurrently
+DETECTOR_INPUTS = {
+    'anomalies': 'machine',
+    'degradation': 'machine',
+    'harmonics': 'machine',
+    'imbalance': 'machine',
+    'peak': 'fleet',
+}
+
+# Per-machine detectors: pure functions of one machine's rows (time-ordered),
+# returning (result dict, frame) so they also run in worker processes
+
+def voltage_anomalies(machine_data, contamination=0.005, max_samples=MAX_SAMPLES, model_dir=None, machine_id=None,
+                      retrain=False, n_jobs=-1, features=None):
+    voltage = (features or FeatureEngine()).rolling(machine_id, machine_data, 'voltage', 10,
+                                                     ('mean', 'std', 'deviation'))
+    machine_data = machine_data.assign(voltage_rolling_mean=voltage['mean'], voltage_rolling_std=voltage['std'],
+                                       voltage_deviation=voltage['deviation'],
+                                       current_voltage_ratio=machine_data['current'] / machine_data['voltage'])
+    
+    X = machine_data[FEATURES].fillna(0).to_numpy()
+    
+    # A stored model is reused unless retraining is requested or the features drifted;
+    # either way every row is scored once
+    store = ModelStore(model_dir, contamination=contamination, max_samples=max_samples) if model_dir else None
+    model = store.load(machine_id) if store and not retrain else None
+    if model is None or model.drift(X.mean(axis=0)) > DRIFT_THRESHOLD:
+        model = AnomalyModel(reference_sample(X, max_samples), contamination, n_jobs=n_jobs)
+        if store:
+            store.save(machine_id, model)
+    scores, flagged = model.score(X)
+    
+    machine_data['anomaly'] = np.where(flagged, -1, 1)
+    machine_data['anomaly_score'] = scores
+    anomalies = machine_data[machine_data['anomaly'] == -1]
+    
+    return {
+        'total_anomalies': len(anomalies),
+        'anomaly_rate': len(anomalies)/len(machine_data)*100,
+        'anomalies': anomalies[['timestamp', 'voltage', 'current', 'anomaly_score']].head(100).to_dict('records')
+    }, anomalies
+
+def degradation_trend(machine_data, window_size=1000, machine_id=None, features=None):
+    moving = (features or FeatureEngine()).compute(machine_id, machine_data,
+                                                   {'current': [window_size], 'powerFactor': [window_size]}, ('mean',))
+    machine_data = machine_data.reset_index(drop=True).assign(current_ma=moving['current', window_size]['mean'],
+                                                              pf_ma=moving['powerFactor', window_size]['mean'])
+    
+    x = np.arange(len(machine_data))
+    mask = ~np.isnan(machine_data['current_ma'].values)
+    
+    if mask.sum() >= 2:
+        current_slope, _ = np.polyfit(x[mask], machine_data['current_ma'].values[mask], 1)
+        pf_slope, _ = np.polyfit(x[mask], machine_data['pf_ma'].values[mask], 1)
+    else:
+        current_slope, pf_slope = 0, 0
+    
+    return degradation_summary(
+        machine_data['current_ma'].iloc[window_size:window_size+100].mean(),
+        machine_data['current_ma'].iloc[-100:].mean(),
+        machine_data['pf_ma'].iloc[window_size:window_size+100].mean(),
+        machine_data['pf_ma'].iloc[-100:].mean(),
+        current_slope, pf_slope
+    ), machine_data
+
+# Result builders shared by the in-memory detectors and the out-of-core mode
+
+def degradation_summary(initial_current, final_current, initial_pf, final_pf, current_slope, pf_slope):
+    current_change = (final_current - initial_current) / initial_current * 100
+    pf_change = (final_pf - initial_pf) / initial_pf * 100
+    
+    if current_change > 10 and pf_change < -5:
+        severity = "CRITICAL"
+    elif current_change > 7 or pf_change < -4:
+        severity = "WARNING"
+    else:
+        severity = "NORMAL"
+    
+    return {
+        'current_change_percent': current_change,
+        'power_factor_change_percent': pf_change,
+        'severity': severity,
+        'current_trend_slope': current_slope,
+        'pf_trend_slope': pf_slope
+    }
+
+def harmonics(machine_data, window=WINDOW_SECONDS, segment=SEGMENT_SECONDS):
+    interval = sample_interval(machine_data['timestamp'].values)
+    freqs, psd, window_n = harmonic_spectra(machine_data['current'].values[None], interval, window, segment)
+    power_factor = machine_data['powerFactor'].values.mean(dtype=np.float64)
+    return harmonics_summary(freqs, psd[0], power_factor, machine_data['timestamp'].iloc[0],
+                             interval, window_n), machine_data
+
+def harmonic_spectra(currents, interval, window=WINDOW_SECONDS, segment=SEGMENT_SECONDS):
+    # currents: (machines, samples); a history shorter than one window is
+    # analyzed as a single window
+    window_n, segment_n = window_sizes(interval, window, segment)
+    window_n = min(window_n, currents.shape[1])
+    freqs, psd = window_spectra(currents, window_n, min(segment_n, window_n), interval)
+    return freqs, psd, window_n
+
+def harmonics_summary(freqs, psd, power_factor, start, interval, window_n):
+    # psd: (windows, bins) of one machine; THD per window against its
+    # load-cycle fundamental, dominant harmonics from the mean spectrum
+    fundamentals, thd, _ = harmonic_content(freqs, psd)
+    fundamental, _, amplitudes = harmonic_content(freqs, psd.mean(axis=0))
+    thd_percent = float(np.median(thd))
+    
+    severity = "CRITICAL" if thd_percent > 15 else "WARNING" if thd_percent > 10 else "NORMAL"
+    top = np.argsort(amplitudes)[::-1][:5]
+    
+    return {
+        'thd_percent': thd_percent,
+        'power_factor': power_factor,
+        'severity': severity,
+        'dominant_harmonics': [[int(HARMONIC_ORDERS[i]), float(amplitudes[i])] for i in top],
+        'fundamental_hz': float(fundamental),
+        'sample_interval_s': interval,
+        'windows': [{'start': start + pd.Timedelta(seconds=k * window_n * interval), 'thd_percent': t,
+                     'fundamental_hz': f} for k, (t, f) in enumerate(zip(thd.tolist(), fundamentals.tolist()))]
+    }
+
+def phase_imbalance(machine_data, max_lag=MAX_LAG):
+    # Every lag up to max_lag from one FFT of the current
+    acf = autocorrelation(machine_data['current'].values[None], max_lag)[0]
+    interval = sample_interval(machine_data['timestamp'].values)
+    return imbalance_summary(*current_spread(machine_data['current'].values), acf, len(machine_data),
+                             interval), machine_data
+
+def current_spread(current):
+    # Coefficient of variation and range, in float64 like the streamed moments
+    current = np.asarray(current, dtype=np.float64)
+    return current.std(ddof=1) / current.mean(), current.max() - current.min()
+
+def imbalance_summary(cv, current_range, acf, samples, interval):
+    # acf: autocorrelation at lags 0..max_lag; AUTOCORR_LAGS are reported
+    # as before, the strongest periodicities as dominant periods
+    severity = "CRITICAL" if cv > 0.15 else "WARNING" if cv > 0.10 else "NORMAL"
+    autocorrs = {lag: float(acf[lag]) for lag in AUTOCORR_LAGS if lag < min(samples, len(acf))}
+    
+    return {
+        'coefficient_of_variation': cv,
+        'current_range': current_range,
+        'severity': severity,
+        'autocorrelations': autocorrs,
+        'dominant_periods': dominant_periods(acf, interval),
+        'sample_interval_s': interval,
+        'autocorrelation_function': acf.tolist()
+    }
+
+def peak_load_summary(peak_load, average_load, correlation):
+    # correlation: PairSummary result over the machine pairs (correlation_engine)
+    avg_corr = correlation['average']
+    
+    if avg_corr < 0.3:
+        potential = 'LOW'
+    elif avg_corr < 0.6:
+        potential = 'MEDIUM'
+    else:
+        potential = 'HIGH'
+    
+    return {
+        'peak_load_kw': peak_load,
+        'average_load_kw': average_load,
+        'peak_average_ratio': peak_load/average_load,
+        'average_correlation': avg_corr,
+        'highly_correlated_pairs': correlation['above_threshold'],
+        'top_correlated_pairs': correlation['top_pairs'],
+        'optimization_potential': potential
+    }
+
+# Detector name -> (function, results key) for the per-machine detectors
+MACHINE_DETECTORS = {
+    'anomalies': (voltage_anomalies, 'voltage_anomalies'),
+    'degradation': (degradation_trend, 'degradation'),
+    'harmonics': (harmonics, 'harmonics'),
+    'imbalance': (phase_imbalance, 'phase_imbalance'),
+}
+# Run over whole batches of machines instead of machine by machine
+FLEET_BATCHED = ('harmonics', 'imbalance')
+RESULT_KEYS = dict({name: key for name, (_, key) in MACHINE_DETECTORS.items()}, peak='peak_load_optimization')
+# Parameters that change a detector's output; part of its result cache key
+CACHE_PARAMS = {
+    'anomalies': {'contamination': 0.005, 'window': 10},
+    'degradation': {'window_size': 1000},
+    'harmonics': {'window': WINDOW_SECONDS, 'segment': SEGMENT_SECONDS},
+    'imbalance': {'max_lag': MAX_LAG},
+    'peak': {'threshold': 0.5},
+}
+
+# Detectors built on rolling features; they share one FeatureEngine per machine
+FEATURE_DETECTORS = ('anomalies', 'degradation')
+
+def analyze_machine(machine_data, detectors, options=None):
+    # options: detector -> extra keyword arguments
+    options = options or {}
+    features = FeatureEngine()
+    results = {}
+    for name in detectors:
+        if name in MACHINE_DETECTORS:
+            kwargs = dict(options.get(name, {}), features=features) if name in FEATURE_DETECTORS else options.get(name, {})
+            results[MACHINE_DETECTORS[name][1]] = MACHINE_DETECTORS[name][0](machine_data, **kwargs)[0]
+    return results
+
+def machine_options(anomaly_options, machine_id):
+    return {'anomalies': dict(anomaly_options, machine_id=machine_id), 'degradation': {'machine_id': machine_id}}
+
+# Fleet mode workers read the column arrays from memory-mapped .npy files
+_worker_columns = None
+_worker_offsets = None
+_worker_detectors = None
+_worker_anomaly_options = None
+
+def _init_fleet_worker(column_files, offsets, detectors, anomaly_options):
+    global _worker_columns, _worker_offsets, _worker_detectors, _worker_anomaly_options
+    _worker_columns = {name: np.load(path, mmap_mode='r') for name, path in column_files.items()}
+    _worker_offsets = offsets
+    _worker_detectors = detectors
+    _worker_anomaly_options = anomaly_options
+
+def _analyze_machine_in_worker(machine_id):
+    start, stop = _worker_offsets[machine_id]
+    machine_data = pd.DataFrame({name: np.asarray(column[start:stop]) for name, column in _worker_columns.items()})
+    return machine_id, analyze_machine(machine_data, _worker_detectors,
+                                       machine_options(_worker_anomaly_options, machine_id))
+
+# Out-of-core mode: per-machine detector state fed chunk by chunk (see
+# energy_streaming); each state yields the same result dict as its detector.
+# States with second_pass_columns read the file a second time, once the
+# first pass has fitted their model. A state stays
+# pending until that second pass is done; after it, as in a resumed
+# incremental run, update() alone keeps the result current
+
+class _AnomalyState:
+    columns = ['timestamp', 'voltage', 'current']
+    second_pass_columns = ['timestamp', 'voltage', 'current']
+    
+    def __init__(self, contamination=0.005, max_samples=MAX_SAMPLES):
+        self.contamination = contamination
+        self.window = RollingWindow(10)
+        self.reservoir = ReservoirSample(max_samples)
+        self.model = None
+        self.fitted = False
+        self.rows = 0
+        self.total_anomalies = 0
+        self.anomalies = []
+        self.pending = True
+        self.begin_run()
+    
+    def use_model(self, model):
+        # A stored model scores rows as they stream, without a second pass
+        if model is not None:
+            self.model = model
+            self.pending = False
+    
+    def begin_run(self):
+        # Restore point for scoring this run's rows again with a refitted model
+        self.restore = (copy.deepcopy(self.window), self.rows, self.total_anomalies, len(self.anomalies))
+        self.run_sum = np.zeros(len(FEATURES))
+        self.run_rows = 0
+    
+    def _features(self, window, rows):
+        mean, std = window.update(rows['voltage'], with_std=True)
+        return np.column_stack([rows['voltage'], np.abs(rows['voltage'] - mean), np.nan_to_num(std),
+                                rows['current'] / rows['voltage']])
+    
+    def update(self, rows):
+        # Pass 1: training sample for the model; once fitted, new rows are
+        # scored right away
+        features = self._features(self.window, rows)
+        self.reservoir.update(features)
+        self.run_sum += features.sum(axis=0)
+        self.run_rows += len(features)
+        if not self.pending:
+            self._score(features, rows)
+    
+    def drifted(self):
+        return self.run_rows > 0 and self.model.drift(self.run_sum / self.run_rows) > DRIFT_THRESHOLD
+    
+    def begin_second_pass(self):
+        # Fit on the reservoir sample and score this run's rows from the restore point
+        window, self.rows, self.total_anomalies, kept = self.restore
+        self.window = copy.deepcopy(window)
+        self.anomalies = self.anomalies[:kept]
+        self.model = AnomalyModel(self.reservoir.sample(), self.contamination)
+        self.fitted = True
+    
+    def second_pass(self, rows):
+        # Pass 2: score every row
+        self._score(self._features(self.window, rows), rows)
+    
+    def _score(self, features, rows):
+        scores, flagged = self.model.score(features)
+        flagged = np.flatnonzero(flagged)
+        self.rows += len(scores)
+        self.total_anomalies += len(flagged)
+        for i in flagged[:max(0, 100 - len(self.anomalies))]:
+            self.anomalies.append({'timestamp': pd.Timestamp(rows['timestamp'][i]), 'voltage': rows['voltage'][i],
+                                   'current': rows['current'][i], 'anomaly_score': scores[i]})
+    
+    def result(self):
+        return {
+            'total_anomalies': self.total_anomalies,
+            'anomaly_rate': self.total_anomalies/self.rows*100,
+            'anomalies': self.anomalies
+        }
+
+class _DegradationState:
+    columns = ['current', 'powerFactor']
+    second_pass_columns = []
+    
+    def __init__(self, window_size=1000):
+        self.window_size = window_size
+        self.rows = 0
+        self.ma = {c: RollingWindow(window_size) for c in self.columns}
+        self.fit = {c: RegressionAccumulator() for c in self.columns}
+        self.initial = {c: [] for c in self.columns}
+        self.final = {c: np.empty(0) for c in self.columns}
+    
+    def update(self, rows):
+        n = len(rows['current'])
+        head = slice(max(0, self.window_size - self.rows), max(0, self.window_size + 100 - self.rows))
+        for c in self.columns:
+            ma, _ = self.ma[c].update(rows[c])
+            self.fit[c].update(ma)
+            self.initial[c].extend(ma[head])
+            self.final[c] = np.concatenate((self.final[c], ma))[-100:]
+        self.rows += n
+    
+    def result(self):
+        mean = lambda values: np.mean(values) if len(values) else np.nan
+        return degradation_summary(mean(self.initial['current']), mean(self.final['current']),
+                                   mean(self.initial['powerFactor']), mean(self.final['powerFactor']),
+                                   self.fit['current'].slope(), self.fit['powerFactor'].slope())
+
+class _HarmonicsState:
+    columns = ['timestamp', 'current', 'powerFactor']
+    second_pass_columns = []
+    
+    def __init__(self, window=WINDOW_SECONDS, segment=SEGMENT_SECONDS):
+        self.window = window
+        self.segment = segment
+        self.power_factor = Moments()
+        self.start = None
+        self.interval = None
+        self.timestamps = []
+        self.buffer = np.empty(0, dtype=np.float32)
+        self.freqs = None
+        self.psd = []
+    
+    def update(self, rows):
+        # Spectra of each full window; only the unfinished window is kept
+        self.power_factor.update(rows['powerFactor'])
+        self.buffer = np.concatenate((self.buffer, rows['current']))
+        if self.interval is None:
+            self.timestamps.extend(rows['timestamp'][:10_000 - len(self.timestamps)])
+            if self.start is None:
+                self.start = pd.Timestamp(self.timestamps[0])
+            if len(self.timestamps) < 10_000:
+                return
+            self._set_interval()
+        self._flush()
+    
+    def _set_interval(self):
+        self.interval = sample_interval(np.array(self.timestamps))
+        self.window_n, self.segment_n = window_sizes(self.interval, self.window, self.segment)
+        self.timestamps = []
+    
+    def _flush(self):
+        full = len(self.buffer) // self.window_n * self.window_n
+        if full:
+            self.freqs, psd = window_spectra(self.buffer[:full], self.window_n, self.segment_n, self.interval)
+            self.psd.append(psd[0])
+            self.buffer = self.buffer[full:]
+    
+    def result(self):
+        if self.interval is None:
+            self._set_interval()
+            self._flush()
+        if self.psd:
+            freqs, psd, window_n = self.freqs, np.concatenate(self.psd), self.window_n
+        else:
+            freqs, psd, window_n = harmonic_spectra(self.buffer[None], self.interval, self.window, self.segment)
+            psd = psd[0]
+        return harmonics_summary(freqs, psd, self.power_factor.mean, self.start, self.interval, window_n)
+
+class _ImbalanceState:
+    columns = ['timestamp', 'current']
+    second_pass_columns = []
+    
+    def __init__(self, max_lag=MAX_LAG):
+        self.current = Moments()
+        self.lags = LagCorrelation(max_lag)
+        self.timestamps = []
+    
+    def update(self, rows):
+        self.current.update(rows['current'])
+        self.lags.update(rows['current'])
+        self.timestamps.extend(rows['timestamp'][:10_000 - len(self.timestamps)])
+    
+    def result(self):
+        cv = self.current.std() / self.current.mean
+        return imbalance_summary(cv, self.current.max - self.current.min, self.lags.result(), self.current.n,
+                                 sample_interval(np.array(self.timestamps)))
+
+STREAM_STATES = {
+    'anomalies': _AnomalyState,
+    'degradation': _DegradationState,
+    'harmonics': _HarmonicsState,
+    'imbalance': _ImbalanceState,
+}
+
+class OutOfCoreAnalysis:
+    def __init__(self, detectors, targets=None, max_samples=MAX_SAMPLES, model_dir=None, retrain=False):
+        # targets: detector -> machine ids to analyze; None analyzes every machine
+        self.detectors = [name for name in detectors if name in STREAM_STATES]
+        self.targets = targets
+        self.max_samples = max_samples
+        self.models = ModelStore(model_dir, contamination=0.005, max_samples=max_samples) if model_dir else None
+        self.retrain = retrain
+        self.states = {}
+        self.rows = 0
+        self.peak = 'peak' in detectors
+        self.machine_index = {}
+        self.correlation = CorrelationAccumulator()
+        self.load = Moments()
+        self.last_timestamp = None
+    
+    def _states(self, machine):
+        if machine not in self.states:
+            states = {}
+            for name in self.detectors:
+                if self.targets is None or machine in self.targets.get(name, ()):
+                    states[name] = _AnomalyState(max_samples=self.max_samples) if name == 'anomalies' \
+                        else STREAM_STATES[name]()
+            if 'anomalies' in states and self.models and not self.retrain:
+                states['anomalies'].use_model(self.models.load(machine))
+            self.states[machine] = states
+        return self.states[machine]
+    
+    def _anomaly_states(self):
+        return [(machine, states['anomalies']) for machine, states in self.states.items() if 'anomalies' in states]
+    
+    def begin_run(self, retrain=False):
+        # A resumed analysis: new rows are scored from here on
+        self.retrain = retrain
+        for _, state in self._anomaly_states():
+            state.begin_run()
+    
+    def check_models(self):
+        # Refit models that drifted from their reference sample (or all of
+        # them on request); their rows of this run are scored again
+        retrained = 0
+        for _, state in self._anomaly_states():
+            if not state.pending and (self.retrain or state.drifted()):
+                state.pending = True
+                retrained += 1
+        return retrained
+    
+    def _split(self, chunk, columns):
+        # Rows of each machine, in time order, as plain arrays
+        codes, machines = pd.factorize(chunk['machineId'])
+        order = np.argsort(codes, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(machines)))))
+        arrays = {c: chunk[c].values[order] for c in columns}
+        for k, machine in enumerate(machines):
+            yield machine, {c: v[bounds[k]:bounds[k + 1]] for c, v in arrays.items()}
+    
+    def update(self, chunk):
+        # Appended rows must continue after the last timestamp already seen
+        timestamps = chunk['timestamp'].values
+        if self.last_timestamp is not None and timestamps[0] <= self.last_timestamp:
+            raise ValueError(f"rows at {pd.Timestamp(timestamps[0])} do not follow the last processed timestamp "
+                             f"{pd.Timestamp(self.last_timestamp)}")
+        self.last_timestamp = timestamps[-1]
+        self.rows += len(chunk)
+        columns = sorted({c for name in self.detectors for c in STREAM_STATES[name].columns} & set(chunk.columns))
+        for machine, rows in self._split(chunk, columns):
+            for state in self._states(machine).values():
+                state.update(rows)
+        if self.peak:
+            self._update_load(chunk)
+    
+    def _update_load(self, chunk):
+        # Total load per timestamp and a timestamp x machine block for the
+        # correlation sums; chunks never split a timestamp
+        ts_codes, timestamps = pd.factorize(chunk['timestamp'])
+        machine_codes, machines = pd.factorize(chunk['machineId'])
+        power = chunk['power'].values.astype(np.float64)
+        self.load.update(np.bincount(ts_codes, weights=power, minlength=len(timestamps)))
+        
+        columns = np.array([self.machine_index.setdefault(m, len(self.machine_index)) for m in machines])
+        size = len(self.machine_index)
+        cells = ts_codes * size + columns[machine_codes]
+        sums = np.bincount(cells, weights=power, minlength=len(timestamps) * size)
+        counts = np.bincount(cells, minlength=len(timestamps) * size)
+        with np.errstate(invalid='ignore'):
+            self.correlation.update((sums / counts).reshape(len(timestamps), size))
+    
+    def _pending(self):
+        return [state for states in self.states.values() for state in states.values()
+                if getattr(state, 'pending', False)]
+    
+    def second_pass_columns(self):
+        # Only states created since the last second pass need one
+        return sorted({c for state in self._pending() for c in state.second_pass_columns} - set(KEY_COLUMNS))
+    
+    def begin_second_pass(self):
+        for state in self._pending():
+            state.begin_second_pass()
+    
+    def second_pass(self, chunk):
+        for machine, rows in self._split(chunk, [c for c in chunk.columns if c != 'machineId']):
+            for state in self.states.get(machine, {}).values():
+                if getattr(state, 'pending', False):
+                    state.second_pass(rows)
+    
+    def end_second_pass(self):
+        for state in self._pending():
+            state.pending = False
+        for machine, state in self._anomaly_states():
+            if state.fitted and self.models:
+                self.models.save(machine, state.model)
+            state.fitted = False
+    
+    def machine_results(self):
+        return {machine: {MACHINE_DETECTORS[name][1]: state.result() for name, state in states.items()}
+                for machine, states in sorted(self.states.items()) if states}
+    
+    def peak_result(self):
+        # Correlation matrix in machine-id order, as the in-memory pivot has it
+        machines = list(self.machine_index)
+        order = np.argsort(machines)
+        corr = self.correlation.matrix()[np.ix_(order, order)]
+        correlation = summarize_matrix(corr).result([machines[k] for k in order])
+        return peak_load_summary(self.load.max, self.load.mean, correlation)
+
 class EnergyMLAnalyzer:
-    def __init__(self, data_file, chunk_size=100000):
+    def __init__(self, data_file, chunk_size=100000, detectors=None, out_of_core=False, max_samples=MAX_SAMPLES,
+                 model_dir=None, retrain=False, matrix_dir=None, cache=None, profiler=None):
         self.data_file = data_file
+        self.chunk_size = chunk_size
+        self.detectors = list(detectors or DETECTORS)
         self.results = {}
+        # IsolationForest reference window size and persisted models
+        self.anomaly_options = {'max_samples': max_samples, 'model_dir': model_dir, 'retrain': retrain}
+        # Timestamp x machine arrays for fleet-level analyses, built on first use
+        self.matrix_dir = matrix_dir
+        self.fleet = None
+        # Rolling features of the reference machines, shared by the detectors
+        self.features = FeatureEngine()
+        # ResultCache of detector results, keyed by the input fingerprint
+        self.cache = cache
+        self._fingerprint = None
+        # profiling.Profiler measuring each stage, if any
+        self.profiler = profiler
+        self.out_of_core = out_of_core
+        self.machine_offsets = {}
+        self._df = None
         
-        print(f"\n🤖 Loading {data_file}...")
-        self.df = self._load_data_smart(chunk_size)
-        print(f"✅ {len(self.df):,} records loaded\n")
+        if out_of_core:
+            # Nothing is loaded; run_all_analyses streams the file
+            print(f"\n🌊 Out-of-core mode: streaming {data_file} in chunks of {chunk_size:,} rows\n")
+    
+    @property
+    def df(self):
+        # Loaded on first use, so a run served from the cache never reads the data
+        if self._df is None and not self.out_of_core:
+            print(f"\n🤖 Loading {self.data_file}...")
+            with self._stage('load') as stage:
+                self._df = self._load_data_smart(self.chunk_size)
+                stage['rows'] = len(self._df)
+            print(f"✅ {len(self._df):,} records loaded\n")
+        return self._df
+    
+    def _stage(self, name, rows=None):
+        # Profiled block, a no-op without a profiler; yields a dict whose 'rows'
+        # may be set once they are known
+        return self.profiler.stage(name, rows) if self.profiler else nullcontext({})
+    
+    def _concurrent_stage(self, name, rows=None):
+        return self.profiler.concurrent(name, rows) if self.profiler else nullcontext({})
+    
+    def _machine_rows(self, machines):
+        return sum(stop - start for start, stop in (self.machine_offsets.get(m, (0, 0)) for m in machines))
+    
+    def _columns(self, detectors=None):
+        return KEY_COLUMNS + sorted({c for name in detectors or self.detectors for c in DETECTORS[name][1]})
+    
+    def fleet_matrix(self):
+        if self.fleet is None:
+            self.fleet = FleetMatrix.from_frame(self.df, directory=self.matrix_dir)
+        return self.fleet
         
     def _load_data_smart(self, chunk_size):
-        try:
-            total_rows = sum(1 for _ in open(self.data_file)) - 1
-        except:
-            total_rows = 1000000
+        columns = self._columns()
         
-        if total_rows > 5_000_000:
-            print(f"⚠️  Large dataset ({total_rows:,} rows) - sampling 10%")
-            chunks = []
-            for chunk in pd.read_csv(self.data_file, chunksize=chunk_size, parse_dates=['timestamp']):
-                chunks.append(chunk.sample(frac=0.1, random_state=42))
-            df = pd.concat(chunks, ignore_index=True)
+        if self.data_file.rstrip('/').endswith(('.parquet', '.feather')):
+            df = self._load_columnar(columns)
         else:
-            df = pd.read_csv(self.data_file, parse_dates=['timestamp'])
+            total_rows = self._count_rows()
+            sample = total_rows > SAMPLE_THRESHOLD
+            if sample:
+                print(f"⚠️  Large dataset (~{total_rows:,} rows) - sampling 10% (use --out-of-core for exact results)")
+            df = self._read_csv(columns, sample, chunk_size)
         
-        return df.sort_values('timestamp').reset_index(drop=True)
+        # Generated data is written in time order; only sort when it is not
+        if not df['timestamp'].is_monotonic_increasing:
+            df = df.sort_values('timestamp', kind='stable')
+        return self._index_machines(df)
     
-    def detect_voltage_anomalies(self, machine_id='Machine_05', contamination=0.005):
-        print(f"⚡ Analyzing {machine_id} for voltage anomalies...")
+    def _index_machines(self, df):
+        # Order rows by (machineId, timestamp) once: a stable sort on the
+        # category codes keeps time order within each machine. Every machine
+        # is then one contiguous row range and detectors take O(1) slices
+        # instead of scanning the whole table
+        if df['machineId'].dtype != 'category':
+            df['machineId'] = df['machineId'].astype('category')
+        codes = df['machineId'].cat.codes.values
+        if len(codes) > 1 and (np.diff(codes) < 0).any():
+            df = df.take(np.argsort(codes, kind='stable'))
+            codes = df['machineId'].cat.codes.values
+        df = df.reset_index(drop=True)
         
-        machine_data = self.df[self.df['machineId'] == machine_id].copy()
-        
-        machine_data['voltage_rolling_mean'] = machine_data['voltage'].rolling(window=10, min_periods=1).mean()
-        machine_data['voltage_rolling_std'] = machine_data['voltage'].rolling(window=10, min_periods=1).std()
-        machine_data['voltage_deviation'] = abs(machine_data['voltage'] - machine_data['voltage_rolling_mean'])
-        machine_data['current_voltage_ratio'] = machine_data['current'] / machine_data['voltage']
+        counts = np.bincount(codes, minlength=len(df['machineId'].cat.categories))
+        stops = np.cumsum(counts)
+        self.machine_offsets = {machine: (int(stop - count), int(stop))
+                                for machine, count, stop in zip(df['machineId'].cat.categories, counts, stops)
+                                if count}
+        return df
+    
+    def _machine_frame(self, machine_id):
+        # Zero-copy row slice of one machine (see _index_machines)
+        df = self.df
+        start, stop = self.machine_offsets.get(machine_id, (0, 0))
+        return df.iloc[start:stop]
+    
+    def _count_rows(self):
+        # Row count from the generator's sidecar, else estimated from the file
+        # size and the line length of the first block (no extra pass)
+        sidecar = f"{self.data_file}.meta.json"
+        if os.path.exists(sidecar) and os.path.getmtime(sidecar) >= os.path.getmtime(self.data_file):
+            with open(sidecar) as f:
+                return int(json.load(f)['rows'])
         
-        features = ['voltage', 'voltage_deviation', 'voltage_rolling_std', 'current_voltage_ratio']
-        X = machine_data[features].fillna(0)
+        size = os.path.getsize(self.data_file)
+        with open(self.data_file, 'rb') as f:
+            block = f.read(1 << 16)
+        if self.data_file.endswith(('.gz', '.zst', '.bz2', '.xz', '.zip')):
+            return size // 14  # generated CSV compresses to roughly 14 bytes per row
+        return max(0, size * block.count(b'\n') // max(1, len(block)) - 1)
+    
+    def _read_csv(self, columns, sample, chunk_size):
+        dtypes = {c: COLUMN_DTYPES[c] for c in columns if c in COLUMN_DTYPES}
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pv
+        except ImportError:
+            # pandas C parser with an explicit schema
+            reader = pd.read_csv(self.data_file, usecols=columns, dtype=dtypes, parse_dates=['timestamp'],
+                                 chunksize=chunk_size if sample else None)
+            if not sample:
+                return reader
+            return self._restore_categories(pd.concat(
+                [chunk.sample(frac=0.1, random_state=42) for chunk in reader], ignore_index=True))
         
-        iso_forest = IsolationForest(contamination=contamination, random_state=42, n_estimators=100)
-        predictions = iso_forest.fit_predict(X)
-        scores = iso_forest.score_samples(X)
+        # Multi-threaded Arrow parser; one pass, typed on read
+        arrow_types = {'category': pa.dictionary(pa.int32(), pa.string()), 'float32': pa.float32()}
+        column_types = {c: arrow_types[kind] for c, kind in dtypes.items()}
+        column_types['timestamp'] = pa.timestamp('ms')
+        convert_options = pv.ConvertOptions(include_columns=columns, column_types=column_types)
+        if not sample:
+            return pv.read_csv(self.data_file, convert_options=convert_options).to_pandas()
+        reader = pv.open_csv(self.data_file, convert_options=convert_options)
+        return self._restore_categories(pd.concat(
+            [batch.to_pandas().sample(frac=0.1, random_state=42) for batch in reader], ignore_index=True))
+    
+    def _restore_categories(self, df):
+        # Concatenating chunks with different category sets falls back to object
+        for column, dtype in COLUMN_DTYPES.items():
+            if dtype == 'category' and column in df and df[column].dtype != 'category':
+                df[column] = df[column].astype('category')
+        return df
+    
+    def _load_columnar(self, columns):
+        # Parquet/Feather datasets written by the generators (hive-partitioned
+        # by month and machine); the row count comes from file metadata
+        import pyarrow.dataset as ds
         
-        machine_data['anomaly'] = predictions
-        machine_data['anomaly_score'] = scores
-        anomalies = machine_data[machine_data['anomaly'] == -1]
+        file_format = 'ipc' if self.data_file.rstrip('/').endswith('.feather') else 'parquet'
+        partitioning = ds.HivePartitioning.discover(infer_dictionary=True)
+        dataset = ds.dataset(self.data_file, format=file_format, partitioning=partitioning)
+        total_rows = dataset.count_rows()
         
-        print(f"   Found: {len(anomalies):,} anomalies ({len(anomalies)/len(machine_data)*100:.3f}%)\n")
+        if total_rows > SAMPLE_THRESHOLD:
+            print(f"⚠️  Large dataset ({total_rows:,} rows) - sampling 10%")
+            chunks = [batch.to_pandas().sample(frac=0.1, random_state=42)
+                      for batch in dataset.to_batches(columns=columns)]
+            return self._restore_categories(pd.concat(chunks, ignore_index=True))
+        return dataset.to_table(columns=columns).to_pandas()
+    
+    def detect_voltage_anomalies(self, machine_id='Machine_05', contamination=0.005):
+        print(f"⚡ Analyzing {machine_id} for voltage anomalies...")
         
-        self.results['voltage_anomalies'] = {
-            'machine_id': machine_id,
-            'total_anomalies': len(anomalies),
-            'anomaly_rate': len(anomalies)/len(machine_data)*100,
-            'anomalies': anomalies[['timestamp', 'voltage', 'current', 'anomaly_score']].head(100).to_dict('records')
-        }
+        result, anomalies = voltage_anomalies(self._machine_frame(machine_id), contamination, machine_id=machine_id,
+                                              features=self.features, **self.anomaly_options)
         
+        self._record('voltage_anomalies', machine_id, result)
         return anomalies
     
     def detect_degradation_trend(self, machine_id='Machine_12', window_size=1000):
         print(f"📉 Analyzing {machine_id} for degradation...")
         
-        machine_data = self.df[self.df['machineId'] == machine_id].copy().reset_index(drop=True)
-        
-        machine_data['current_ma'] = machine_data['current'].rolling(window=window_size, min_periods=1).mean()
-        machine_data['pf_ma'] = machine_data['powerFactor'].rolling(window=window_size, min_periods=1).mean()
-        
-        x = np.arange(len(machine_data))
-        mask = ~np.isnan(machine_data['current_ma'].values)
-        
-        if mask.sum() >= 2:
-            current_slope, _ = np.polyfit(x[mask], machine_data['current_ma'].values[mask], 1)
-            pf_slope, _ = np.polyfit(x[mask], machine_data['pf_ma'].values[mask], 1)
-        else:
-            current_slope, pf_slope = 0, 0
-        
-        initial_current = machine_data['current_ma'].iloc[window_size:window_size+100].mean()
-        final_current = machine_data['current_ma'].iloc[-100:].mean()
-        current_change = (final_current - initial_current) / initial_current * 100
-        
-        initial_pf = machine_data['pf_ma'].iloc[window_size:window_size+100].mean()
-        final_pf = machine_data['pf_ma'].iloc[-100:].mean()
-        pf_change = (final_pf - initial_pf) / initial_pf * 100
-        
-        if current_change > 10 and pf_change < -5:
-            severity = "CRITICAL"
-        elif current_change > 7 or pf_change < -4:
-            severity = "WARNING"
-        else:
-            severity = "NORMAL"
-        
-        print(f"   Current: {current_change:+.2f}% | PF: {pf_change:+.2f}% | {severity}\n")
-        
-        self.results['degradation'] = {
-            'machine_id': machine_id,
-            'current_change_percent': current_change,
-            'power_factor_change_percent': pf_change,
-            'severity': severity,
-            'current_trend_slope': current_slope,
-            'pf_trend_slope': pf_slope
-        }
+        result, machine_data = degradation_trend(self._machine_frame(machine_id), window_size, machine_id,
+                                                 self.features)
         
+        self._record('degradation', machine_id, result)
         return machine_data
     
-    def detect_harmonics(self, machine_id='Machine_08', sample_size=10000):
+    def detect_harmonics(self, machine_id='Machine_08', window=WINDOW_SECONDS, segment=SEGMENT_SECONDS):
         print(f"🌊 Analyzing {machine_id} for harmonics...")
         
-        machine_data = self.df[self.df['machineId'] == machine_id].copy()
-        sample_indices = np.linspace(0, len(machine_data)-1, min(sample_size, len(machine_data)), dtype=int)
-        samples = machine_data.iloc[sample_indices]['current'].values
-        
-        N = len(samples)
-        yf = fft(samples)
-        xf = fftfreq(N, 1.0)[:N//2]
-        power = 2.0/N * np.abs(yf[:N//2])
-        
-        peaks, _ = find_peaks(power, height=np.mean(power)*1.5, distance=2)
-        
-        if len(peaks) > 0:
-            peak_magnitudes = power[peaks]
-            sorted_indices = np.argsort(peak_magnitudes)[::-1]
-            top_peaks = peaks[sorted_indices[:5]]
-            top_magnitudes = peak_magnitudes[sorted_indices[:5]]
-        else:
-            top_peaks, top_magnitudes = [], []
-        
-        fundamental = power[1] if len(power) > 1 else 0
-        harmonics_power = np.sum(power[2:min(10, len(power))]**2)
-        thd = np.sqrt(harmonics_power) / fundamental * 100 if fundamental > 0 else 0
-        
-        severity = "CRITICAL" if thd > 15 else "WARNING" if thd > 10 else "NORMAL"
-        
-        print(f"   THD: {thd:.2f}% | PF: {machine_data['powerFactor'].mean():.3f} | {severity}\n")
-        
-        self.results['harmonics'] = {
-            'machine_id': machine_id,
-            'thd_percent': thd,
-            'power_factor': machine_data['powerFactor'].mean(),
-            'severity': severity,
-            'dominant_harmonics': list(zip(top_peaks.tolist(), top_magnitudes.tolist()))
-        }
+        result, machine_data = harmonics(self._machine_frame(machine_id), window, segment)
         
+        self._record('harmonics', machine_id, result)
         return machine_data
     
     def detect_phase_imbalance(self, machine_id='Machine_15'):
         print(f"⚖️  Analyzing {machine_id} for phase imbalance...")
         
-        machine_data = self.df[self.df['machineId'] == machine_id].copy()
+        result, machine_data = phase_imbalance(self._machine_frame(machine_id))
         
-        current_mean = machine_data['current'].mean()
-        current_std = machine_data['current'].std()
-        cv = current_std / current_mean
+        self._record('phase_imbalance', machine_id, result)
+        return machine_data
+    
+    def _record(self, key, machine_id, result):
+        r = result
+        if key == 'voltage_anomalies':
+            print(f"   Found: {r['total_anomalies']:,} anomalies ({r['anomaly_rate']:.3f}%)\n")
+        elif key == 'degradation':
+            print(f"   Current: {r['current_change_percent']:+.2f}% | "
+                  f"PF: {r['power_factor_change_percent']:+.2f}% | {r['severity']}\n")
+        elif key == 'harmonics':
+            print(f"   THD: {r['thd_percent']:.2f}% | PF: {r['power_factor']:.3f} | {r['severity']}\n")
+        else:
+            periods = r['dominant_periods']
+            period = f"{periods[0]['period_s']:.0f}s" if periods else "none"
+            print(f"   CV: {r['coefficient_of_variation']:.3f} | Range: {r['current_range']:.2f}A | "
+                  f"Period: {period} | {r['severity']}\n")
+        self.results[key] = {'machine_id': machine_id, **result}
+    
+    def optimize_peak_load(self):
+        print(f"⚡ Analyzing peak load optimization...")
         
-        autocorr_lags = [100, 250, 500, 1000]
-        autocorrs = {}
-        for lag in autocorr_lags:
-            if len(machine_data) > lag:
-                autocorrs[lag] = machine_data['current'].autocorr(lag=lag)
+        result, total_power = self._peak_load()
+        self._report_peak_load(result)
+        return total_power
+    
+    def _peak_load(self):
+        fleet = self.fleet_matrix()
+        total_power = pd.DataFrame({'timestamp': fleet.timestamps, 'total_power': fleet.total('power')})
         
-        severity = "CRITICAL" if cv > 0.15 else "WARNING" if cv > 0.10 else "NORMAL"
+        result = peak_load_summary(total_power['total_power'].max(), total_power['total_power'].mean(),
+                                   fleet.correlation('power').result(fleet.machines))
+        return result, total_power
+    
+    def _report_peak_load(self, result):
+        print(f"   Peak: {result['peak_load_kw']:.2f}kW | Avg Corr: {result['average_correlation']:.3f} | "
+              f"Potential: {result['optimization_potential']}\n")
+        self.results['peak_load_optimization'] = result
+    
+    def analyze_all_machines(self, workers=None):
+        detectors = [name for name in self.detectors if name in MACHINE_DETECTORS]
+        machines = self._machine_ids()
+        workers = max(1, min(workers or os.cpu_count() or 1, len(machines)))
+        print(f"🏭 Running {', '.join(detectors)} on {len(machines)} machines ({workers} workers)...")
         
-        print(f"   CV: {cv:.3f} | Range: {machine_data['current'].max() - machine_data['current'].min():.2f}A | {severity}\n")
+        # Only results missing from the cache are computed
+        results, missing = self._cached_machine_results(detectors, machines)
+        if self.cache is not None and self.cache.hits:
+            print(f"♻️  {sum(map(len, results.values())):,} cached machine results, "
+                  f"{sum(map(len, missing.values())):,} to compute")
         
-        self.results['phase_imbalance'] = {
-            'machine_id': machine_id,
-            'coefficient_of_variation': cv,
-            'current_range': machine_data['current'].max() - machine_data['current'].min(),
-            'severity': severity,
-            'autocorrelations': autocorrs
-        }
+        # Harmonics and imbalance run batched across machines in this process
+        per_machine = [name for name in detectors if name not in FLEET_BATCHED and name in missing]
+        pending = {machine for name in per_machine for machine in missing[name]}
+        todo = [machine for machine in machines if machine in pending]
+        computed = []
+        if per_machine:
+            with self._stage(' + '.join(per_machine)) as stage:
+                if workers == 1:
+                    computed = [(machine, analyze_machine(self._machine_frame(machine), per_machine,
+                                                          machine_options(self.anomaly_options, machine)))
+                                for machine in todo]
+                else:
+                    computed = self._analyze_in_pool(todo, per_machine, workers)
+                stage['rows'] = self._machine_rows(todo)
+        computed = dict(computed)
+        self._store_machine_results(computed, per_machine)
+        for name, batched in (('harmonics', self._fleet_harmonics), ('imbalance', self._fleet_imbalance)):
+            if name in missing:
+                with self._stage(name) as stage:
+                    fleet_results = {machine: {MACHINE_DETECTORS[name][1]: result}
+                                     for machine, result in batched(missing[name]).items()}
+                    stage['rows'] = self._machine_rows(missing[name])
+                self._store_machine_results(fleet_results, [name])
+                for machine, result in fleet_results.items():
+                    computed.setdefault(machine, {}).update(result)
+        for machine, result in computed.items():
+            results[machine].update(result)
+        keys = [MACHINE_DETECTORS[name][1] for name in detectors]
+        self.results['machines'] = {machine: {key: r[key] for key in keys} for machine, r in results.items()}
+        self._report_fleet(detectors)
+        return self.results['machines']
+    
+    def _machine_batches(self, machines):
+        # Machines with the same length and sample interval share one batched
+        # FFT call, up to SPECTRAL_BATCH_VALUES samples at a time
+        timestamps = self.df['timestamp'].values
+        groups = {}
+        for machine in machines:
+            start, stop = self.machine_offsets[machine]
+            groups.setdefault((stop - start, sample_interval(timestamps[start:stop])), []).append(machine)
         
-        return machine_data
+        for (n, interval), group in groups.items():
+            step = max(1, SPECTRAL_BATCH_VALUES // n)
+            for i in range(0, len(group), step):
+                batch = group[i:i + step]
+                yield batch, [self.machine_offsets[machine] for machine in batch], interval
     
-    def optimize_peak_load(self):
-        print(f"⚡ Analyzing peak load optimization...")
+    def _fleet_harmonics(self, machines):
+        timestamps = self.df['timestamp'].values
+        current = self.df['current'].values
+        results = {}
+        for batch, offsets, interval in self._machine_batches(machines):
+            freqs, psd, window_n = harmonic_spectra(np.stack([current[a:b] for a, b in offsets]), interval)
+            for k, (machine, (a, b)) in enumerate(zip(batch, offsets)):
+                power_factor = self.df['powerFactor'].values[a:b].mean(dtype=np.float64)
+                results[machine] = harmonics_summary(freqs, psd[k], power_factor, pd.Timestamp(timestamps[a]),
+                                                     interval, window_n)
+        return results
+    
+    def _fleet_imbalance(self, machines):
+        current = self.df['current'].values
+        results = {}
+        for batch, offsets, interval in self._machine_batches(machines):
+            acf = autocorrelation(np.stack([current[a:b] for a, b in offsets]))
+            for k, (machine, (a, b)) in enumerate(zip(batch, offsets)):
+                results[machine] = imbalance_summary(*current_spread(current[a:b]), acf[k], b - a, interval)
+        return results
+    
+    def _report_fleet(self, detectors):
+        for name in detectors:
+            key = MACHINE_DETECTORS[name][1]
+            per_machine = [r[key] for r in self.results['machines'].values()]
+            if key == 'voltage_anomalies':
+                flagged = sum(1 for r in per_machine if r['total_anomalies'] > 0)
+                print(f"   {key}: {sum(r['total_anomalies'] for r in per_machine):,} anomalies on {flagged} machines")
+            else:
+                counts = {level: sum(1 for r in per_machine if r['severity'] == level) for level in ('CRITICAL', 'WARNING')}
+                print(f"   {key}: {counts['CRITICAL']} critical | {counts['WARNING']} warning")
+        print()
+    
+    def _analyze_in_pool(self, machines, detectors, workers):
+        # Workers memory-map the columns from .npy files instead of receiving
+        # the frame; only machine ids and result dicts cross process boundaries
+        import shutil
+        import tempfile
+        from concurrent.futures import ProcessPoolExecutor
         
-        total_power = self.df.groupby('timestamp')['power'].sum().reset_index()
-        total_power.columns = ['timestamp', 'total_power']
+        columns = ['timestamp'] + sorted({c for name in detectors for c in DETECTORS[name][1]})
+        column_dir = tempfile.mkdtemp(prefix='energy_columns_')
+        try:
+            column_files = {}
+            for name in columns:
+                column_files[name] = os.path.join(column_dir, f'{name}.npy')
+                np.save(column_files[name], self.df[name].values)
+            
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_fleet_worker,
+                                     initargs=(column_files, self.machine_offsets, detectors,
+                                               dict(self.anomaly_options, n_jobs=1))) as pool:
+                chunksize = max(1, len(machines) // (workers * 4))
+                return list(pool.map(_analyze_machine_in_worker, machines, chunksize=chunksize))
+        finally:
+            shutil.rmtree(column_dir, ignore_errors=True)
+    
+    def _load_checkpoint(self, path, config):
+        # A checkpoint applies while the analyzed prefix of the file is unchanged
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            checkpoint = pickle.load(f)
+        if checkpoint['config'] != config:
+            print(f"⚠️  {path} was written with other settings - starting over")
+        elif (os.path.getsize(self.data_file) < checkpoint['offset']
+              or file_fingerprint(self.data_file, checkpoint['offset']) != checkpoint['fingerprint']):
+            print(f"⚠️  {self.data_file} changed before the checkpoint offset - starting over")
+        else:
+            return checkpoint
+        return None
+    
+    def _save_checkpoint(self, path, config, analysis, offset):
+        checkpoint = {
+            'config': config,
+            'offset': offset,
+            'fingerprint': file_fingerprint(self.data_file, offset),
+            'analysis': analysis,
+        }
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+        print(f"💾 Checkpoint saved to {path}")
+    
+    def run_out_of_core(self, all_machines=False, checkpoint=None):
+        if self.data_file.rstrip('/').endswith(('.parquet', '.feather')):
+            raise ValueError("Out-of-core mode streams CSV files; columnar datasets are loaded column-pruned instead")
         
-        pivot = self.df.pivot_table(index='timestamp', columns='machineId', values='power', aggfunc='mean')
-        corr_matrix = pivot.corr()
+        # Detectors whose results are all cached are not streamed; incremental
+        # runs rely on their checkpoint instead
+        detectors, cached = list(self.detectors), {}
+        if checkpoint is None and self.cache is not None:
+            detectors, cached = self._stream_cache(all_machines)
         
-        high_corr_pairs = []
-        for i in range(len(corr_matrix.columns)):
-            for j in range(i+1, len(corr_matrix.columns)):
-                corr_val = corr_matrix.iloc[i, j]
-                if abs(corr_val) > 0.5:
-                    high_corr_pairs.append((corr_matrix.columns[i], corr_matrix.columns[j], corr_val))
+        # With a checkpoint only the rows appended since the last run are read
+        config = {'version': CHECKPOINT_VERSION, 'data_file': os.path.abspath(self.data_file),
+                  'detectors': sorted(self.detectors), 'all_machines': all_machines,
+                  'max_samples': self.anomaly_options['max_samples']}
+        start, stop = 0, csv_end_offset(self.data_file)
+        saved = self._load_checkpoint(checkpoint, config) if checkpoint else None
+        if saved:
+            analysis, start = saved['analysis'], saved['offset']
+            print(f"📌 Resuming after {analysis.rows:,} records (last timestamp {pd.Timestamp(analysis.last_timestamp)})")
+            analysis.begin_run(self.anomaly_options['retrain'])
+        else:
+            targets = None if all_machines else {name: {machine} for name, machine in REFERENCE_MACHINES.items()}
+            analysis = OutOfCoreAnalysis(detectors, targets, **self.anomaly_options)
         
-        avg_corr = corr_matrix.values[np.triu_indices_from(corr_matrix.values, k=1)].mean()
+        if detectors:
+            self._stream(analysis, start, stop)
+        else:
+            print("♻️  Every result is cached - nothing to stream")
+        if checkpoint:
+            self._save_checkpoint(checkpoint, config, analysis, stop)
+        print()
         
-        if avg_corr < 0.3:
-            potential = 'LOW'
-        elif avg_corr < 0.6:
-            potential = 'MEDIUM'
+        machine_results = analysis.machine_results()
+        self._store_machine_results(machine_results, analysis.detectors)
+        if all_machines and analysis.detectors:
+            self._store('machines', None, list(machine_results))
+        for results in cached.get('machines', {}).values():
+            for machine, result in results.items():
+                machine_results.setdefault(machine, {}).update(result)
+        machine_detectors = [name for name in self.detectors if name in STREAM_STATES]
+        if all_machines:
+            self.results['machines'] = dict(sorted(machine_results.items()))
+            self._report_fleet(machine_detectors)
         else:
-            potential = 'HIGH'
+            for name in machine_detectors:
+                machine_id = REFERENCE_MACHINES[name]
+                key = MACHINE_DETECTORS[name][1]
+                if key not in machine_results.get(machine_id, {}):
+                    print(f"⚠️  {machine_id} not found - skipping {key}\n")
+                    continue
+                print(f"📊 {machine_id} {key.replace('_', ' ')}:")
+                self._record(key, machine_id, machine_results[machine_id][key])
         
-        print(f"   Peak: {total_power['total_power'].max():.2f}kW | Avg Corr: {avg_corr:.3f} | Potential: {potential}\n")
+        if analysis.peak:
+            print("⚡ Peak load optimization:")
+            with self._stage('peak'):
+                result = analysis.peak_result()
+            self._store('peak', None, result)
+            self._report_peak_load(result)
+        elif 'peak' in cached:
+            self._replay('peak', cached['peak'])
+    
+    def _stream(self, analysis, start, stop):
+        total = analysis.rows
+        with self._stage('stream') as stage:
+            for chunk in iter_csv_chunks(self.data_file, self._columns(analysis.detectors + ['peak'] * analysis.peak),
+                                         COLUMN_DTYPES, self.chunk_size, start, stop):
+                analysis.update(chunk)
+            stage['rows'] = analysis.rows - total
+        print(f"✅ {analysis.rows - total:,} records streamed")
+        retrained = analysis.check_models()
+        if retrained:
+            print(f"🧠 Refitting {retrained} anomaly model(s) ({'on request' if analysis.retrain else 'feature drift'})")
         
-        self.results['peak_load_optimization'] = {
-            'peak_load_kw': total_power['total_power'].max(),
-            'average_load_kw': total_power['total_power'].mean(),
-            'peak_average_ratio': total_power['total_power'].max()/total_power['total_power'].mean(),
-            'average_correlation': avg_corr,
-            'highly_correlated_pairs': len(high_corr_pairs),
-            'optimization_potential': potential
-        }
+        columns = analysis.second_pass_columns()
+        if columns:
+            # Anomaly scoring and harmonic sampling need the first pass's models and row counts
+            print(f"🔁 Second pass ({', '.join(columns)})...")
+            with self._stage('second pass') as stage:
+                analysis.begin_second_pass()
+                stage['rows'] = 0
+                for chunk in iter_csv_chunks(self.data_file, KEY_COLUMNS + columns, COLUMN_DTYPES, self.chunk_size,
+                                             start, stop):
+                    analysis.second_pass(chunk)
+                    stage['rows'] += len(chunk)
+                analysis.end_second_pass()
+    
+    def _stream_cache(self, all_machines):
+        # Splits the detectors into those to stream and cached results:
+        # {'machines': {detector: {machine: {results key: result}}}, 'peak': result}.
+        # A detector is streamed again if any of its machines is missing
+        machines = self._cached('machines') if all_machines else None
+        pending, cached = [], {'machines': {}}
+        for name in self.detectors:
+            if name == 'peak':
+                result = self._cached('peak')
+                if result is None:
+                    pending.append(name)
+                else:
+                    cached['peak'] = result
+            elif all_machines and machines is None:
+                pending.append(name)
+            else:
+                results, missing = self._cached_machine_results([name], machines or [REFERENCE_MACHINES[name]])
+                if missing:
+                    pending.append(name)
+                else:
+                    cached['machines'][name] = results
+        return pending, cached
+    
+    def _cache_key(self, name, machine=None):
+        # Input fingerprint + detector + machine + everything that changes the
+        # result; None when caching is off
+        if self.cache is None:
+            return None
+        if self._fingerprint is None:
+            self._fingerprint = input_fingerprint(self.data_file)
+        params = dict(CACHE_PARAMS.get(name, {}), out_of_core=self.out_of_core)
+        if not self.out_of_core:
+            params.update(sample_threshold=SAMPLE_THRESHOLD, chunk_size=self.chunk_size)
+        if name == 'anomalies':
+            params.update(max_samples=self.anomaly_options['max_samples'], model_dir=self.anomaly_options['model_dir'])
+        return self.cache.key(self._fingerprint, name, machine, **params)
+    
+    def _cached(self, name, machine=None):
+        # --retrain has to refit the models, so it never takes cached anomalies
+        if self.cache is None or (name == 'anomalies' and self.anomaly_options['retrain']):
+            return None
+        return self.cache.get(self._cache_key(name, machine))
+    
+    def _store(self, name, machine, result):
+        if self.cache is not None:
+            self.cache.put(self._cache_key(name, machine), result)
+    
+    def _cached_machine_results(self, detectors, machines):
+        # machine -> {results key: cached result}, and detector -> machines
+        # whose result has to be computed
+        cached = {machine: {} for machine in machines}
+        missing = {}
+        for name in detectors:
+            for machine in machines:
+                result = self._cached(name, machine)
+                if result is None:
+                    missing.setdefault(name, []).append(machine)
+                else:
+                    cached[machine][MACHINE_DETECTORS[name][1]] = result
+        return cached, missing
+    
+    def _store_machine_results(self, results, detectors):
+        # Reference-machine runs only have each detector's own machine
+        for machine, machine_results in results.items():
+            for name in detectors:
+                if MACHINE_DETECTORS[name][1] in machine_results:
+                    self._store(name, machine, machine_results[MACHINE_DETECTORS[name][1]])
+    
+    def _machine_ids(self):
+        # Machines of the input, cached with the results so that a fully
+        # cached fleet run does not load the data to list them
+        machines = self._cached('machines')
+        if machines is None:
+            self.df  # loads the data, which indexes its machines
+            machines = list(self.machine_offsets)
+            self._store('machines', None, machines)
+        return machines
+    
+    def _run_reference(self, name):
+        # A reference-machine detector (or the fleet-level peak analysis),
+        # served from the cache when possible. Entries hold the detector's
+        # result as the fleet mode stores it, without the machine id
+        machine_id = REFERENCE_MACHINES.get(name)
+        key = RESULT_KEYS[name]
+        result = self._cached(name, machine_id)
+        if result is not None:
+            with self._stage(f'{name} (cached)'):
+                self._replay(name, result)
+            return
+        with self._stage(name) as stage:
+            getattr(self, DETECTORS[name][0])()
+            stage['rows'] = len(self.df) if name == 'peak' else self._machine_rows([machine_id])
+        if key in self.results:
+            self._store(name, machine_id, {k: v for k, v in self.results[key].items() if k != 'machine_id'})
+    
+    def _replay(self, name, result):
+        key = RESULT_KEYS[name]
+        if name == 'peak':
+            print("♻️  Peak load optimization (cached):")
+            self._report_peak_load(result)
+        else:
+            print(f"♻️  {REFERENCE_MACHINES[name]} {key.replace('_', ' ')} (cached):")
+            self._record(key, REFERENCE_MACHINES[name], result)
+    
+    def _run_concurrent(self, threads):
+        # The reference detectors that are not cached run on a thread pool:
+        # NumPy, SciPy and scikit-learn release the GIL for most of their
+        # work. Their inputs (DETECTOR_INPUTS) are prepared here first, so the
+        # lazy load and the slicing happen once, on this thread. Results are
+        # reported, recorded and cached in detector order, whatever order
+        # they finish in
+        from concurrent.futures import ThreadPoolExecutor
         
-        return total_power
+        cached = {name: self._cached(name, REFERENCE_MACHINES.get(name)) for name in self.detectors}
+        todo = [name for name in self.detectors if cached[name] is None]
+        futures = {}
+        if todo:
+            self.df
+            threads = min(threads, len(todo))
+            print(f"🧵 Running {', '.join(todo)} on {threads} threads...\n")
+        with self._concurrent_stage('detectors') as stage, ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+            for name in todo:
+                if DETECTOR_INPUTS[name] == 'fleet':
+                    futures[name] = pool.submit(self._reference_task, name, None, len(self.df))
+                else:
+                    machine_id = REFERENCE_MACHINES[name]
+                    futures[name] = pool.submit(self._reference_task, name, self._machine_frame(machine_id),
+                                                self._machine_rows([machine_id]))
+            for name in self.detectors:
+                if name not in futures:
+                    with self._stage(f'{name} (cached)'):
+                        self._replay(name, cached[name])
+                    continue
+                result = futures[name].result()
+                if name == 'peak':
+                    print("⚡ Peak load optimization:")
+                    self._report_peak_load(result)
+                else:
+                    print(f"✅ {REFERENCE_MACHINES[name]} {RESULT_KEYS[name].replace('_', ' ')}:")
+                    self._record(RESULT_KEYS[name], REFERENCE_MACHINES[name], result)
+                self._store(name, REFERENCE_MACHINES.get(name), result)
+            stage['rows'] = len(self.df) if todo else 0
     
-    def run_all_analyses(self):
-        self.detect_voltage_anomalies()
-        self.detect_degradation_trend()
-        self.detect_harmonics()
-        self.detect_phase_imbalance()
-        self.optimize_peak_load()
+    def _reference_task(self, name, machine_data, rows):
+        # Runs on a pool thread: computes one reference detector's result
+        # without reporting or recording it
+        with self._stage(name, rows):
+            if DETECTOR_INPUTS[name] == 'fleet':
+                return self._peak_load()[0]
+            machine_id = REFERENCE_MACHINES[name]
+            options = machine_options(self.anomaly_options, machine_id).get(name, {})
+            if name in FEATURE_DETECTORS:
+                options['features'] = self.features
+            return MACHINE_DETECTORS[name][0](machine_data, **options)[0]
+    
+    def run_all_analyses(self, all_machines=False, workers=None, checkpoint=None, threads=None):
+        if self.out_of_core:
+            self.run_out_of_core(all_machines, checkpoint)
+        elif all_machines:
+            self.analyze_all_machines(workers)
+            if 'peak' in self.detectors:
+                self._run_reference('peak')
+        elif (threads or os.cpu_count() or 1) > 1 and len(self.detectors) > 1:
+            self._run_concurrent(threads or os.cpu_count())
+        else:
+            for name in self.detectors:
+                self._run_reference(name)
+        if self.cache is not None:
+            evicted = self.cache.evict()
+            print(f"♻️  Result cache: {self.cache.hits} hit(s), {self.cache.misses} miss(es)"
+                  + (f", {evicted} old entries evicted" if evicted else "") + "\n")
         
-        critical = sum(1 for v in self.results.values() if isinstance(v, dict) and v.get('severity') == 'CRITICAL')
-        warnings = sum(1 for v in self.results.values() if isinstance(v, dict) and v.get('severity') == 'WARNING')
+        severities = [v.get('severity') for v in self.results.values() if isinstance(v, dict)]
+        severities += [r.get('severity') for machine in self.results.get('machines', {}).values()
+                       for r in machine.values()]
+        critical = severities.count('CRITICAL')
+        warnings = severities.count('WARNING')
         
         print(f"{'='*60}")
         print(f"Summary: {critical} Critical | {warnings} Warnings")
@@ -243,22 +1241,100 @@ class EnergyMLAnalyzer:
             if isinstance(obj, list): return [convert(item) for item in obj]
             return obj
         
-        with open(output_file, 'w') as f:
-            json.dump(convert(self.results), f, indent=2)
+        with self._stage('save'):
+            if self.profiler:
+                # Stages up to saving; the printed table and metrics files include saving too
+                self.results['timings'] = self.profiler.timings()
+            with open(output_file, 'w') as f:
+                json.dump(convert(self.results), f, indent=2)
         
         print(f"💾 Results saved to {output_file}")
 
 def main():
     parser = argparse.ArgumentParser(description='AI-powered energy analysis')
     parser.add_argument('data_file', type=str)
+    parser.add_argument('--all', action='store_true', help='Run all analyses (default)')
+    parser.add_argument('--anomalies', action='store_true', help='Detect voltage anomalies')
+    parser.add_argument('--degradation', action='store_true', help='Analyze degradation trends')
+    parser.add_argument('--harmonics', action='store_true', help='Detect harmonic distortion')
+    parser.add_argument('--imbalance', action='store_true', help='Analyze phase imbalance')
+    parser.add_argument('--peak', action='store_true', help='Optimize peak loads')
+    parser.add_argument('--all-machines', action='store_true',
+                        help='Run the per-machine analyses on every machine instead of the reference machines')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for --all-machines (default: all CPUs)')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='Threads running the reference-machine detectors concurrently '
+                             '(default: all CPUs; 1 runs them one after another)')
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='Stream the CSV in chunks with exact per-machine state instead of loading (or sampling) it')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Out-of-core run that resumes from (and updates) a checkpoint next to --output, '
+                             'reading only the rows appended since the last run')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='Rows per chunk when streaming')
+    parser.add_argument('--max-samples', type=int, default=MAX_SAMPLES,
+                        help='Rows per machine the anomaly model is trained on')
+    parser.add_argument('--model-dir', type=str, default=None,
+                        help='Store fitted anomaly models here and reuse them on later runs')
+    parser.add_argument('--retrain', action='store_true', help='Refit stored anomaly models even without drift')
+    parser.add_argument('--matrix-dir', type=str, default=None,
+                        help='Memory-map the timestamp x machine fleet matrix to .npy files in this directory')
+    parser.add_argument('--cache-dir', type=str, default=CACHE_DIR,
+                        help='Result cache directory; unchanged input and parameters are served from here')
+    parser.add_argument('--cache-size', type=int, default=MAX_CACHE_BYTES // 2**20,
+                        help='Result cache size limit in MB, least recently used entries are evicted')
+    parser.add_argument('--no-cache', action='store_true', help='Neither read nor write the result cache')
+    parser.add_argument('--refresh', action='store_true', help='Recompute every result and replace its cache entry')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print wall/CPU time, memory and rows/s per stage and add them to the results as "timings"')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='With --profile, also measure peak Python allocations per stage (tracemalloc, slower)')
+    parser.add_argument('--metrics', type=str, default=None,
+                        help='Write the per-stage measurements here: Prometheus text for *.prom, '
+                             'else appended as JSON lines')
+    parser.add_argument('--cprofile', type=str, default=None,
+                        help='Write cProfile statistics of the whole run to this file (view with python -m pstats)')
     parser.add_argument('--output', type=str, default='ai_analysis_results.json')
     
     args = parser.parse_args()
     
-    analyzer = EnergyMLAnalyzer(args.data_file)
-    analyzer.run_all_analyses()
+    selected = [name for name in DETECTORS if getattr(args, name)]
+    checkpoint = os.path.splitext(args.output)[0] + '.checkpoint.pkl' if args.incremental else None
+    # Incremental runs resume from their checkpoint rather than the cache
+    cache = None if args.no_cache or args.incremental else \
+        ResultCache(args.cache_dir, args.cache_size * 2**20, refresh=args.refresh)
+    profiler = Profiler(args.trace_memory) if args.profile or args.metrics else None
+    if args.cprofile:
+        import cProfile
+        cprofile = cProfile.Profile()
+        cprofile.enable()
+    
+    analyzer = EnergyMLAnalyzer(args.data_file, args.chunk_size, detectors=None if args.all else selected,
+                                out_of_core=args.out_of_core or args.incremental, max_samples=args.max_samples,
+                                model_dir=args.model_dir, retrain=args.retrain, matrix_dir=args.matrix_dir,
+                                cache=cache, profiler=profiler)
+    analyzer.run_all_analyses(all_machines=args.all_machines, workers=args.workers, checkpoint=checkpoint,
+                              threads=args.threads)
     analyzer.save_results(args.output)
+    
+    if args.cprofile:
+        cprofile.disable()
+        cprofile.dump_stats(args.cprofile)
+        print(f"🔬 cProfile statistics written to {args.cprofile}")
+    if args.profile:
+        print(f"\n⏱️  Profile:\n{profiler.table()}")
+    if args.metrics:
+        labels = {'file': os.path.basename(args.data_file.rstrip('/')),
+                  'mode': 'out-of-core' if analyzer.out_of_core else 'memory',
+                  'machines': 'all' if args.all_machines else 'reference'}
+        if args.metrics.endswith('.prom'):
+            profiler.write_prometheus(args.metrics, **labels)
+        else:
+            profiler.write_jsonl(args.metrics, **labels)
+        print(f"📈 Stage metrics written to {args.metrics}")
 
 if __name__ == '__main__':
-    main()
+    # Run through the importable module so checkpointed states unpickle as energy_analyzer.*
+    import energy_analyzer
+    energy_analyzer.main()
 
@@ -129,8 +129,14 @@ def harmonics_page(data):
     col3.metric("Expected PF", "~0.770")
     
     if harm.get('dominant_harmonics'):
-        df = pd.DataFrame(harm['dominant_harmonics'][:10], columns=['Frequency', 'Magnitude'])
-        fig = px.bar(df, x='Frequency', y='Magnitude', color='Magnitude', color_continuous_scale='Purples')
+        df = pd.DataFrame(harm['dominant_harmonics'][:10], columns=['Harmonic', 'Amplitude'])
+        fig = px.bar(df, x='Harmonic', y='Amplitude', color='Amplitude', color_continuous_scale='Purples')
+        st.plotly_chart(fig, use_container_width=True)
+    
+    if harm.get('windows'):
+        df = pd.DataFrame(harm['windows'])
+        df['start'] = pd.to_datetime(df['start'])
+        fig = px.line(df, x='start', y='thd_percent', markers=True, labels={'start': 'Window', 'thd_percent': 'THD %'})
         st.plotly_chart(fig, use_container_width=True)
 
 def imbalance_page(data):
@@ -146,7 +152,14 @@ def imbalance_page(data):
     col1.metric("CV", f"{imb.get('coefficient_of_variation', 0):.3f}")
     col2.metric("Range", f"{imb.get('current_range', 0):.2f}A")
     
-    if imb.get('autocorrelations'):
+    if imb.get('autocorrelation_function'):
+        acf = imb['autocorrelation_function']
+        df = pd.DataFrame({'Lag': range(len(acf)), 'Correlation': acf})
+        fig = px.line(df, x='Lag', y='Correlation')
+        for period in imb.get('dominant_periods', []):
+            fig.add_vline(x=period['lag'], line_dash='dash', annotation_text=f"{period['period_s']:.0f}s")
+        st.plotly_chart(fig, use_container_width=True)
+    elif imb.get('autocorrelations'):
         df = pd.DataFrame(list(imb['autocorrelations'].items()), columns=['Lag', 'Correlation'])
         df['Lag'] = df['Lag'].astype(int)
         fig = px.line(df, x='Lag', y='Correlation', markers=True)
@@ -2,15 +2,45 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import argparse
-from tqdm import tqdm
+import json
 import os
+from tqdm import tqdm
+import sys
+import time
+
+from generation_utils import (STREAM_DATA, STREAM_FLEET, BackgroundChunkWriter, ColumnarDatasetWriter,
+                              StreamEncoder, aligned_ranges, columnar_output_path, fleet_parameter,
+                              load_fleet_spec, open_csv_output, open_stream_target, ordered_parallel_map,
+                              read_csv_edges, resolve_seed, sampling_step, stream_rng)
+
+BEHAVIORS = ('normal', 'error', 'degrading', 'harmonic', 'imbalanced')
+
+# Compact typed layout for Parquet/Feather output; `month` (YYYY-MM) is the partition key
+COLUMNAR_SCHEMA = [
+    ('machineId', 'category'),
+    ('machineType', 'category'),
+    ('timestamp', 'timestamp'),
+    ('voltage', 'float32'),
+    ('current', 'float32'),
+    ('power', 'float32'),
+    ('powerFactor', 'float32'),
+    ('month', 'string'),
+]
 
 class EnergyDataGenerator:
-    def __init__(self, num_machines=20, duration_days=365, sampling_interval=10, start_date='2024-01-01'):
+    def __init__(self, num_machines=20, duration_days=365, sampling_interval=10, start_date='2024-01-01',
+                 seed=None, workers=1, fleet_spec=None, engine='vectorized'):
         self.num_machines = num_machines
         self.duration_days = duration_days
         self.sampling_interval = sampling_interval
         self.start_date = datetime.strptime(start_date, '%Y-%m-%d')
+        self.workers = workers
+        self.engine = engine
+        
+        # Reproducibility: one run entropy, independent streams per hourly block
+        self.seed = resolve_seed(seed)
+        self.block_samples = max(1, 3600 // sampling_interval)
+        self.rng = None
         
         self.machine_types = [
             {'type': 'CNC_Mill', 'base_voltage': 400, 'base_current': 45, 'power_factor': 0.85},
@@ -22,7 +52,65 @@ class EnergyDataGenerator:
         
         self.samples_per_day = int((24 * 60 * 60) / sampling_interval)
         self.total_samples = self.samples_per_day * duration_days
+        self.degradation_horizon = self.total_samples  # samples until full degradation
+        self.machines = self._build_machines(fleet_spec)
+        self.num_machines = len(self.machines)
+        self.fleet = self._fleet_arrays()
+        self.machine_ids = np.array([f"Machine_{i:02d}" for i in range(self.num_machines)], dtype=object)
+    
+    def _build_machines(self, fleet_spec=None):
+        if fleet_spec is None:
+            machines = []
+            for i in range(self.num_machines):
+                machine_spec = self.machine_types[i % len(self.machine_types)]
+                behavior = 'normal'
+                
+                if i == 5: behavior = 'error'
+                elif i == 12: behavior = 'degrading'
+                elif i == 8: behavior = 'harmonic'
+                elif i == 15: behavior = 'imbalanced'
+                
+                machines.append({'id': i, 'spec': machine_spec, 'behavior': behavior})
+            return machines
         
+        # Fleet spec: templates with counts, parameter ranges and a behaviour mix, e.g.
+        # {"type": "Press", "count": 500, "base_current": [70, 90], "behaviors": {"normal": 0.98, "error": 0.02}}
+        templates = load_fleet_spec(fleet_spec) if isinstance(fleet_spec, str) else fleet_spec
+        builtin = {spec['type']: spec for spec in self.machine_types}
+        rng = stream_rng(self.seed, STREAM_FLEET)
+        machines = []
+        for template in templates:
+            count = template['count']
+            defaults = builtin.get(template['type'], {})
+            params = {key: fleet_parameter(template, key, count, rng, defaults.get(key))
+                      for key in ('base_voltage', 'base_current', 'power_factor')}
+            
+            mix = template.get('behaviors', {'normal': 1.0})
+            unknown = set(mix) - set(BEHAVIORS)
+            if unknown:
+                raise ValueError(f"Unknown behaviours in fleet spec: {sorted(unknown)}")
+            behaviors = [b for b in BEHAVIORS[1:] for _ in range(int(round(mix.get(b, 0) * count)))]
+            behaviors = (behaviors + ['normal'] * count)[:count]
+            behaviors = [behaviors[k] for k in rng.permutation(count)]
+            
+            for k in range(count):
+                spec = {'type': template['type']}
+                spec.update({key: float(values[k]) for key, values in params.items()})
+                machines.append({'id': len(machines), 'spec': spec, 'behavior': behaviors[k]})
+        return machines
+    
+    def _fleet_arrays(self):
+        # Structure-of-arrays view of the fleet for vectorized work
+        types = np.array([m['spec']['type'] for m in self.machines], dtype=object)
+        return {
+            'base_voltage': np.array([m['spec']['base_voltage'] for m in self.machines], dtype=float),
+            'base_current': np.array([m['spec']['base_current'] for m in self.machines], dtype=float),
+            'power_factor': np.array([m['spec']['power_factor'] for m in self.machines], dtype=float),
+            'type': types,
+            'type_code': pd.factorize(types)[0].astype(np.int16),
+            'behavior_code': np.array([BEHAVIORS.index(m['behavior']) for m in self.machines], dtype=np.int8),
+        }
+    
     def get_time_factors(self, timestamp):
         hour = timestamp.hour
         day_of_week = timestamp.weekday()
@@ -37,14 +125,14 @@ class EnergyDataGenerator:
     
     def generate_normal_machine(self, machine_id, machine_spec, timestamp, data_point):
         time_factor = self.get_time_factors(timestamp)
-        noise = 0.97 + np.random.random() * 0.06
+        noise = 0.97 + self.rng.random() * 0.06
         
         cycle_phase = np.sin((data_point / 360) * 2 * np.pi + machine_id)
         load_cycle = 0.7 + 0.3 * (cycle_phase + 1) / 2
         
-        voltage = machine_spec['base_voltage'] * (0.98 + np.random.random() * 0.04) * noise
+        voltage = machine_spec['base_voltage'] * (0.98 + self.rng.random() * 0.04) * noise
         current = machine_spec['base_current'] * time_factor * load_cycle * noise
-        power_factor = machine_spec['power_factor'] + (np.random.random() - 0.5) * 0.02
+        power_factor = machine_spec['power_factor'] + (self.rng.random() - 0.5) * 0.02
         power = voltage * current * power_factor / 1000
         
         return {
@@ -61,7 +149,7 @@ class EnergyDataGenerator:
         base = self.generate_normal_machine(machine_id, machine_spec, timestamp, data_point)
         
         hour = timestamp.hour
-        if 6 <= hour < 22 and np.random.random() < 0.003:
+        if 6 <= hour < 22 and self.rng.random() < 0.003:
             base['voltage'] *= 1.08
             base['current'] *= 0.95
             base['power'] = round(base['voltage'] * base['current'] * base['powerFactor'] / 1000, 2)
@@ -71,8 +159,8 @@ class EnergyDataGenerator:
     def generate_degrading_machine(self, machine_id, machine_spec, timestamp, data_point):
         base = self.generate_normal_machine(machine_id, machine_spec, timestamp, data_point)
         
-        degradation_factor = 1 + (data_point / self.total_samples) * 0.15
-        efficiency_loss = 1 - (data_point / self.total_samples) * 0.08
+        degradation_factor = 1 + (data_point / self.degradation_horizon) * 0.15
+        efficiency_loss = 1 - (data_point / self.degradation_horizon) * 0.08
         
         base['current'] *= degradation_factor
         base['powerFactor'] *= efficiency_loss
@@ -101,57 +189,320 @@ class EnergyDataGenerator:
         
         return base
     
-    def generate_data(self, output_file='energy_monitoring_data.csv', chunk_size=50000):
+    # Batch kernels: a whole chunk (samples x machines) as NumPy arrays, with the
+    # behaviours applied as vectorized transforms on the affected machine columns
+    
+    def get_time_factors_batch(self, timestamps):
+        hour = timestamps.hour.values
+        day_night_factor = np.where((hour >= 6) & (hour < 22), 1.0, 0.15)
+        weekend_factor = np.where(timestamps.weekday.values >= 5, 0.3, 1.0)
+        seasonal_factor = 0.9 + 0.2 * np.sin((timestamps.dayofyear.values / 365) * 2 * np.pi)
+        lunch_factor = np.where(hour == 12, 0.7, 1.0)
+        
+        return day_night_factor * weekend_factor * seasonal_factor * lunch_factor
+    
+    def _block_draws(self, start, stop):
+        # Uniform draws for samples [start, stop), taken block by block so that
+        # every hourly block sees the same numbers regardless of chunking
+        first_block = start // self.block_samples
+        last_block = (stop - 1) // self.block_samples
+        shape = (self.block_samples, self.num_machines)
+        blocks = [stream_rng(self.seed, STREAM_DATA, block).random((4,) + shape)
+                  for block in range(first_block, last_block + 1)]
+        offset = start - first_block * self.block_samples
+        return np.concatenate(blocks, axis=1)[:, offset:offset + stop - start]
+    
+    def normal_kernel(self, data_points, timestamps, draws):
+        time_factor = self.get_time_factors_batch(timestamps)[:, None]
+        noise = 0.97 + draws[0] * 0.06
+        
+        machine_ids = np.arange(self.num_machines)
+        cycle_phase = np.sin((data_points[:, None] / 360) * 2 * np.pi + machine_ids)
+        load_cycle = 0.7 + 0.3 * (cycle_phase + 1) / 2
+        
+        voltage = self.fleet['base_voltage'] * (0.98 + draws[1] * 0.04) * noise
+        current = self.fleet['base_current'] * time_factor * load_cycle * noise
+        power_factor = self.fleet['power_factor'] + (draws[2] - 0.5) * 0.02
+        power = voltage * current * power_factor / 1000
+        
+        return {
+            'voltage': np.round(voltage, 2),
+            'current': np.round(current, 2),
+            'power': np.round(power, 2),
+            'powerFactor': np.round(power_factor, 3)
+        }
+    
+    def error_kernel(self, values, cols, timestamps, draws):
+        hour = timestamps.hour.values[:, None]
+        spike = (hour >= 6) & (hour < 22) & (draws[3][:, cols] < 0.003)
+        values['voltage'][:, cols] = np.where(spike, values['voltage'][:, cols] * 1.08, values['voltage'][:, cols])
+        values['current'][:, cols] = np.where(spike, values['current'][:, cols] * 0.95, values['current'][:, cols])
+        power = np.round(values['voltage'][:, cols] * values['current'][:, cols] * values['powerFactor'][:, cols] / 1000, 2)
+        values['power'][:, cols] = np.where(spike, power, values['power'][:, cols])
+    
+    def degrading_kernel(self, values, cols, data_points):
+        progress = (data_points / self.degradation_horizon)[:, None]
+        values['current'][:, cols] *= 1 + progress * 0.15
+        values['powerFactor'][:, cols] *= 1 - progress * 0.08
+    
+    def harmonic_kernel(self, values, cols, data_points):
+        harmonic3 = np.sin((data_points / 120) * 2 * np.pi) * 0.05
+        harmonic5 = np.sin((data_points / 72) * 2 * np.pi) * 0.03
+        values['current'][:, cols] *= (1 + harmonic3 + harmonic5)[:, None]
+        values['powerFactor'][:, cols] *= 0.93
+    
+    def imbalanced_kernel(self, values, cols, data_points):
+        imbalance = 0.92 + np.sin((data_points / 500) * 2 * np.pi) * 0.08
+        values['current'][:, cols] *= imbalance[:, None]
+    
+    def _generate_range_vectorized(self, start, stop):
+        data_points = np.arange(start, stop)
+        timestamps = pd.DatetimeIndex(self.start_date + pd.to_timedelta(data_points * self.sampling_interval, unit='s'))
+        draws = self._block_draws(start, stop)
+        values = self.normal_kernel(data_points, timestamps, draws)
+        
+        behavior_code = self.fleet['behavior_code']
+        for code, behavior in enumerate(BEHAVIORS[1:], start=1):
+            cols = np.flatnonzero(behavior_code == code)
+            if len(cols) == 0:
+                continue
+            if behavior == 'error':
+                self.error_kernel(values, cols, timestamps, draws)
+                continue
+            getattr(self, f'{behavior}_kernel')(values, cols, data_points)
+            values['power'][:, cols] = np.round(
+                values['voltage'][:, cols] * values['current'][:, cols] * values['powerFactor'][:, cols] / 1000, 2)
+        
+        n_samples = stop - start
+        return pd.DataFrame({
+            'machineId': np.tile(self.machine_ids, n_samples),
+            'machineType': np.tile(self.fleet['type'], n_samples),
+            'timestamp': np.repeat(timestamps.values, self.num_machines),
+            'voltage': values['voltage'].ravel(),
+            'current': values['current'].ravel(),
+            'power': values['power'].ravel(),
+            'powerFactor': values['powerFactor'].ravel()
+        })
+    
+    def generate_range(self, start, stop):
+        if self.engine == 'vectorized':
+            return self._generate_range_vectorized(start, stop)
+        return self._generate_range_loop(start, stop)
+    
+    def _generate_range_loop(self, start, stop):
+        chunk_data = []
+        for data_point in range(start, stop):
+            if data_point == start or data_point % self.block_samples == 0:
+                self.rng = stream_rng(self.seed, STREAM_DATA, data_point // self.block_samples)
+            timestamp = self.start_date + timedelta(seconds=data_point * self.sampling_interval)
+            
+            for machine in self.machines:
+                if machine['behavior'] == 'error':
+                    data_entry = self.generate_error_machine(machine['id'], machine['spec'], timestamp, data_point)
+                elif machine['behavior'] == 'degrading':
+                    data_entry = self.generate_degrading_machine(machine['id'], machine['spec'], timestamp, data_point)
+                elif machine['behavior'] == 'harmonic':
+                    data_entry = self.generate_harmonic_machine(machine['id'], machine['spec'], timestamp, data_point)
+                elif machine['behavior'] == 'imbalanced':
+                    data_entry = self.generate_imbalanced_machine(machine['id'], machine['spec'], timestamp, data_point)
+                else:
+                    data_entry = self.generate_normal_machine(machine['id'], machine['spec'], timestamp, data_point)
+                
+                chunk_data.append(data_entry)
+        
+        return pd.DataFrame(chunk_data)
+    
+    def generate_data(self, output_file='energy_monitoring_data.csv', chunk_size=50000, output_format='csv',
+                      first_sample=0, compression=None, queue_depth=4):
         print(f"\n🔋 Generating {self.num_machines} machines × {self.duration_days} days")
-        print(f"   Estimated: {self.total_samples * self.num_machines:,} records")
+        print(f"   Estimated: {(self.total_samples - first_sample) * self.num_machines:,} records")
+        print(f"   Seed: {self.seed} | Workers: {self.workers} | Engine: {self.engine}")
         
-        machines = []
-        for i in range(self.num_machines):
-            machine_spec = self.machine_types[i % len(self.machine_types)]
-            behavior = 'normal'
+        if output_format == 'csv':
+            # Appending (first_sample > 0) keeps the existing rows and header;
+            # one handle stays open for the whole run
+            handle = open_csv_output(output_file, append=first_sample > 0, compression=compression)
+            header = [first_sample == 0]
             
-            if i == 5: behavior = 'error'
-            elif i == 12: behavior = 'degrading'
-            elif i == 8: behavior = 'harmonic'
-            elif i == 15: behavior = 'imbalanced'
+            def sink(chunk):
+                chunk.to_csv(handle, header=header[0], index=False)
+                header[0] = False
+        else:
+            output_file = columnar_output_path(output_file, output_format)
+            handle = None
+            columnar = ColumnarDatasetWriter(output_file, output_format, COLUMNAR_SCHEMA, ['month', 'machineId'])
             
-            machines.append({'id': i, 'spec': machine_spec, 'behavior': behavior})
+            def sink(chunk):
+                chunk['month'] = np.datetime_as_string(chunk['timestamp'].values.astype('datetime64[M]'))
+                columnar.write(chunk)
         
-        if os.path.exists(output_file):
-            os.remove(output_file)
+        # Chunks follow the hourly RNG blocks, so the output is identical
+        # for a given seed regardless of the worker count
+        samples_per_chunk = max(1, chunk_size // max(1, self.num_machines))
+        ranges = aligned_ranges(first_sample, self.total_samples, samples_per_chunk, self.block_samples)
+        if self.workers > 1:
+            chunks = ordered_parallel_map(_generate_range_in_worker, ranges, self.workers,
+                                          initializer=_init_worker, initargs=(self,))
+        else:
+            chunks = (self.generate_range(start, stop) for start, stop in ranges)
         
-        chunk_data = []
-        header_written = False
-        
-        with tqdm(total=self.total_samples, desc="Progress") as pbar:
-            for data_point in range(self.total_samples):
-                timestamp = self.start_date + timedelta(seconds=data_point * self.sampling_interval)
-                
-                for machine in machines:
-                    if machine['behavior'] == 'error':
-                        data_entry = self.generate_error_machine(machine['id'], machine['spec'], timestamp, data_point)
-                    elif machine['behavior'] == 'degrading':
-                        data_entry = self.generate_degrading_machine(machine['id'], machine['spec'], timestamp, data_point)
-                    elif machine['behavior'] == 'harmonic':
-                        data_entry = self.generate_harmonic_machine(machine['id'], machine['spec'], timestamp, data_point)
-                    elif machine['behavior'] == 'imbalanced':
-                        data_entry = self.generate_imbalanced_machine(machine['id'], machine['spec'], timestamp, data_point)
-                    else:
-                        data_entry = self.generate_normal_machine(machine['id'], machine['spec'], timestamp, data_point)
-                    
-                    chunk_data.append(data_entry)
-                
-                if len(chunk_data) >= chunk_size:
-                    pd.DataFrame(chunk_data).to_csv(output_file, mode='a', header=not header_written, index=False)
-                    chunk_data = []
-                    header_written = True
-                
-                pbar.update(1)
+        # Formatting and writing run on a background thread while the next
+        # chunk is generated; the bounded queue applies backpressure
+        writer = BackgroundChunkWriter(sink, queue_depth=queue_depth)
+        try:
+            with tqdm(total=self.total_samples - first_sample, desc="Progress") as pbar:
+                for (start, stop), chunk in zip(ranges, chunks):
+                    writer.put(chunk)
+                    pbar.update(stop - start)
+            writer.close()
+        finally:
+            if writer.thread.is_alive():
+                writer.close()
+            if handle is not None:
+                handle.close()
+            else:
+                columnar.close()
         
-        if chunk_data:
-            pd.DataFrame(chunk_data).to_csv(output_file, mode='a', header=not header_written, index=False)
+        if output_format == 'csv':
+            self._write_sidecar(output_file)
         
+        stats = writer.stats()
+        print(f"   Writer: {stats['rows_per_second']:,.0f} rows/s | busy {stats['writer_busy_percent']:.0f}% | "
+              f"queue depth avg {stats['mean_queue_depth']:.1f}, max {stats['max_queue_depth']}/{stats['queue_capacity']} | "
+              f"producer waited {stats['producer_wait_seconds']:.1f}s")
         print(f"✅ Done! Saved to {output_file}")
+        return output_file
+
+    def _write_sidecar(self, output_file):
+        # Row count and layout for readers, so they need not scan the file
+        meta = {
+            'rows': self.total_samples * self.num_machines,
+            'columns': [name for name, _ in COLUMNAR_SCHEMA if name != 'month'],
+            'sorted_by': 'timestamp',
+            'machines': self.num_machines,
+            'start_date': self.start_date.strftime('%Y-%m-%d'),
+            'sampling_interval': self.sampling_interval,
+            'seed': self.seed,
+            'degradation_horizon': self.degradation_horizon,
+        }
+        with open(f"{output_file}.meta.json", 'w') as f:
+            json.dump(meta, f, indent=2)
+    
+    def stream_data(self, target='-', frame_format='ndjson', speedup=1.0, tick_ms=50, report_every=5.0):
+        # Progress goes to stderr so stdout can carry the stream itself
+        log = lambda message: print(message, file=sys.stderr, flush=True)
+        pace = f"{speedup:g}× real time" if speedup > 0 else "unthrottled"
+        log(f"\n📡 Streaming {self.num_machines} machines to {target} as {frame_format} ({pace})")
+        
+        encoder = StreamEncoder([column for column in COLUMNAR_SCHEMA if column[0] != 'month'], frame_format,
+                                categories={'machineId': self.machine_ids,
+                                            'machineType': sorted(set(self.fleet['type']))})
+        out = open_stream_target(target)
+        out.write(encoder.header())
+        
+        # Samples due within one tick go out as a single batched write
+        if speedup > 0:
+            batch_samples = max(1, int(speedup * tick_ms / 1000 / self.sampling_interval))
+        else:
+            batch_samples = self.block_samples
+        ranges = aligned_ranges(0, self.total_samples, self.block_samples, self.block_samples)
+        if self.workers > 1:
+            chunks = ordered_parallel_map(_generate_range_in_worker, ranges, self.workers,
+                                          initializer=_init_worker, initargs=(self,))
+        else:
+            chunks = (self.generate_range(start, stop) for start, stop in ranges)
+        
+        messages = 0
+        sent_bytes = 0
+        blocked = 0.0
+        lag = max_lag = 0.0
+        started = last_report = time.perf_counter()
+        try:
+            for (start, stop), chunk in zip(ranges, chunks):
+                payload, offsets = encoder.encode(chunk)
+                for lo in range(start, stop, batch_samples):
+                    hi = min(lo + batch_samples, stop)
+                    if speedup > 0:
+                        # Wall-clock time at which this batch is due
+                        due = started + lo * self.sampling_interval / speedup
+                        now = time.perf_counter()
+                        if due > now:
+                            time.sleep(due - now)
+                        lag = max(0.0, now - due)
+                        max_lag = max(max_lag, lag)
+                    
+                    data = encoder.frame(payload, offsets, (lo - start) * self.num_machines,
+                                         (hi - start) * self.num_machines)
+                    write_started = time.perf_counter()
+                    out.write(data)
+                    out.flush()
+                    blocked += time.perf_counter() - write_started
+                    messages += (hi - lo) * self.num_machines
+                    sent_bytes += len(data)
+                    
+                    now = time.perf_counter()
+                    if now - last_report >= report_every:
+                        elapsed = now - started
+                        log(f"   {messages:,} msgs | {messages / elapsed:,.0f} msgs/s | "
+                            f"{sent_bytes / elapsed / 1e6:.1f} MB/s | lag {lag:.3f}s | blocked {blocked:.1f}s")
+                        last_report = now
+        except (BrokenPipeError, ConnectionResetError):
+            log("⚠️  Reader disconnected")
+        except KeyboardInterrupt:
+            log("⚠️  Interrupted")
+        finally:
+            try:
+                # stdout is only borrowed, the progress report still needs it
+                if out is sys.stdout.buffer:
+                    out.flush()
+                else:
+                    out.close()
+            except OSError:
+                pass
+        
+        elapsed = time.perf_counter() - started
+        rate = messages / elapsed if elapsed > 0 else 0.0
+        log(f"✅ Streamed {messages:,} msgs in {elapsed:.1f}s | sustained {rate:,.0f} msgs/s | "
+            f"max lag {max_lag:.3f}s | blocked on reader {blocked:.1f}s")
+        return {'messages': messages, 'bytes': sent_bytes, 'seconds': elapsed, 'messages_per_second': rate,
+                'max_lag_seconds': max_lag, 'blocked_seconds': blocked}
+
+def append_to(output_file, extra_days, chunk_size=50000, seed=None, workers=1, fleet_spec=None,
+              engine='vectorized'):
+    if output_file.endswith(('.gz', '.zst')):
+        raise ValueError("Appending needs an uncompressed CSV to read its tail")
+    
+    # Recover the run layout from the first and last rows of the existing file
+    first, tail = read_csv_edges(output_file)
+    start = first['timestamp'].iloc[0]
+    last = tail['timestamp'].iloc[-1]
+    step = sampling_step(tail)
+    existing_samples = int((last - start) / step) + 1
+    num_machines = int((tail['timestamp'] == last).sum())
+    existing_days = -(-existing_samples * int(step.total_seconds()) // (24 * 60 * 60))
+    
+    # The sidecar keeps the horizon of the original run across repeated appends
+    horizon = existing_samples
+    if os.path.exists(f"{output_file}.meta.json"):
+        with open(f"{output_file}.meta.json") as f:
+            horizon = json.load(f).get('degradation_horizon', horizon)
+    
+    print(f"\n➕ Appending {extra_days} days to {output_file} (last row: {last})")
+    generator = EnergyDataGenerator(num_machines, existing_days + extra_days, int(step.total_seconds()),
+                                    start.strftime('%Y-%m-%d'), seed=seed, workers=workers,
+                                    fleet_spec=fleet_spec, engine=engine)
+    # Keep the degradation slope of the original run instead of re-stretching it
+    generator.degradation_horizon = horizon
+    return generator.generate_data(output_file, chunk_size, first_sample=existing_samples)
+
+_worker_generator = None
+
+def _init_worker(generator):
+    global _worker_generator
+    _worker_generator = generator
+
+def _generate_range_in_worker(sample_range):
+    return _worker_generator.generate_range(*sample_range)
 
 def main():
     parser = argparse.ArgumentParser(description='Generate energy monitoring data')
@@ -161,11 +512,46 @@ def main():
     parser.add_argument('-s', '--start', type=str, default='2024-01-01')
     parser.add_argument('-o', '--output', type=str, default='energy_monitoring_data.csv')
     parser.add_argument('-c', '--chunk', type=int, default=50000)
+    parser.add_argument('-f', '--format', type=str, default='csv', choices=['csv', 'parquet', 'feather'],
+                        help='Output format; parquet/feather write a dataset partitioned by month and machine')
+    parser.add_argument('-e', '--engine', type=str, default='vectorized', choices=['vectorized', 'loop'],
+                        help='Batch kernels (default) or the per-sample reference loop')
+    parser.add_argument('--fleet', type=str, default=None, metavar='SPEC',
+                        help='Fleet spec (JSON/YAML/CSV) with machine templates, counts and behaviour mixes')
+    parser.add_argument('-a', '--append-to', type=str, default=None, metavar='FILE',
+                        help='Extend an existing CSV by --days days (layout is read from the file tail)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible output')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Worker processes (output is identical for any count)')
+    parser.add_argument('-z', '--compress', type=str, default=None, choices=['gzip', 'zstd'],
+                        help='Compress CSV output (also inferred from a .gz/.zst output name)')
+    parser.add_argument('-q', '--queue-depth', type=int, default=4,
+                        help='Finished chunks buffered for the background writer')
+    parser.add_argument('--stream', type=str, default=None, metavar='TARGET',
+                        help="Stream samples instead of writing a file: '-', tcp://host:port, unix:///path or a FIFO")
+    parser.add_argument('--stream-format', type=str, default='ndjson', choices=['ndjson', 'binary'],
+                        help='Wire format for --stream')
+    parser.add_argument('--speedup', type=float, default=1.0,
+                        help='Replay speed relative to real time for --stream; 0 streams as fast as possible')
     
     args = parser.parse_args()
     
-    generator = EnergyDataGenerator(args.machines, args.days, args.interval, args.start)
-    generator.generate_data(args.output, args.chunk)
+    extension = {'gzip': '.gz', 'zstd': '.zst'}.get(args.compress)
+    if extension and args.format == 'csv' and not args.output.endswith(extension):
+        args.output += extension
+    
+    if args.append_to:
+        append_to(args.append_to, args.days, args.chunk, seed=args.seed, workers=args.workers,
+                  fleet_spec=args.fleet, engine=args.engine)
+        return
+    
+    generator = EnergyDataGenerator(args.machines, args.days, args.interval, args.start,
+                                    seed=args.seed, workers=args.workers, fleet_spec=args.fleet,
+                                    engine=args.engine)
+    if args.stream:
+        generator.stream_data(args.stream, args.stream_format, args.speedup)
+        return
+    generator.generate_data(args.output, args.chunk, args.format, compression=args.compress,
+                            queue_depth=args.queue_depth)
 
 if __name__ == '__main__':
     main()
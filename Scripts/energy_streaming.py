@@ -0,0 +1,318 @@
+"""
+Out-of-core building blocks for the energy analyzer
+Streaming accumulators that carry exact per-machine state across chunk
+boundaries, and a CSV chunk reader that works on byte ranges
+"""
+
+import hashlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from rolling_features import trailing_stats
+from spectral_analysis import lag_correlation, lag_sums
+
+
+class RollingWindow:
+    """Trailing-window mean/std of a stream, like pandas rolling(window, min_periods=1)
+
+    Only the last window - 1 values are kept between chunks.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.tail = np.empty(0)
+
+    def update(self, values, with_std=False):
+        values = np.asarray(values, dtype=np.float64)
+        ext = np.concatenate((self.tail, values))
+        if len(ext) == 0:
+            return values, values
+        stats = trailing_stats(ext, self.window, ('mean', 'std') if with_std else ('mean',), first=len(self.tail))
+        self.tail = ext[max(0, len(ext) - self.window + 1):] if self.window > 1 else ext[:0]
+        return stats['mean'], stats.get('std')
+
+
+class Moments:
+    """Count, mean, variance, min and max of a stream (Chan et al. merge)"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        nb = len(values)
+        if nb == 0:
+            return
+        mean_b = values.mean()
+        m2_b = ((values - mean_b) ** 2).sum()
+        n = self.n + nb
+        delta = mean_b - self.mean
+        self.m2 += m2_b + delta * delta * self.n * nb / n
+        self.mean += delta * nb / n
+        self.n = n
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    def std(self):
+        return np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+
+
+class RegressionAccumulator:
+    """Least-squares slope of a stream against its row index (np.polyfit deg 1)"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.sxx = 0.0
+        self.sxy = 0.0
+
+    def update(self, y):
+        y = np.asarray(y, dtype=np.float64)
+        nb = len(y)
+        if nb == 0:
+            return
+        x = np.arange(self.n, self.n + nb, dtype=np.float64)
+        mx, my = x.mean(), y.mean()
+        sxx_b = ((x - mx) ** 2).sum()
+        sxy_b = ((x - mx) * (y - my)).sum()
+        n = self.n + nb
+        dx, dy = mx - self.mean_x, my - self.mean_y
+        self.sxx += sxx_b + dx * dx * self.n * nb / n
+        self.sxy += sxy_b + dx * dy * self.n * nb / n
+        self.mean_x += dx * nb / n
+        self.mean_y += dy * nb / n
+        self.n = n
+
+    def slope(self):
+        return self.sxy / self.sxx if self.n >= 2 and self.sxx > 0 else 0.0
+
+
+class LagCorrelation:
+    """Correlation of a stream with itself at every lag up to max_lag (pandas Series.autocorr)
+
+    Pair sums are kept per lag and come from one FFT per chunk; the last
+    max_lag values bridge chunks.
+    """
+
+    def __init__(self, max_lag):
+        self.max_lag = max_lag
+        self.tail = np.empty(0)
+        self.shift = None
+        self.sums = np.zeros((6, 1, max_lag + 1))  # n, Σa, Σb, Σa², Σb², Σab per lag
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        if self.shift is None:
+            self.shift = values[0]
+        ext = np.concatenate((self.tail, values - self.shift))
+        self.sums += lag_sums(ext, len(self.tail), self.max_lag)
+        self.tail = ext[-self.max_lag:]
+
+    def result(self):
+        """Correlations at lags 0..max_lag, NaN where there are too few pairs"""
+        return lag_correlation(self.sums)[0]
+
+
+class ReservoirSample:
+    """Uniform random sample of up to `size` rows of a stream (algorithm R)"""
+
+    def __init__(self, size, seed=42):
+        self.size = size
+        self.seen = 0
+        self.rows = None
+        self.filled = 0
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, rows):
+        rows = np.asarray(rows, dtype=np.float32)
+        if self.rows is None:
+            self.rows = np.empty((self.size, rows.shape[1]), dtype=np.float32)
+        take = min(len(rows), self.size - self.filled)
+        self.rows[self.filled:self.filled + take] = rows[:take]
+        self.filled += take
+        rest = rows[take:]
+        if len(rest):
+            positions = self.seen + take + np.arange(len(rest))
+            slots = (self.rng.random(len(rest)) * (positions + 1)).astype(np.int64)
+            keep = slots < self.size
+            self.rows[slots[keep]] = rest[keep]
+        self.seen += len(rows)
+
+    def sample(self):
+        return self.rows[:self.filled] if self.rows is not None else np.empty((0, 0), dtype=np.float32)
+
+
+class CorrelationAccumulator:
+    """Pairwise Pearson correlation across machines over shared timestamps
+
+    Matches DataFrame.corr() on a timestamp x machine pivot: each pair only
+    uses the timestamps where both machines have a value, via masked
+    cross-products. Blocks are (timestamps x machines) arrays with NaN for
+    missing values; new machines can appear in later blocks.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.shift = np.empty(0)
+        self.n = np.zeros((0, 0))
+        self.sx = np.zeros((0, 0))
+        self.sxx = np.zeros((0, 0))
+        self.sxy = np.zeros((0, 0))
+
+    def _grow(self, size):
+        pad = size - self.size
+        self.shift = np.concatenate((self.shift, np.full(pad, np.nan)))
+        for name in ('n', 'sx', 'sxx', 'sxy'):
+            setattr(self, name, np.pad(getattr(self, name), ((0, pad), (0, pad))))
+        self.size = size
+
+    def update(self, block):
+        if block.shape[1] > self.size:
+            self._grow(block.shape[1])
+        block = np.pad(block.astype(np.float64), ((0, 0), (0, self.size - block.shape[1])), constant_values=np.nan)
+        mask = ~np.isnan(block)
+
+        # Shift each machine by its first value to keep the sums well conditioned
+        unset = np.isnan(self.shift) & mask.any(axis=0)
+        if unset.any():
+            first = mask[:, unset].argmax(axis=0)
+            self.shift[unset] = block[first, np.flatnonzero(unset)]
+
+        x = np.where(mask, block - np.nan_to_num(self.shift), 0.0)
+        m = mask.astype(np.float64)
+        self.n += m.T @ m
+        self.sx += x.T @ m
+        self.sxx += (x * x).T @ m
+        self.sxy += x.T @ x
+
+    def matrix(self):
+        n, sx, sxx = self.n, self.sx, self.sxx
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariance = n * self.sxy - sx * sx.T
+            variance = (n * sxx - sx * sx) * (n * sxx.T - sx.T * sx.T)
+            corr = covariance / np.sqrt(variance)
+        corr[(n < 2) | ~(variance > 0)] = np.nan
+        np.fill_diagonal(corr, np.where(np.diag(n) >= 2, 1.0, np.nan))
+        return corr
+
+
+class _ByteRange(io.RawIOBase):
+    def __init__(self, f, start, stop):
+        self.f = f
+        self.f.seek(start)
+        self.remaining = stop - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self.remaining)
+        if n <= 0:
+            return 0
+        data = self.f.read(n)
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+def csv_end_offset(path):
+    """Byte offset just past the last complete line of a (possibly growing) CSV"""
+    with open(path, 'rb') as f:
+        pos = f.seek(0, io.SEEK_END)
+        while pos > 0:
+            step = min(1 << 16, pos)
+            f.seek(pos - step)
+            newline = f.read(step).rfind(b'\n')
+            if newline >= 0:
+                return pos - step + newline + 1
+            pos -= step
+    return 0
+
+
+def file_fingerprint(path, offset, size=1 << 16):
+    """Hash of the header block and of the bytes just before `offset`
+
+    Identifies the processed prefix of a growing file: appending rows keeps
+    the fingerprint, rewriting or truncating the file changes it.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        digest.update(f.read(min(size, offset)))
+        f.seek(max(0, offset - size))
+        digest.update(f.read(min(size, offset)))
+    return digest.hexdigest()
+
+
+def iter_csv_chunks(path, columns, dtypes=None, chunk_size=500_000, start=0, stop=None):
+    """Yield typed, time-ordered DataFrame chunks of a CSV byte range
+
+    Rows between byte offsets `start` (0 or the start of a line) and `stop`
+    (default: end of the last complete line) are parsed with pyarrow when
+    available, else the pandas C parser. Rows sharing the last timestamp of
+    a chunk are held back for the next chunk, so no timestamp is split
+    across chunks. Raises ValueError if the rows are not in time order.
+    """
+    with open(path, 'rb') as f:
+        names = f.readline().decode().strip().split(',')
+        header_end = f.tell()
+    start = max(start, header_end)
+    stop = csv_end_offset(path) if stop is None else stop
+    dtypes = {c: t for c, t in (dtypes or {}).items() if c in columns}
+    if start >= stop:
+        return
+
+    with open(path, 'rb') as f:
+        source = io.BufferedReader(_ByteRange(f, start, stop), buffer_size=1 << 20)
+        carry = None
+        last = None
+        for chunk in _parse_chunks(source, names, columns, dtypes, chunk_size):
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+            timestamps = chunk['timestamp'].values
+            if not chunk['timestamp'].is_monotonic_increasing or (last is not None and timestamps[0] < last):
+                raise ValueError(f"{path} is not in time order; out-of-core analysis needs time-ordered rows")
+            last = timestamps[-1]
+            hold = timestamps == last
+            carry = chunk[hold]
+            if not hold.all():
+                yield chunk[~hold].reset_index(drop=True)
+        if carry is not None and len(carry):
+            yield carry.reset_index(drop=True)
+
+
+def _parse_chunks(source, names, columns, dtypes, chunk_size):
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pv
+    except ImportError:
+        yield from pd.read_csv(source, names=names, header=None, usecols=columns, dtype=dtypes,
+                               parse_dates=['timestamp'], chunksize=chunk_size)
+        return
+
+    # Categories are read as strings and converted per chunk, giving the same
+    # dtypes as the pandas reader
+    arrow_types = {'category': pa.string(), 'float32': pa.float32()}
+    column_types = {c: arrow_types[kind] for c, kind in dtypes.items()}
+    column_types['timestamp'] = pa.timestamp('ms')
+    # Small blocks keep the reader's readahead (a few blocks) cheap; they
+    # are combined into chunks of about chunk_size rows
+    read_options = pv.ReadOptions(column_names=names, block_size=1 << 20)
+    convert_options = pv.ConvertOptions(include_columns=columns, column_types=column_types)
+    batches, rows = [], 0
+    for batch in pv.open_csv(source, read_options=read_options, convert_options=convert_options):
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= chunk_size:
+            yield pa.Table.from_batches(batches).to_pandas().astype(dtypes)
+            batches, rows = [], 0
+    if batches:
+        yield pa.Table.from_batches(batches).to_pandas().astype(dtypes)
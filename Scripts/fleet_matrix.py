@@ -0,0 +1,93 @@
+"""
+Dense timestamp x machine view of a long-format energy frame
+Built once per load and shared by the fleet-level analyses, so none of them
+has to group or pivot the long frame again
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from correlation_engine import block_correlation, correlation_summary
+
+QUANTITIES = ['power', 'current', 'voltage', 'powerFactor']
+
+
+class FleetMatrix:
+    """Aligned float32 (timestamps x machines) arrays per quantity
+
+    Cells without a reading are NaN and False in `mask`. With a directory,
+    the arrays are memory-mapped .npy files there instead of RAM.
+    """
+
+    def __init__(self, timestamps, machines, values, mask):
+        self.timestamps = timestamps
+        self.machines = machines
+        self.values = values
+        self.mask = mask
+
+    @classmethod
+    def from_frame(cls, df, columns=None, directory=None):
+        columns = [c for c in (columns or QUANTITIES) if c in df.columns]
+        ts_codes, timestamps = pd.factorize(df['timestamp'], sort=True)
+        machine_codes, machines = pd.factorize(df['machineId'], sort=True)
+        shape = (len(timestamps), len(machines))
+        cells = ts_codes.astype(np.int64) * shape[1] + machine_codes
+
+        def allocate(name, dtype, fill):
+            if directory is None:
+                return np.full(shape, fill, dtype=dtype)
+            array = np.lib.format.open_memmap(os.path.join(directory, f'{name}.npy'), mode='w+',
+                                              dtype=dtype, shape=shape)
+            array[:] = fill
+            return array
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        mask = allocate('mask', bool, False)
+        mask.reshape(-1)[cells] = True
+        values = {}
+        for c in columns:
+            values[c] = allocate(c, np.float32, np.nan)
+            values[c].reshape(-1)[cells] = df[c].values
+        matrix = cls(np.asarray(timestamps), [str(m) for m in machines], values, mask)
+        if directory is not None:
+            matrix._save_index(directory)
+        return matrix
+
+    @classmethod
+    def open(cls, directory):
+        """Memory-map a matrix written by from_frame(..., directory)"""
+        with open(os.path.join(directory, 'index.json')) as f:
+            index = json.load(f)
+        timestamps = np.load(os.path.join(directory, 'timestamps.npy'))
+        values = {c: np.load(os.path.join(directory, f'{c}.npy'), mmap_mode='r') for c in index['columns']}
+        return cls(timestamps, index['machines'], values, np.load(os.path.join(directory, 'mask.npy'), mmap_mode='r'))
+
+    def _save_index(self, directory):
+        np.save(os.path.join(directory, 'timestamps.npy'), self.timestamps)
+        with open(os.path.join(directory, 'index.json'), 'w') as f:
+            json.dump({'machines': self.machines, 'columns': list(self.values)}, f)
+
+    def total(self, column, block_rows=100_000):
+        """Sum over machines per timestamp (missing readings count as 0)"""
+        values = self.values[column]
+        return np.concatenate([np.nansum(values[i:i + block_rows], axis=1, dtype=np.float64)
+                               for i in range(0, len(values), block_rows)] or [np.empty(0)])
+
+    def corr(self, column):
+        """Full machines x machines Pearson correlation, like DataFrame.corr() on a pivot"""
+        everyone = np.arange(len(self.machines))
+        corr = block_correlation(self.values[column], everyone, everyone)
+        np.fill_diagonal(corr, np.where(self.mask.sum(axis=0) >= 2, 1.0, np.nan))
+        return corr
+
+    def correlation(self, column, **options):
+        """Average, threshold count and strongest pairs of the machine correlations
+
+        Options go to correlation_engine.correlation_summary; fleets above
+        BLOCK_MACHINES machines are processed in blocks.
+        """
+        return correlation_summary(self.values[column], **options)
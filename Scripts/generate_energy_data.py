@@ -7,6 +7,232 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import argparse
+import itertools
+import time
+
+from generation_utils import (STREAM_DATA, STREAM_FLEET, STREAM_SCHEDULE, ColumnarDatasetWriter,
+                              aligned_ranges, columnar_output_path, fleet_parameter, load_fleet_spec,
+                              ordered_parallel_map, read_csv_edges, resolve_seed, sampling_step, stream_rng)
+
+DEFAULT_CHUNK_ROWS = 500_000
+
+DEFAULT_MACHINES = [
+    {'id': 'M001', 'name': 'CNC Maschine 1', 'base_load': 15, 'peak_load': 45, 'type': 'CNC'},
+    {'id': 'M002', 'name': 'CNC Maschine 2', 'base_load': 18, 'peak_load': 50, 'type': 'CNC'},
+    {'id': 'M003', 'name': 'Schweißroboter 1', 'base_load': 8, 'peak_load': 35, 'type': 'Welding'},
+    {'id': 'M004', 'name': 'Fördersystem', 'base_load': 5, 'peak_load': 12, 'type': 'Conveyor'},
+    {'id': 'M005', 'name': 'Kompressor 1', 'base_load': 20, 'peak_load': 60, 'type': 'Compressor'},
+    {'id': 'M006', 'name': 'Lackierroboter', 'base_load': 10, 'peak_load': 30, 'type': 'Painting'},
+    {'id': 'M007', 'name': 'Presse 1', 'base_load': 25, 'peak_load': 75, 'type': 'Press'},
+    {'id': 'M008', 'name': 'Schweißroboter 2', 'base_load': 8, 'peak_load': 35, 'type': 'Welding'},
+    {'id': 'M009', 'name': 'CNC Maschine 3', 'base_load': 16, 'peak_load': 48, 'type': 'CNC'},
+    {'id': 'M010', 'name': 'Kompressor 2', 'base_load': 22, 'peak_load': 65, 'type': 'Compressor'},
+    {'id': 'M011', 'name': 'Presse 2', 'base_load': 24, 'peak_load': 72, 'type': 'Press'},
+    {'id': 'M012', 'name': 'Montagestation 1', 'base_load': 6, 'peak_load': 18, 'type': 'Assembly'},
+    {'id': 'M013', 'name': 'Montagestation 2', 'base_load': 6, 'peak_load': 18, 'type': 'Assembly'},
+    {'id': 'M014', 'name': 'Ofen 1', 'base_load': 30, 'peak_load': 80, 'type': 'Furnace'},
+    {'id': 'M015', 'name': 'Ofen 2', 'base_load': 28, 'peak_load': 75, 'type': 'Furnace'},
+    {'id': 'M016', 'name': 'CNC Maschine 4', 'base_load': 17, 'peak_load': 52, 'type': 'CNC'},
+    {'id': 'M017', 'name': 'Schleifmaschine', 'base_load': 12, 'peak_load': 35, 'type': 'Grinding'},
+    {'id': 'M018', 'name': 'Laserschneider', 'base_load': 20, 'peak_load': 55, 'type': 'Laser'},
+    {'id': 'M019', 'name': 'Kühlsystem', 'base_load': 15, 'peak_load': 45, 'type': 'Cooling'},
+    {'id': 'M020', 'name': 'Druckluftsystem', 'base_load': 18, 'peak_load': 50, 'type': 'Pneumatic'}
+]
+
+# Compact typed layout for Parquet/Feather output
+COLUMNAR_SCHEMA = [
+    ('timestamp', 'timestamp'),
+    ('machine_id', 'category'),
+    ('machine_name', 'category'),
+    ('machine_type', 'category'),
+    ('consumption_kwh', 'float32'),
+    ('efficiency', 'float32'),
+    ('days_in_operation', 'int16'),
+    ('seasonal_factor', 'float32'),
+    ('temperature_celsius', 'float32'),
+    ('is_working_hours', 'bool'),
+    ('is_weekend', 'bool'),
+    ('is_holiday', 'bool'),
+    ('is_maintenance', 'bool'),
+    ('hour', 'int8'),
+    ('day_of_week', 'int8'),
+    ('month', 'int8'),
+    ('anomaly', 'bool'),
+]
+NS_PER_DAY = 24 * 60 * 60 * 10**9
+EMPTY_WINDOWS = np.array([], dtype=np.int64)
+
+
+class CalendarIndex:
+    """Per-day holiday/shutdown flags and per-machine maintenance windows
+    
+    Built once per run so that the loop engine gets O(1) / O(log n) lookups
+    and the vectorized engine gets whole-range boolean masks.
+    """
+    
+    def __init__(self, start_date, end_date, holidays, shutdown_days,
+                 maintenance_schedule, machine_ids):
+        self.origin = pd.Timestamp(start_date).normalize()
+        num_days = (pd.Timestamp(end_date).normalize() - self.origin).days + 1
+        
+        self.holiday = np.zeros(num_days, dtype=bool)
+        self.shutdown = np.zeros(num_days, dtype=bool)
+        for flags, days in ((self.holiday, holidays), (self.shutdown, shutdown_days)):
+            offsets = np.array([(pd.Timestamp(d).normalize() - self.origin).days for d in days], dtype=np.int64)
+            offsets = offsets[(offsets >= 0) & (offsets < num_days)]
+            flags[offsets] = True
+        self.closed = self.holiday | self.shutdown
+        
+        # Maintenance windows as sorted [start, end) arrays in ns per machine
+        windows = {machine_id: [] for machine_id in machine_ids}
+        for maint in maintenance_schedule:
+            start = pd.Timestamp(maint['date']).value
+            end = start + maint['duration_hours'] * 3600 * 10**9
+            windows.setdefault(maint['machine_id'], []).append((start, end))
+        self.maintenance = {}
+        for machine_id, spans in windows.items():
+            spans = np.array(sorted(spans), dtype=np.int64).reshape(-1, 2)
+            self.maintenance[machine_id] = (spans[:, 0], spans[:, 1])
+        
+        # Flat copy of all windows for fleet-wide masks
+        self.window_machines = np.array([m for m, spans in windows.items() for _ in spans], dtype=object)
+        self.window_starts = np.array([start for spans in windows.values() for start, _ in spans], dtype=np.int64)
+        self.window_ends = np.array([end for spans in windows.values() for _, end in spans], dtype=np.int64)
+    
+    def _day_offsets(self, timestamps):
+        return (np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64) - self.origin.value) // NS_PER_DAY
+    
+    def is_closed(self, timestamp):
+        """Check a single timestamp against holiday and shutdown flags"""
+        offset = (timestamp.value - self.origin.value) // NS_PER_DAY
+        return bool(0 <= offset < len(self.closed) and self.closed[offset])
+    
+    def closed_mask(self, timestamps):
+        """Holiday/shutdown mask for an array of timestamps"""
+        offsets = self._day_offsets(timestamps)
+        valid = (offsets >= 0) & (offsets < len(self.closed))
+        mask = np.zeros(len(offsets), dtype=bool)
+        mask[valid] = self.closed[offsets[valid]]
+        return mask
+    
+    def is_maintenance(self, timestamp, machine_id):
+        """Check a single timestamp against the machine's maintenance windows"""
+        starts, ends = self.maintenance.get(machine_id, (EMPTY_WINDOWS, EMPTY_WINDOWS))
+        i = np.searchsorted(starts, timestamp.value, side='right') - 1
+        return bool(i >= 0 and timestamp.value < ends[i])
+    
+    def maintenance_mask(self, timestamps, machine_id):
+        """Maintenance mask of one machine for an array of timestamps"""
+        values = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+        starts, ends = self.maintenance.get(machine_id, (EMPTY_WINDOWS, EMPTY_WINDOWS))
+        if len(starts) == 0:
+            return np.zeros(len(values), dtype=bool)
+        i = np.searchsorted(starts, values, side='right') - 1
+        return (i >= 0) & (values < ends[np.maximum(i, 0)])
+    
+    def maintenance_grid(self, timestamps, machine_ids):
+        """Interval x machine maintenance mask for sorted timestamps
+        
+        Only the windows overlapping the timestamp range are visited, so the
+        cost does not grow with the fleet size.
+        """
+        values = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+        grid = np.zeros((len(values), len(machine_ids)), dtype=bool)
+        if len(values) == 0:
+            return grid
+        columns = {machine_id: j for j, machine_id in enumerate(machine_ids)}
+        overlapping = (self.window_starts <= values[-1]) & (self.window_ends > values[0])
+        for machine_id, start, end in zip(self.window_machines[overlapping], self.window_starts[overlapping],
+                                          self.window_ends[overlapping]):
+            if machine_id in columns:
+                lo, hi = np.searchsorted(values, [start, end])
+                grid[lo:hi, columns[machine_id]] = True
+        return grid
+
+
+class DatasetStatistics:
+    """Summary statistics accumulated chunk by chunk"""
+    
+    def __init__(self):
+        self.total_records = 0
+        self.anomalies = 0
+        self.maintenance_points = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.holiday_days = set()
+        self.consumption = None  # per machine_id: count, mean, M2, min, max
+        self.seasonal = {}  # month -> [sum, count]
+    
+    def update(self, df):
+        if df.empty:
+            return
+        self.total_records += len(df)
+        self.anomalies += int(df['anomaly'].sum())
+        self.maintenance_points += int(df['is_maintenance'].sum())
+        
+        first, last = df['timestamp'].min(), df['timestamp'].max()
+        self.first_timestamp = first if self.first_timestamp is None else min(self.first_timestamp, first)
+        self.last_timestamp = last if self.last_timestamp is None else max(self.last_timestamp, last)
+        self.holiday_days.update(df.loc[df['is_holiday'], 'timestamp'].dt.normalize().unique())
+        
+        # Merge per-machine moments (Chan et al. parallel variance), vectorized over the fleet
+        grouped = df.groupby('machine_id')['consumption_kwh'].agg(['count', 'mean', 'var', 'min', 'max'])
+        chunk = pd.DataFrame({
+            'count': grouped['count'].astype(float), 'mean': grouped['mean'],
+            'm2': (grouped['var'] * (grouped['count'] - 1)).fillna(0.0),
+            'min': grouped['min'], 'max': grouped['max']
+        })
+        if self.consumption is None:
+            self.consumption = chunk
+        else:
+            prev = self.consumption.reindex(self.consumption.index.union(chunk.index))
+            chunk = chunk.reindex(prev.index)
+            n_a, n_b = prev['count'].fillna(0), chunk['count'].fillna(0)
+            n = n_a + n_b
+            delta = chunk['mean'].fillna(0) - prev['mean'].fillna(0)
+            self.consumption = pd.DataFrame({
+                'count': n,
+                'mean': (prev['mean'].fillna(0) * n_a + chunk['mean'].fillna(0) * n_b) / n,
+                'm2': prev['m2'].fillna(0) + chunk['m2'].fillna(0) + delta ** 2 * n_a * n_b / n,
+                'min': np.fmin(prev['min'], chunk['min']),
+                'max': np.fmax(prev['max'], chunk['max'])
+            })
+        
+        monthly = df.groupby('month')['seasonal_factor'].agg(['sum', 'count'])
+        for month, row in monthly.iterrows():
+            total, count = self.seasonal.get(month, (0.0, 0))
+            self.seasonal[month] = (total + row['sum'], count + row['count'])
+    
+    def consumption_summary(self):
+        summary = self.consumption.sort_index()
+        return pd.DataFrame({
+            'count': summary['count'], 'mean': summary['mean'],
+            'std': np.sqrt(summary['m2'] / (summary['count'] - 1)).where(summary['count'] > 1),
+            'min': summary['min'], 'max': summary['max']
+        }).rename_axis('machine_id')
+    
+    def report(self, include_seasonal_variation=True):
+        print("\n" + "="*60)
+        print("DATASET STATISTICS")
+        print("="*60)
+        print(f"Total records: {self.total_records:,}")
+        print(f"Date range: {self.first_timestamp} to {self.last_timestamp}")
+        print(f"Machines: {0 if self.consumption is None else len(self.consumption)}")
+        print(f"Anomalies: {self.anomalies:,} ({self.anomalies/max(self.total_records, 1)*100:.2f}%)")
+        print(f"Holidays/Shutdowns: {len(self.holiday_days)} days")
+        print(f"Maintenance periods: {self.maintenance_points:,} data points")
+        
+        print("\nConsumption statistics (kWh):")
+        print(self.consumption_summary().round(2))
+        
+        if include_seasonal_variation:
+            print("\nSeasonal variation:")
+            monthly_avg = pd.Series({month: total / count for month, (total, count) in sorted(self.seasonal.items())},
+                                    name='seasonal_factor').rename_axis('month')
+            print(monthly_avg.round(3))
+        
+        print("="*60)
+
 
 class EnergyDataGenerator:
     """Generate realistic energy consumption data for shop floor machines"""
@@ -14,7 +240,8 @@ class EnergyDataGenerator:
     def __init__(self, start_date, days, interval_minutes, num_machines, 
                  include_anomalies=True, anomaly_rate=0.02, include_degradation=True,
                  degradation_rate=0.001, include_seasonal_variation=True,
-                 include_maintenance_downtime=True):
+                 include_maintenance_downtime=True, engine='loop', seed=None, workers=1,
+                 fleet_spec=None):
         self.start_date = pd.to_datetime(start_date)
         self.days = days
         self.interval_minutes = interval_minutes
@@ -25,130 +252,143 @@ class EnergyDataGenerator:
         self.degradation_rate = degradation_rate
         self.include_seasonal_variation = include_seasonal_variation
         self.include_maintenance_downtime = include_maintenance_downtime
-        
-        # Define machine configurations FIRST
-        base_machines = [
-            {'id': 'M001', 'name': 'CNC Maschine 1', 'base_load': 15, 'peak_load': 45, 'type': 'CNC'},
-            {'id': 'M002', 'name': 'CNC Maschine 2', 'base_load': 18, 'peak_load': 50, 'type': 'CNC'},
-            {'id': 'M003', 'name': 'Schweißroboter 1', 'base_load': 8, 'peak_load': 35, 'type': 'Welding'},
-            {'id': 'M004', 'name': 'Fördersystem', 'base_load': 5, 'peak_load': 12, 'type': 'Conveyor'},
-            {'id': 'M005', 'name': 'Kompressor 1', 'base_load': 20, 'peak_load': 60, 'type': 'Compressor'},
-            {'id': 'M006', 'name': 'Lackierroboter', 'base_load': 10, 'peak_load': 30, 'type': 'Painting'},
-            {'id': 'M007', 'name': 'Presse 1', 'base_load': 25, 'peak_load': 75, 'type': 'Press'},
-            {'id': 'M008', 'name': 'Schweißroboter 2', 'base_load': 8, 'peak_load': 35, 'type': 'Welding'},
-            {'id': 'M009', 'name': 'CNC Maschine 3', 'base_load': 16, 'peak_load': 48, 'type': 'CNC'},
-            {'id': 'M010', 'name': 'Kompressor 2', 'base_load': 22, 'peak_load': 65, 'type': 'Compressor'},
-            {'id': 'M011', 'name': 'Presse 2', 'base_load': 24, 'peak_load': 72, 'type': 'Press'},
-            {'id': 'M012', 'name': 'Montagestation 1', 'base_load': 6, 'peak_load': 18, 'type': 'Assembly'},
-            {'id': 'M013', 'name': 'Montagestation 2', 'base_load': 6, 'peak_load': 18, 'type': 'Assembly'},
-            {'id': 'M014', 'name': 'Ofen 1', 'base_load': 30, 'peak_load': 80, 'type': 'Furnace'},
-            {'id': 'M015', 'name': 'Ofen 2', 'base_load': 28, 'peak_load': 75, 'type': 'Furnace'},
-            {'id': 'M016', 'name': 'CNC Maschine 4', 'base_load': 17, 'peak_load': 52, 'type': 'CNC'},
-            {'id': 'M017', 'name': 'Schleifmaschine', 'base_load': 12, 'peak_load': 35, 'type': 'Grinding'},
-            {'id': 'M018', 'name': 'Laserschneider', 'base_load': 20, 'peak_load': 55, 'type': 'Laser'},
-            {'id': 'M019', 'name': 'Kühlsystem', 'base_load': 15, 'peak_load': 45, 'type': 'Cooling'},
-            {'id': 'M020', 'name': 'Druckluftsystem', 'base_load': 18, 'peak_load': 50, 'type': 'Pneumatic'}
-        ]
-        
-        self.machine_configs = base_machines[:num_machines]
+        self.engine = engine
+        self.workers = workers
+        
+        # Reproducibility: one run entropy, independent streams per time block
+        self.seed = resolve_seed(seed)
+        self.intervals_per_block = max(1, 60 // interval_minutes)  # one block per hour
+        
+        # Machine fleet: default list or a fleet spec file, kept as
+        # structure-of-arrays for the vectorized engine
+        self.machine_configs = self._build_machine_configs(num_machines, fleet_spec)
+        self.num_machines = len(self.machine_configs)
+        self.fleet = {
+            key: np.array([m[key] for m in self.machine_configs], dtype=dtype)
+            for key, dtype in (('id', object), ('name', object), ('type', object),
+                               ('base_load', float), ('peak_load', float))
+        }
+        self.fleet['type_code'] = pd.factorize(self.fleet['type'])[0].astype(np.int16)
         
         # NOW generate holidays and maintenance (after machine_configs is set)
-        self.holidays = self._generate_holidays()
+        public_holidays = self._generate_holidays()
+        shutdown_days = self._generate_shutdown_days()
+        self.holidays = public_holidays | shutdown_days
         self.maintenance_schedule = self._generate_maintenance_schedule() if include_maintenance_downtime else []
         
-        # Define machine configurations (expandable)
-        base_machines = [
-            {'id': 'M001', 'name': 'CNC Maschine 1', 'base_load': 15, 'peak_load': 45, 'type': 'CNC'},
-            {'id': 'M002', 'name': 'CNC Maschine 2', 'base_load': 18, 'peak_load': 50, 'type': 'CNC'},
-            {'id': 'M003', 'name': 'Schweißroboter 1', 'base_load': 8, 'peak_load': 35, 'type': 'Welding'},
-            {'id': 'M004', 'name': 'Fördersystem', 'base_load': 5, 'peak_load': 12, 'type': 'Conveyor'},
-            {'id': 'M005', 'name': 'Kompressor 1', 'base_load': 20, 'peak_load': 60, 'type': 'Compressor'},
-            {'id': 'M006', 'name': 'Lackierroboter', 'base_load': 10, 'peak_load': 30, 'type': 'Painting'},
-            {'id': 'M007', 'name': 'Presse 1', 'base_load': 25, 'peak_load': 75, 'type': 'Press'},
-            {'id': 'M008', 'name': 'Schweißroboter 2', 'base_load': 8, 'peak_load': 35, 'type': 'Welding'},
-            {'id': 'M009', 'name': 'CNC Maschine 3', 'base_load': 16, 'peak_load': 48, 'type': 'CNC'},
-            {'id': 'M010', 'name': 'Kompressor 2', 'base_load': 22, 'peak_load': 65, 'type': 'Compressor'},
-            {'id': 'M011', 'name': 'Presse 2', 'base_load': 24, 'peak_load': 72, 'type': 'Press'},
-            {'id': 'M012', 'name': 'Montagestation 1', 'base_load': 6, 'peak_load': 18, 'type': 'Assembly'},
-            {'id': 'M013', 'name': 'Montagestation 2', 'base_load': 6, 'peak_load': 18, 'type': 'Assembly'},
-            {'id': 'M014', 'name': 'Ofen 1', 'base_load': 30, 'peak_load': 80, 'type': 'Furnace'},
-            {'id': 'M015', 'name': 'Ofen 2', 'base_load': 28, 'peak_load': 75, 'type': 'Furnace'},
-            {'id': 'M016', 'name': 'CNC Maschine 4', 'base_load': 17, 'peak_load': 52, 'type': 'CNC'},
-            {'id': 'M017', 'name': 'Schleifmaschine', 'base_load': 12, 'peak_load': 35, 'type': 'Grinding'},
-            {'id': 'M018', 'name': 'Laserschneider', 'base_load': 20, 'peak_load': 55, 'type': 'Laser'},
-            {'id': 'M019', 'name': 'Kühlsystem', 'base_load': 15, 'peak_load': 45, 'type': 'Cooling'},
-            {'id': 'M020', 'name': 'Druckluftsystem', 'base_load': 18, 'peak_load': 50, 'type': 'Pneumatic'}
-        ]
-        
-        self.machine_configs = base_machines[:num_machines]
-        
-        # NOW generate holidays and maintenance (after machine_configs is set)
-        self.holidays = self._generate_holidays()
-        self.maintenance_schedule = self._generate_maintenance_schedule() if include_maintenance_downtime else []
+        # Lookup structures shared by all engines, built once per run
+        self.calendar = CalendarIndex(
+            self.start_date, self.start_date + pd.Timedelta(days=self.days),
+            public_holidays, shutdown_days, self.maintenance_schedule,
+            [m['id'] for m in self.machine_configs]
+        )
+    
+    def _build_machine_configs(self, num_machines, fleet_spec):
+        """Machine list from a fleet spec, or the default plant (cycled beyond 20 machines)"""
+        if fleet_spec is None:
+            width = max(3, len(str(num_machines)))  # ids sort in fleet order
+            configs = []
+            for i in range(num_machines):
+                template = DEFAULT_MACHINES[i % len(DEFAULT_MACHINES)]
+                copy = i // len(DEFAULT_MACHINES)
+                configs.append(dict(template, id=f'M{i + 1:0{width}d}',
+                                    name=template['name'] if copy == 0 else f"{template['name']} #{copy + 1}"))
+            return configs
+        
+        templates = load_fleet_spec(fleet_spec) if isinstance(fleet_spec, str) else fleet_spec
+        width = max(3, len(str(sum(template['count'] for template in templates))))
+        rng = stream_rng(self.seed, STREAM_FLEET)
+        configs = []
+        for template in templates:
+            count = template['count']
+            base_load = fleet_parameter(template, 'base_load', count, rng)
+            peak_load = fleet_parameter(template, 'peak_load', count, rng)
+            name = template.get('name', template['type'])
+            for k in range(count):
+                configs.append({
+                    'id': f'M{len(configs) + 1:0{width}d}',
+                    'name': f'{name} {k + 1}',
+                    'base_load': round(float(base_load[k]), 2),
+                    'peak_load': round(float(max(peak_load[k], base_load[k])), 2),
+                    'type': template['type']
+                })
+        return configs
+    
+    def _simulated_years(self):
+        """Calendar years touched by the simulated range"""
+        end_date = self.start_date + pd.Timedelta(days=self.days)
+        return range(self.start_date.year, end_date.year + 1)
     
     def _generate_holidays(self):
-        """Generate public holidays and factory shutdown periods"""
-        year = self.start_date.year
+        """Generate public holidays for every simulated year"""
         holidays = []
         
-        # German public holidays (simplified)
-        holidays.extend([
-            pd.Timestamp(f'{year}-01-01'),  # Neujahr
-            pd.Timestamp(f'{year}-05-01'),  # Tag der Arbeit
-            pd.Timestamp(f'{year}-10-03'),  # Tag der Deutschen Einheit
-            pd.Timestamp(f'{year}-12-24'),  # Heiligabend
-            pd.Timestamp(f'{year}-12-25'),  # 1. Weihnachtsfeiertag
-            pd.Timestamp(f'{year}-12-26'),  # 2. Weihnachtsfeiertag
-            pd.Timestamp(f'{year}-12-31'),  # Silvester
-        ])
-        
-        # Summer shutdown (Betriebsferien) - 2 weeks in August
-        summer_start = pd.Timestamp(f'{year}-08-01')
-        for i in range(14):
-            holidays.append(summer_start + pd.Timedelta(days=i))
-        
-        # Christmas shutdown - last week of year
-        christmas_start = pd.Timestamp(f'{year}-12-27')
-        for i in range(5):
-            holidays.append(christmas_start + pd.Timedelta(days=i))
+        for year in self._simulated_years():
+            # German public holidays (simplified)
+            holidays.extend([
+                pd.Timestamp(f'{year}-01-01'),  # Neujahr
+                pd.Timestamp(f'{year}-05-01'),  # Tag der Arbeit
+                pd.Timestamp(f'{year}-10-03'),  # Tag der Deutschen Einheit
+                pd.Timestamp(f'{year}-12-24'),  # Heiligabend
+                pd.Timestamp(f'{year}-12-25'),  # 1. Weihnachtsfeiertag
+                pd.Timestamp(f'{year}-12-26'),  # 2. Weihnachtsfeiertag
+                pd.Timestamp(f'{year}-12-31'),  # Silvester
+            ])
         
         return set(holidays)
     
+    def _generate_shutdown_days(self):
+        """Generate factory shutdown periods for every simulated year"""
+        shutdown_days = []
+        
+        for year in self._simulated_years():
+            # Summer shutdown (Betriebsferien) - 2 weeks in August
+            summer_start = pd.Timestamp(f'{year}-08-01')
+            for i in range(14):
+                shutdown_days.append(summer_start + pd.Timedelta(days=i))
+            
+            # Christmas shutdown - last week of year
+            christmas_start = pd.Timestamp(f'{year}-12-27')
+            for i in range(5):
+                shutdown_days.append(christmas_start + pd.Timedelta(days=i))
+        
+        return set(shutdown_days)
+    
     def _generate_maintenance_schedule(self):
         """Generate planned maintenance windows for machines"""
         schedule = []
         
         # Each machine gets quarterly maintenance (4 times per year)
-        for machine in self.machine_configs:
-            for quarter in range(4):
-                # Maintenance in first week of: Jan, Apr, Jul, Oct
-                maintenance_month = quarter * 3 + 1
-                maintenance_day = np.random.randint(1, 8)  # Random day in first week
-                
-                maintenance_date = pd.Timestamp(f'{self.start_date.year}-{maintenance_month:02d}-{maintenance_day:02d}')
-                
-                # Only add if within our simulation period
-                if self.start_date <= maintenance_date <= (self.start_date + pd.Timedelta(days=self.days)):
-                    schedule.append({
-                        'machine_id': machine['id'],
-                        'date': maintenance_date,
-                        'duration_hours': np.random.randint(4, 12)  # 4-12 hours maintenance
-                    })
+        for index, machine in enumerate(self.machine_configs):
+            for year in self._simulated_years():
+                # One stream per machine and year, so the windows of a year do not
+                # depend on which other years the run covers (appends stay identical)
+                rng = stream_rng(self.seed, STREAM_SCHEDULE, index, year)
+                for quarter in range(4):
+                    # Maintenance in first week of: Jan, Apr, Jul, Oct
+                    maintenance_month = quarter * 3 + 1
+                    maintenance_day = int(rng.integers(1, 8))  # Random day in first week
+                    duration_hours = int(rng.integers(4, 12))  # 4-12 hours maintenance
+                    
+                    maintenance_date = pd.Timestamp(f'{year}-{maintenance_month:02d}-{maintenance_day:02d}')
+                    
+                    # Only add if within our simulation period
+                    if self.start_date <= maintenance_date <= (self.start_date + pd.Timedelta(days=self.days)):
+                        schedule.append({
+                            'machine_id': machine['id'],
+                            'date': maintenance_date,
+                            'duration_hours': duration_hours
+                        })
         
         return schedule
     
     def _is_holiday(self, timestamp):
-        """Check if date is a holiday"""
-        return timestamp.date() in [h.date() for h in self.holidays]
+        """Check if date is a holiday or shutdown day"""
+        return self.calendar.is_closed(timestamp)
     
     def _is_maintenance(self, timestamp, machine_id):
         """Check if machine is under maintenance"""
-        for maint in self.maintenance_schedule:
-            if maint['machine_id'] == machine_id:
-                if (timestamp.date() == maint['date'].date() and 
-                    0 <= timestamp.hour < maint['duration_hours']):
-                    return True
-        return False
+        return self.calendar.is_maintenance(timestamp, machine_id)
     
     def _get_seasonal_factor(self, timestamp):
         """Calculate seasonal variation factor for production"""
@@ -167,13 +407,21 @@ class EnergyDataGenerator:
             seasonal_curve *= 0.4
         
         return max(0.3, seasonal_curve)  # Never below 30%
-        
+
+    def _get_seasonal_factors(self, timestamps):
+        """Vectorized seasonal factor for a DatetimeIndex (see _get_seasonal_factor)"""
+        month = timestamps.month.values
+        seasonal_curve = 1.0 + 0.2 * np.sin((timestamps.dayofyear.values - 60) / 365 * 2 * np.pi)
+        seasonal_curve = np.where(month == 8, seasonal_curve * 0.6, seasonal_curve)
+        seasonal_curve = np.where((month == 12) & (timestamps.day.values > 20), seasonal_curve * 0.4, seasonal_curve)
+        return np.maximum(0.3, seasonal_curve)
+
     def _calculate_temperature(self, timestamp):
         """Simulate seasonal temperature variation"""
         day_of_year = timestamp.timetuple().tm_yday
         # Seasonal variation + daily random variation
         base_temp = 15 + 10 * np.sin((day_of_year / 365) * 2 * np.pi)
-        return base_temp + np.random.uniform(-2.5, 2.5)
+        return base_temp + self.rng.uniform(-2.5, 2.5)
     
     def _calculate_consumption(self, timestamp, machine, days_elapsed):
         """Calculate realistic consumption based on time, machine type, and degradation"""
@@ -187,7 +435,7 @@ class EnergyDataGenerator:
         is_working_hours = (hour >= 6 and hour < 22 and not is_weekend and not is_holiday)
         
         # Some weekend shifts (20% chance)
-        weekend_shift = is_weekend and (6 <= hour < 14) and np.random.random() < 0.2
+        weekend_shift = is_weekend and (6 <= hour < 14) and self.rng.random() < 0.2
         if weekend_shift:
             is_working_hours = True
         
@@ -209,24 +457,24 @@ class EnergyDataGenerator:
             
             # Peak production hours (9-17)
             if 9 <= hour < 17:
-                peak_factor = 0.7 + np.random.uniform(0, 0.3)
+                peak_factor = 0.7 + self.rng.uniform(0, 0.3)
                 peak_factor *= seasonal_factor  # Adjust for season
                 consumption = machine['base_load'] + (machine['peak_load'] - machine['base_load']) * peak_factor
             else:
                 # Ramp up/down periods
-                ramp_factor = 0.3 + np.random.uniform(0, 0.2)
+                ramp_factor = 0.3 + self.rng.uniform(0, 0.2)
                 ramp_factor *= seasonal_factor
                 consumption = machine['base_load'] + (machine['peak_load'] - machine['base_load']) * ramp_factor
         else:
             # Standby mode
-            consumption = machine['base_load'] * (0.2 + np.random.uniform(0, 0.1))
+            consumption = machine['base_load'] * (0.2 + self.rng.uniform(0, 0.1))
             
             # Occasional late-night maintenance or cleaning
-            if np.random.random() < 0.05:
+            if self.rng.random() < 0.05:
                 consumption = machine['base_load'] * 0.5
         
         # Add realistic noise
-        consumption *= (0.95 + np.random.uniform(0, 0.1))
+        consumption *= (0.95 + self.rng.uniform(0, 0.1))
         
         # Apply degradation/regression over time (gradual efficiency loss)
         if self.include_degradation:
@@ -238,7 +486,7 @@ class EnergyDataGenerator:
     
     def _add_anomaly(self, consumption, machine):
         """Inject anomalies into the data"""
-        anomaly_type = np.random.choice(['overload', 'failure', 'partial_failure'])
+        anomaly_type = self.rng.choice(['overload', 'failure', 'partial_failure'])
         
         if anomaly_type == 'overload':
             return machine['peak_load'] * 1.5
@@ -247,20 +495,84 @@ class EnergyDataGenerator:
         else:  # partial_failure
             return machine['peak_load'] * 0.3
     
-    def generate(self):
+    def generate(self, chunk_rows=DEFAULT_CHUNK_ROWS):
         """Generate the complete dataset"""
-        data = []
+        return pd.concat(list(self.iter_chunks(chunk_rows)), ignore_index=True)
+    
+    def iter_chunks(self, chunk_rows=DEFAULT_CHUNK_ROWS, first_interval=0):
+        """Generate the dataset as DataFrame chunks of about chunk_rows rows
         
+        `first_interval` skips the leading intervals, e.g. when appending to
+        an existing dataset; the remaining rows are identical to a full run.
+        """
         total_minutes = self.days * 24 * 60
         num_intervals = total_minutes // self.interval_minutes
+        intervals_per_chunk = max(1, chunk_rows // max(1, len(self.machine_configs)))
+        first_timestamp = self.start_date + timedelta(minutes=first_interval * self.interval_minutes)
         
         print(f"Generating data...")
-        print(f"  Date range: {self.start_date.date()} to {(self.start_date + timedelta(days=self.days)).date()}")
+        print(f"  Date range: {first_timestamp} to {(self.start_date + timedelta(days=self.days)).date()}")
         print(f"  Interval: {self.interval_minutes} minutes")
         print(f"  Machines: {self.num_machines}")
-        print(f"  Total data points: {num_intervals * self.num_machines:,}")
+        print(f"  Total data points: {(num_intervals - first_interval) * self.num_machines:,}")
+        print(f"  Engine: {self.engine} ({self.workers} worker{'s' if self.workers > 1 else ''})")
+        print(f"  Seed: {self.seed}")
+        
+        # Chunk boundaries follow the hourly RNG blocks, so the output is
+        # identical for a given seed regardless of chunking and worker count
+        ranges = aligned_ranges(first_interval, num_intervals, intervals_per_chunk, self.intervals_per_block)
+        if self.workers > 1:
+            chunks = ordered_parallel_map(_generate_range_in_worker, ranges, self.workers,
+                                          initializer=_init_worker, initargs=(self,))
+        else:
+            chunks = (self.generate_range(start, stop) for start, stop in ranges)
+        
+        for (start, stop), chunk in zip(ranges, chunks):
+            yield chunk
+            progress = (stop - first_interval) / max(1, num_intervals - first_interval) * 100
+            print(f"  Progress: {progress:.1f}%", end='\r')
         
-        for i in range(num_intervals):
+        print("  Progress: 100.0%")
+    
+    def generate_range(self, start, stop):
+        """Generate intervals [start, stop) with the configured engine"""
+        if self.engine == 'vectorized':
+            return self._generate_vectorized(start, stop)
+        return self._generate_loop(start, stop)
+    
+    def _block_rng(self, block):
+        """Random stream of one hourly block of the simulated time axis"""
+        return stream_rng(self.seed, STREAM_DATA, block)
+    
+    def _block_draws(self, start, stop, n_machines):
+        """Random draws for intervals [start, stop), taken block by block"""
+        first_block = start // self.intervals_per_block
+        last_block = (stop - 1) // self.intervals_per_block
+        draws = {key: [] for key in ('temperature', 'weekend', 'load', 'standby', 'cleaning',
+                                     'noise', 'anomaly', 'anomaly_type')}
+        for block in range(first_block, last_block + 1):
+            rng = self._block_rng(block)
+            size = self.intervals_per_block
+            shape = (size, n_machines)
+            draws['temperature'].append(rng.uniform(-2.5, 2.5, size))
+            draws['weekend'].append(rng.random(shape))
+            draws['load'].append(rng.random(shape))
+            draws['standby'].append(rng.uniform(0, 0.1, shape))
+            draws['cleaning'].append(rng.random(shape))
+            draws['noise'].append(rng.uniform(0, 0.1, shape))
+            draws['anomaly'].append(rng.random(shape))
+            draws['anomaly_type'].append(rng.integers(0, 3, shape))
+        
+        offset = start - first_block * self.intervals_per_block
+        return {key: np.concatenate(parts)[offset:offset + stop - start] for key, parts in draws.items()}
+    
+    def _generate_loop(self, start, stop):
+        """Reference engine: one Python iteration per interval and machine"""
+        data = []
+
+        for i in range(start, stop):
+            if i == start or i % self.intervals_per_block == 0:
+                self.rng = self._block_rng(i // self.intervals_per_block)
             timestamp = self.start_date + timedelta(minutes=i * self.interval_minutes)
             temperature = self._calculate_temperature(timestamp)
             days_elapsed = (timestamp - self.start_date).days
@@ -272,7 +584,7 @@ class EnergyDataGenerator:
                 
                 # Check for anomaly
                 is_anomaly = False
-                if self.include_anomalies and np.random.random() < self.anomaly_rate:
+                if self.include_anomalies and self.rng.random() < self.anomaly_rate:
                     consumption = self._add_anomaly(consumption, machine)
                     is_anomaly = True
                 
@@ -303,48 +615,144 @@ class EnergyDataGenerator:
                     'month': timestamp.month,
                     'anomaly': is_anomaly
                 })
-            
-            # Progress indicator
-            if (i + 1) % 1000 == 0:
-                progress = (i + 1) / num_intervals * 100
-                print(f"  Progress: {progress:.1f}%", end='\r')
-        
-        print(f"  Progress: 100.0%")
         
         df = pd.DataFrame(data)
         return df
-    
-    def save(self, df, filename='energy_data.csv'):
-        """Save the generated data to CSV"""
-        df.to_csv(filename, index=False)
-        print(f"\n✓ Data saved to: {filename}")
-        
-        # Print statistics
-        print("\n" + "="*60)
-        print("DATASET STATISTICS")
-        print("="*60)
-        print(f"Total records: {len(df):,}")
-        print(f"Date range: {df['timestamp'].min()} to {df['timestamp'].max()}")
-        print(f"Machines: {df['machine_id'].nunique()}")
-        print(f"Anomalies: {df['anomaly'].sum():,} ({df['anomaly'].sum()/len(df)*100:.2f}%)")
-        
-        if 'is_holiday' in df.columns:
-            holidays_count = df[df['is_holiday']].groupby('timestamp').first()
-            print(f"Holidays/Shutdowns: {len(holidays_count)} days")
-        
-        if 'is_maintenance' in df.columns:
-            maint_count = df['is_maintenance'].sum()
-            print(f"Maintenance periods: {maint_count:,} data points")
-        
-        print(f"\nConsumption statistics (kWh):")
-        print(df.groupby('machine_id')['consumption_kwh'].describe().round(2))
-        
+
+    def _generate_vectorized(self, start, stop):
+        """Array engine: builds the interval x machine grid with NumPy"""
+        num_intervals = stop - start
+        n_machines = len(self.machine_configs)
+        shape = (num_intervals, n_machines)
+
+        draws = self._block_draws(start, stop, n_machines)
+
+        # Time axis and calendar masks (one entry per interval)
+        timestamps = self.start_date + pd.to_timedelta(
+            np.arange(start, stop, dtype=np.int64) * self.interval_minutes, unit='m')
+        hour = timestamps.hour.values.astype(np.int64)
+        day_of_week = timestamps.dayofweek.values.astype(np.int64)
+        month = timestamps.month.values.astype(np.int64)
+        days_elapsed = (timestamps - self.start_date).days.values.astype(np.int64)
+        is_weekend = day_of_week >= 5
+        is_holiday = self.calendar.closed_mask(timestamps)
+
+        temperature = (15 + 10 * np.sin((timestamps.dayofyear.values / 365) * 2 * np.pi)
+                       + draws['temperature'])
         if self.include_seasonal_variation:
-            print(f"\nSeasonal variation:")
-            monthly_avg = df.groupby('month')['seasonal_factor'].mean()
-            print(monthly_avg.round(3))
+            seasonal_factor = self._get_seasonal_factors(timestamps)
+        else:
+            seasonal_factor = np.ones(num_intervals)
+
+        # Machine parameters (one entry per machine)
+        base_load = self.fleet['base_load']
+        peak_load = self.fleet['peak_load']
+        load_span = peak_load - base_load
+
+        # Maintenance windows: [date, date + duration_hours) per machine
+        is_maintenance = self.calendar.maintenance_grid(timestamps, self.fleet['id'])
+
+        # Shift masks, including the random weekend shifts (20% chance)
+        is_working = ((hour >= 6) & (hour < 22) & ~is_weekend & ~is_holiday)[:, None]
+        weekend_window = (is_weekend & (hour >= 6) & (hour < 14))[:, None]
+        is_working = is_working | (weekend_window & (draws['weekend'] < 0.2))
+
+        # Production load: peak hours (9-17) vs. ramp up/down periods
+        peak_hours = ((hour >= 9) & (hour < 17))[:, None]
+        load_factor = np.where(peak_hours, 0.7 + 0.3 * draws['load'], 0.3 + 0.2 * draws['load'])
+        load_factor *= seasonal_factor[:, None]
+        consumption = base_load + load_span * load_factor
+
+        # Standby mode with occasional late-night maintenance or cleaning
+        standby = base_load * (0.2 + draws['standby'])
+        standby = np.where(draws['cleaning'] < 0.05, base_load * 0.5, standby)
+        consumption = np.where(is_working, consumption, standby)
+
+        # Noise and degradation
+        consumption *= 0.95 + draws['noise']
+        if self.include_degradation:
+            consumption *= (1 + self.degradation_rate * days_elapsed)[:, None]
+
+        # Closed (holiday) and maintenance rows bypass noise and degradation
+        consumption = np.where(is_holiday[:, None], base_load * 0.1, consumption)
+        consumption = np.where(is_maintenance, base_load * 0.05, consumption)
+        is_working = is_working & ~is_holiday[:, None] & ~is_maintenance
+
+        # Anomalies: overload, failure, partial failure with equal probability
+        is_anomaly = np.zeros(shape, dtype=bool)
+        if self.include_anomalies:
+            is_anomaly = draws['anomaly'] < self.anomaly_rate
+            anomaly_type = draws['anomaly_type']
+            anomaly_values = np.select(
+                [anomaly_type == 0, anomaly_type == 1],
+                [np.broadcast_to(peak_load * 1.5, shape), np.broadcast_to(base_load * 0.1, shape)],
+                np.broadcast_to(peak_load * 0.3, shape))
+            consumption = np.where(is_anomaly, anomaly_values, consumption)
+
+        baseline_consumption = base_load + load_span * 0.8
+        with np.errstate(divide='ignore', invalid='ignore'):
+            efficiency = np.where(consumption > 0, baseline_consumption / consumption, 1.0)
+        efficiency = np.minimum(efficiency, 1.0)
+
+        def per_row(values):
+            return np.repeat(values, n_machines)
+
+        def per_machine(key):
+            return np.tile(self.fleet[key], num_intervals)
+
+        df = pd.DataFrame({
+            'timestamp': per_row(timestamps.values),
+            'machine_id': per_machine('id'),
+            'machine_name': per_machine('name'),
+            'machine_type': per_machine('type'),
+            'consumption_kwh': np.round(consumption.ravel(), 3),
+            'efficiency': np.round(efficiency.ravel(), 3),
+            'days_in_operation': per_row(days_elapsed),
+            'seasonal_factor': per_row(np.round(seasonal_factor, 3)),
+            'temperature_celsius': per_row(np.round(temperature, 1)),
+            'is_working_hours': is_working.ravel(),
+            'is_weekend': per_row(is_weekend),
+            'is_holiday': per_row(is_holiday),
+            'is_maintenance': is_maintenance.ravel(),
+            'hour': per_row(hour),
+            'day_of_week': per_row(day_of_week),
+            'month': per_row(month),
+            'anomaly': is_anomaly.ravel()
+        })
+
+        return df
+
+    def save(self, data, filename='energy_data.csv', output_format='csv', append=False):
+        """Save the generated data to CSV, Parquet or Feather
+        
+        `data` is either a DataFrame or an iterable of DataFrame chunks (see
+        iter_chunks); chunks are appended as they arrive and the statistics
+        are accumulated incrementally, so memory is bounded by the chunk size.
+        Parquet and Feather output is a dataset directory partitioned by
+        month and machine. With append=True, CSV rows are appended to an
+        existing file without repeating the header.
+        """
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        stats = DatasetStatistics()
+        
+        if output_format == 'csv':
+            with open(filename, 'a' if append else 'w', newline='') as f:
+                for i, chunk in enumerate(chunks):
+                    chunk.to_csv(f, header=(i == 0 and not append), index=False)
+                    stats.update(chunk)
+        else:
+            filename = columnar_output_path(filename, output_format)
+            writer = ColumnarDatasetWriter(filename, output_format, COLUMNAR_SCHEMA, ['month', 'machine_id'])
+            try:
+                for chunk in chunks:
+                    writer.write(chunk)
+                    stats.update(chunk)
+            finally:
+                writer.close()
+        print(f"\n✓ Data saved to: {filename}")
         
-        print("="*60)
+        stats.report(include_seasonal_variation=self.include_seasonal_variation)
+        return stats
     
     def preview(self, df, n_rows=10):
         """Display a preview of the data"""
@@ -355,6 +763,87 @@ class EnergyDataGenerator:
         print("="*60)
 
 
+def resume_settings(filename):
+    """Recover the run layout of an existing CSV dataset from its first and last rows"""
+    first, tail = read_csv_edges(filename)
+    start_date = first['timestamp'].iloc[0]
+    last_timestamp = tail['timestamp'].iloc[-1]
+    step = sampling_step(tail)
+    interval_minutes = int(step / pd.Timedelta(minutes=1))
+    machine_ids = tail.loc[tail['timestamp'] == last_timestamp, 'machine_id'].tolist()
+    
+    first_interval = int((last_timestamp - start_date) / step) + 1
+    existing_days = -(-first_interval * interval_minutes // (24 * 60))  # ceil to whole days
+    
+    # Degradation is a function of days since the first row, so the tail must agree
+    expected_days = (last_timestamp - start_date).days
+    if tail['days_in_operation'].iloc[-1] != expected_days:
+        raise ValueError(f"{filename}: days_in_operation of the last row does not match its first timestamp")
+    
+    return {
+        'start_date': start_date,
+        'interval_minutes': interval_minutes,
+        'num_machines': len(machine_ids),
+        'existing_days': existing_days,
+        'first_interval': first_interval,
+        'last_timestamp': last_timestamp,
+    }
+
+
+_worker_generator = None
+
+
+def _init_worker(generator):
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _generate_range_in_worker(interval_range):
+    return _worker_generator.generate_range(*interval_range)
+
+
+def benchmark_engines(**generator_kwargs):
+    """Time the loop and vectorized engines on identical settings"""
+    timings = {}
+    for engine in ('loop', 'vectorized'):
+        generator = EnergyDataGenerator(engine=engine, **generator_kwargs)
+        started = time.perf_counter()
+        df = generator.generate()
+        timings[engine] = (time.perf_counter() - started, len(df))
+
+    print("\n" + "="*60)
+    print("ENGINE BENCHMARK")
+    print("="*60)
+    for engine, (elapsed, rows) in timings.items():
+        print(f"{engine:>10}: {elapsed:8.2f}s  {rows / elapsed:>12,.0f} rows/s")
+    print(f"   Speedup: {timings['loop'][0] / timings['vectorized'][0]:.1f}x")
+    print("="*60)
+    return timings
+
+
+def append_to(args, generator_kwargs):
+    """Generate only the interval range after the end of an existing dataset"""
+    if args.format != 'csv':
+        raise SystemExit("--append-to supports CSV datasets only")
+    
+    resume = resume_settings(args.append_to)
+    print(f"Appending {args.days} days to {args.append_to} (last row: {resume['last_timestamp']})")
+    if args.seed is None:
+        print("  Note: no --seed given; maintenance windows in the new range are drawn fresh")
+    
+    generator_kwargs.update(
+        start_date=resume['start_date'],
+        days=resume['existing_days'] + args.days,
+        interval_minutes=resume['interval_minutes'],
+        num_machines=resume['num_machines'],
+    )
+    generator = EnergyDataGenerator(engine=args.engine, workers=args.workers, **generator_kwargs)
+    chunks = generator.iter_chunks(args.chunk_rows, first_interval=resume['first_interval'])
+    generator.save(chunks, filename=args.append_to, append=True)
+    
+    print(f"\n✓ Appended to '{args.append_to}'.")
+
+
 def main():
     """Main function with CLI interface"""
     parser = argparse.ArgumentParser(
@@ -370,6 +859,27 @@ Examples:
   
   # Generate with custom anomaly rate and no maintenance
   python generate_energy_data.py --days 90 --anomaly-rate 0.05 --no-maintenance
+  
+  # Use the array-based engine and compare it against the loop
+  python generate_energy_data.py --days 365 --machines 20 --engine vectorized
+  python generate_energy_data.py --days 7 --machines 20 --benchmark
+  
+  # Stream a multi-year dataset to disk with bounded memory
+  python generate_energy_data.py --days 1095 --machines 20 --engine vectorized --stream
+  
+  # Compact partitioned Parquet dataset (energy_data.parquet/month=*/machine_id=*/)
+  python generate_energy_data.py --days 365 --engine vectorized --format parquet
+  
+  # Reproducible run sharded over 4 processes
+  python generate_energy_data.py --days 365 --engine vectorized --seed 42 --workers 4
+  
+  # Load-test fleet from a spec file, e.g. fleet.json:
+  #   {"machines": [{"type": "CNC", "name": "CNC Maschine", "count": 2000,
+  #                  "base_load": [14, 18], "peak_load": [42, 52]}, ...]}
+  python generate_energy_data.py --days 7 --engine vectorized --fleet fleet.json --stream
+  
+  # Extend an existing dataset by one more week
+  python generate_energy_data.py --append-to energy_data.csv --days 7 --seed 42
         """
     )
     
@@ -381,7 +891,10 @@ Examples:
                        choices=[1, 5, 10, 15, 30, 60],
                        help='Interval in minutes, default: 1')
     parser.add_argument('--machines', type=int, default=5,
-                       help='Number of machines (1-20), default: 5')
+                       help='Number of machines (the 20 default machines are cycled beyond 20), default: 5')
+    parser.add_argument('--fleet', type=str, default=None, metavar='SPEC',
+                       help='Fleet spec file (JSON/YAML/CSV) with machine templates and counts; '
+                            'overrides --machines')
     parser.add_argument('--no-anomalies', action='store_true',
                        help='Disable anomaly generation')
     parser.add_argument('--anomaly-rate', type=float, default=0.02,
@@ -398,11 +911,30 @@ Examples:
                        help='Output filename, default: energy_data.csv')
     parser.add_argument('--preview', type=int, default=10,
                        help='Number of preview rows, default: 10')
+    parser.add_argument('--engine', type=str, default='loop',
+                       choices=['loop', 'vectorized'],
+                       help='Generation engine, default: loop')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Time both engines with these settings and exit')
+    parser.add_argument('--stream', action='store_true',
+                       help='Write chunks to disk as they are generated (bounded memory)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                       help=f'Rows per generated chunk, default: {DEFAULT_CHUNK_ROWS}')
+    parser.add_argument('--format', type=str, default='csv',
+                       choices=['csv', 'parquet', 'feather'],
+                       help='Output format; parquet/feather write a dataset directory '
+                            'partitioned by month and machine, default: csv')
+    parser.add_argument('--append-to', type=str, default=None, metavar='FILE',
+                       help='Extend an existing CSV dataset by --days days; start date, interval '
+                            'and machines are read from the file (use the original --seed)')
+    parser.add_argument('--seed', type=int, default=None,
+                       help='Random seed for reproducible output, default: random')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Worker processes; output is identical for any count, default: 1')
     
     args = parser.parse_args()
     
-    # Create generator
-    generator = EnergyDataGenerator(
+    generator_kwargs = dict(
         start_date=args.start_date,
         days=args.days,
         interval_minutes=args.interval,
@@ -412,19 +944,41 @@ Examples:
         include_degradation=not args.no_degradation,
         degradation_rate=args.degradation_rate,
         include_seasonal_variation=not args.no_seasonal_variation,
-        include_maintenance_downtime=not args.no_maintenance
+        include_maintenance_downtime=not args.no_maintenance,
+        seed=args.seed,
+        fleet_spec=args.fleet
     )
     
-    # Generate data
-    df = generator.generate()
+    if args.benchmark:
+        benchmark_engines(**generator_kwargs)
+        return
+    
+    if args.append_to:
+        append_to(args, generator_kwargs)
+        return
     
-    # Preview
-    generator.preview(df, n_rows=args.preview)
+    # Create generator
+    generator = EnergyDataGenerator(engine=args.engine, workers=args.workers, **generator_kwargs)
+    output = args.output if args.format == 'csv' else columnar_output_path(args.output, args.format)
     
-    # Save
-    generator.save(df, filename=args.output)
+    if args.stream:
+        # Preview the first chunk, then stream everything to disk
+        chunks = generator.iter_chunks(args.chunk_rows)
+        first_chunk = next(chunks)
+        generator.preview(first_chunk, n_rows=args.preview)
+        generator.save(itertools.chain([first_chunk], chunks), filename=output,
+                       output_format=args.format)
+    else:
+        # Generate data
+        df = generator.generate(args.chunk_rows)
+        
+        # Preview
+        generator.preview(df, n_rows=args.preview)
+        
+        # Save
+        generator.save(df, filename=output, output_format=args.format)
     
-    print(f"\n✓ Generation complete! Use '{args.output}' for ML training.")
+    print(f"\n✓ Generation complete! Use '{output}' for ML training.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,494 @@
+"""
+Shared helpers for the energy data generators
+Seed handling, fleet specs, ordered multi-process generation and I/O
+"""
+
+import os
+import shutil
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+import numpy as np
+
+# Independent random streams derived from one run seed
+STREAM_DATA = 0
+STREAM_SCHEDULE = 1
+STREAM_FLEET = 2
+
+
+def resolve_seed(seed=None):
+    """Return the run entropy; a fresh one is drawn when no seed is given"""
+    return np.random.SeedSequence(seed).entropy
+
+
+def stream_rng(entropy, *key):
+    """Independent Generator for one stream/block of a seeded run
+
+    Blocks are fixed slices of the simulated time axis, so every block gets
+    the same random numbers no matter which process or shard generates it.
+    """
+    return np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=key))
+
+
+def aligned_ranges(start, stop, step, align):
+    """Split [start, stop) into ranges whose boundaries are multiples of `align`"""
+    step = max(align, step // align * align)
+    boundary = (start // align + 1) * align if start % align else start
+    ranges = []
+    if boundary > start:
+        ranges.append((start, min(boundary, stop)))
+    for lo in range(boundary, stop, step):
+        ranges.append((lo, min(lo + step, stop)))
+    return ranges
+
+
+def ordered_parallel_map(func, items, workers, initializer=None, initargs=()):
+    """Yield func(item) in input order from a process pool
+
+    At most 2 * workers tasks are in flight, so finished results never pile
+    up faster than the caller consumes them.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+COLUMNAR_FORMATS = {'parquet': 'parquet', 'feather': 'feather'}
+
+
+def columnar_output_path(output, fmt):
+    """Dataset directory for a columnar format, derived from a CSV-style name"""
+    root, ext = os.path.splitext(output)
+    if ext == '.csv':
+        return f"{root}.{COLUMNAR_FORMATS[fmt]}"
+    return output
+
+
+def _arrow_schema(pa, columns):
+    types = {
+        'timestamp': pa.timestamp('ms'),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'string': pa.string(),
+        'float32': pa.float32(),
+        'int8': pa.int8(),
+        'int16': pa.int16(),
+        'bool': pa.bool_(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+class ColumnarDatasetWriter:
+    """Append DataFrame chunks to a partitioned Parquet or Feather (Arrow IPC) dataset
+
+    `columns` is a list of (name, kind) pairs with kind one of timestamp,
+    category, string, float32, int8, int16 or bool. Every chunk is cast to
+    that explicit compact schema and split into hive partitions (e.g.
+    month=1/machine_id=M001/). Each partition writes to one open file and
+    its rows are buffered until a full row group of `row_group_size` rows,
+    so a partition is a few files of large row groups however small the
+    chunks are. Parquet files carry row-group min/max statistics, so readers
+    can prune partitions and row groups on timestamp or machine filters.
+
+    Chunks are expected in time order and to cover the whole fleet: a
+    partition missing from a chunk is complete and its file is closed. At
+    most `max_buffered_rows` rows are held back; beyond that the largest
+    buffers are written as shorter row groups. At most `max_open_files`
+    files are open at once: the least recently written partition is closed
+    and continues in a new part-N file, so large fleets stay within the
+    file descriptor limit. close() writes what is left.
+    """
+
+    def __init__(self, base_dir, fmt, columns, partition_cols, row_group_size=128 * 1024,
+                 max_buffered_rows=2_000_000, max_open_files=256):
+        try:
+            import pyarrow as pa
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError(f"{fmt} output requires pyarrow: pip install pyarrow")
+
+        if os.path.isfile(base_dir):
+            raise ValueError(f"{base_dir} is a file; {fmt} output is written as a dataset directory")
+        if os.path.isdir(base_dir):
+            shutil.rmtree(base_dir)
+
+        self._pa = pa
+        self.base_dir = base_dir
+        self.fmt = fmt
+        self.schema = _arrow_schema(pa, columns)
+        self.partition_cols = partition_cols
+        # Partition values live in the directory names, not in the files
+        self.file_columns = [name for name, _ in columns if name not in partition_cols]
+        self.file_schema = pa.schema([self.schema.field(name) for name in self.file_columns])
+        self.row_group_size = row_group_size
+        self.max_buffered_rows = max_buffered_rows
+        self.max_open_files = max(1, max_open_files)
+        self.chunks_written = 0
+        self.rows_written = 0
+        self.files_written = 0
+        self._buffers = {}  # partition values -> [tables], row count
+        self._writers = OrderedDict()  # partition values -> open file writer, oldest first
+        self._parts = {}    # partition values -> files opened so far
+
+    def write(self, df):
+        table = self._pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        groups = df.groupby(self.partition_cols, observed=True, sort=False).indices
+        partitions = {key if isinstance(key, tuple) else (key,): rows for key, rows in groups.items()}
+        for key in [key for key in self._writers if key not in partitions]:
+            self._close_partition(key)
+
+        for key, rows in partitions.items():
+            buffer = self._buffers.setdefault(key, [[], 0])
+            buffer[0].append(table.take(rows).select(self.file_columns))
+            buffer[1] += len(rows)
+            if buffer[1] >= self.row_group_size:
+                self._flush(key)
+        # Under memory pressure prefer partitions whose file is still open
+        buffered = sum(rows for _, rows in self._buffers.values())
+        for key in sorted(self._buffers, key=lambda key: (key in self._writers, self._buffers[key][1]),
+                          reverse=True):
+            if buffered <= self.max_buffered_rows // 2:
+                break
+            buffered -= self._buffers[key][1]
+            self._flush(key)
+        self.chunks_written += 1
+        self.rows_written += len(table)
+
+    def close(self):
+        for key in list(set(self._writers) | set(self._buffers)):
+            self._close_partition(key)
+
+    def _flush(self, key):
+        tables, rows = self._buffers.pop(key, ([], 0))
+        if not rows:
+            return
+        table = self._pa.concat_tables(tables).combine_chunks()
+        if self.fmt == 'parquet':
+            self._writer(key).write_table(table, row_group_size=self.row_group_size)
+        else:
+            self._writer(key).write_table(table, max_chunksize=self.row_group_size)
+
+    def _writer(self, key):
+        if key in self._writers:
+            self._writers.move_to_end(key)
+        else:
+            while len(self._writers) >= self.max_open_files:
+                # Buffered rows of the evicted partition go to its next part file
+                self._writers.popitem(last=False)[1].close()
+            directory = os.path.join(self.base_dir, *(f"{name}={quote(str(value), safe='')}"
+                                                      for name, value in zip(self.partition_cols, key)))
+            os.makedirs(directory, exist_ok=True)
+            part = self._parts.get(key, 0)
+            self._parts[key] = part + 1
+            path = os.path.join(directory, f"part-{part}.{COLUMNAR_FORMATS[self.fmt]}")
+            if self.fmt == 'parquet':
+                # Regular timestamps shrink to almost nothing with delta encoding,
+                # which excludes dictionary encoding for those columns
+                timestamps = [f.name for f in self.file_schema if self._pa.types.is_timestamp(f.type)]
+                self._writers[key] = self._pa.parquet.ParquetWriter(
+                    path, self.file_schema, compression='zstd', write_statistics=True,
+                    use_dictionary=[name for name in self.file_columns if name not in timestamps],
+                    column_encoding={name: 'DELTA_BINARY_PACKED' for name in timestamps})
+            else:
+                options = self._pa.ipc.IpcWriteOptions(compression='zstd')
+                self._writers[key] = self._pa.ipc.new_file(path, self.file_schema, options=options)
+            self.files_written += 1
+        return self._writers[key]
+
+    def _close_partition(self, key):
+        self._flush(key)
+        writer = self._writers.pop(key, None)
+        if writer is not None:
+            writer.close()
+
+
+def read_csv_edges(path, tail_bytes=1 << 20):
+    """Read the first data row and the last complete rows of a CSV file
+
+    Only the header line, the first row and the final `tail_bytes` are read,
+    so this is cheap even for multi-gigabyte files. Returns (first, tail) as
+    DataFrames.
+    """
+    import io
+    import pandas as pd
+
+    with open(path, 'rb') as f:
+        header = f.readline()
+        first_line = f.readline()
+        if not first_line.strip():
+            raise ValueError(f"{path} has no data rows to append to")
+
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(len(header), size - tail_bytes))
+        block = f.read()
+
+    lines = block.split(b'\n')
+    if size - tail_bytes > len(header):
+        lines = lines[1:]  # drop the partial first line of the tail block
+    tail_lines = b'\n'.join(line for line in lines if line.strip())
+
+    first = pd.read_csv(io.BytesIO(header + first_line), parse_dates=['timestamp'])
+    tail = pd.read_csv(io.BytesIO(header + tail_lines), parse_dates=['timestamp'])
+    return first, tail
+
+
+def sampling_step(tail):
+    """Interval between the last two distinct timestamps of a tail block"""
+    timestamps = tail['timestamp'].drop_duplicates().sort_values()
+    if len(timestamps) < 2:
+        raise ValueError("Need at least two timestamps in the file tail to infer the interval")
+    return timestamps.iloc[-1] - timestamps.iloc[-2]
+
+
+def load_fleet_spec(path):
+    """Load machine templates from a JSON, YAML or CSV fleet spec
+
+    JSON/YAML files hold a list of templates under `machines` (or the list
+    itself); CSV files hold one template per row. Every template has a
+    `count` plus generator-specific parameters. A parameter is either a
+    scalar or a [low, high] range sampled uniformly per machine (written
+    `low..high` in CSV). Mappings such as behaviour mixes are written
+    `normal:0.9;error:0.1` in CSV.
+    """
+    import json
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        import csv
+        with open(path, newline='') as f:
+            templates = [{key: _parse_csv_value(value) for key, value in row.items() if value not in (None, '')}
+                         for row in csv.DictReader(f)]
+    else:
+        with open(path) as f:
+            if ext in ('.yaml', '.yml'):
+                try:
+                    import yaml
+                except ImportError:
+                    raise ImportError("YAML fleet specs require PyYAML: pip install pyyaml")
+                spec = yaml.safe_load(f)
+            else:
+                spec = json.load(f)
+        templates = spec['machines'] if isinstance(spec, dict) else spec
+
+    for template in templates:
+        template['count'] = int(template.get('count', 1))
+    return templates
+
+
+def _parse_csv_value(value):
+    value = value.strip()
+    if ':' in value:
+        return {key.strip(): _parse_csv_value(item) for key, item in
+                (part.split(':', 1) for part in value.split(';') if part.strip())}
+    if '..' in value:
+        return [float(part) for part in value.split('..', 1)]
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def fleet_parameter(template, key, count, rng, default=None):
+    """Per-machine values of one template parameter (scalar or [low, high] range)"""
+    value = template.get(key, default)
+    if value is None:
+        raise ValueError(f"Fleet template {template.get('type', '?')!r} is missing {key!r}")
+    if isinstance(value, (list, tuple)):
+        low, high = value
+        return rng.uniform(low, high, count)
+    return np.full(count, float(value))
+
+
+def open_csv_output(path, append=False, compression=None):
+    """Open a text handle for CSV output, optionally gzip/zstd-compressed
+
+    The compression is taken from `compression` or else from the file
+    extension (.gz, .zst). Appending to a compressed file adds a new
+    compressed frame/member, which standard readers concatenate.
+    """
+    import gzip
+    import io
+
+    compression = compression or {'.gz': 'gzip', '.zst': 'zstd'}.get(os.path.splitext(path)[1])
+    mode = 'a' if append else 'w'
+    if compression == 'gzip':
+        return gzip.open(path, mode + 't', newline='', compresslevel=6)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd output requires zstandard: pip install zstandard")
+        raw = open(path, mode + 'b')
+        return io.TextIOWrapper(zstandard.ZstdCompressor(level=3).stream_writer(raw), newline='')
+    return open(path, mode, newline='')
+
+
+class BackgroundChunkWriter:
+    """Consume finished chunks from a bounded queue on a background thread
+
+    The producer keeps computing the next chunk while this thread formats and
+    writes the previous one. When the queue is full, put() blocks, which
+    bounds memory and applies backpressure. `sink(chunk)` does the actual
+    writing; errors raised there are re-raised in the producer.
+    """
+
+    _DONE = object()
+
+    def __init__(self, sink, queue_depth=4):
+        import queue
+        import threading
+
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=queue_depth)
+        self.queue_depth = queue_depth
+        self.error = None
+        self.chunks = 0
+        self.rows = 0
+        self.write_seconds = 0.0
+        self.producer_wait_seconds = 0.0
+        self.depth_samples = []
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, name='chunk-writer', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is self._DONE:
+                return
+            if self.error is not None:
+                continue  # drain so the producer never blocks forever
+            try:
+                started = time.perf_counter()
+                self.sink(chunk)
+                self.write_seconds += time.perf_counter() - started
+                self.chunks += 1
+                self.rows += len(chunk)
+            except Exception as e:
+                self.error = e
+
+    def put(self, chunk):
+        if self.error is not None:
+            raise self.error
+        self.depth_samples.append(self.queue.qsize())
+        started = time.perf_counter()
+        self.queue.put(chunk)
+        self.producer_wait_seconds += time.perf_counter() - started
+
+    def close(self):
+        self.queue.put(self._DONE)
+        self.thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        if self.error is not None:
+            raise self.error
+
+    def stats(self):
+        elapsed = getattr(self, 'elapsed', time.perf_counter() - self.started)
+        return {
+            'chunks': self.chunks,
+            'rows': self.rows,
+            'rows_per_second': self.rows / elapsed if elapsed > 0 else 0.0,
+            'writer_busy_percent': self.write_seconds / elapsed * 100 if elapsed > 0 else 0.0,
+            'producer_wait_seconds': self.producer_wait_seconds,
+            'mean_queue_depth': float(np.mean(self.depth_samples)) if self.depth_samples else 0.0,
+            'max_queue_depth': max(self.depth_samples, default=0),
+            'queue_capacity': self.queue_depth,
+        }
+
+
+def open_stream_target(target):
+    """Binary writer for a stream target
+
+    `target` is '-' for stdout, tcp://host:port, unix:///path/to/socket or a
+    filesystem path (typically a named pipe created with mkfifo). Socket and
+    pipe writes block when the reader falls behind, which is the backpressure
+    the streaming loop measures.
+    """
+    import socket
+    import sys
+
+    if target == '-':
+        return sys.stdout.buffer
+    if target.startswith('tcp://'):
+        host, port = target[len('tcp://'):].rsplit(':', 1)
+        sock = socket.create_connection((host, int(port)))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock.makefile('wb')
+    if target.startswith('unix://'):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(target[len('unix://'):])
+        return sock.makefile('wb')
+    return open(target, 'wb')
+
+
+class StreamEncoder:
+    """Encode DataFrame chunks as NDJSON or compact binary frames
+
+    NDJSON writes one JSON object per row with ISO timestamps. The binary
+    format starts with a header frame (b'EDG1', uint32 length, JSON with the
+    field layout and category dictionaries), followed by data frames made of a
+    uint32 row count and packed little-endian records. Timestamps are int64
+    milliseconds, category columns uint32 codes into the header dictionaries
+    and float32 columns float32; values missing from a dictionary are
+    rejected rather than wrapped. String columns are not streamed in binary.
+    `columns` uses the (name, kind) layout of ColumnarDatasetWriter.
+    """
+
+    def __init__(self, columns, fmt='ndjson', categories=None):
+        self.fmt = fmt
+        self.categories = {name: list(values) for name, values in (categories or {}).items()}
+        kinds = {'timestamp': '<i8', 'category': '<u4', 'float32': '<f4', 'int8': 'i1', 'int16': '<i2', 'bool': '?'}
+        self.columns = [(name, kind) for name, kind in columns if fmt == 'ndjson' or kind in kinds]
+        self.record = np.dtype([(name, kinds[kind]) for name, kind in self.columns]) if fmt == 'binary' else None
+
+    def header(self):
+        if self.fmt != 'binary':
+            return b''
+        import json
+        layout = json.dumps({
+            'fields': [[name, kind] for name, kind in self.columns],
+            'categories': self.categories,
+        }).encode()
+        return b'EDG1' + np.uint32(len(layout)).tobytes() + layout
+
+    def encode(self, df):
+        """Return (payload, offsets); rows a..b are payload[offsets[a]:offsets[b]]"""
+        if self.fmt == 'ndjson':
+            text = df[[name for name, _ in self.columns]].to_json(
+                orient='records', lines=True, date_format='iso', date_unit='ms')
+            payload = text.encode()
+            if not payload.endswith(b'\n'):
+                payload += b'\n'
+            ends = np.flatnonzero(np.frombuffer(payload, dtype=np.uint8) == ord('\n')) + 1
+            return payload, np.concatenate(([0], ends))
+
+        import pandas as pd
+        records = np.empty(len(df), dtype=self.record)
+        for name, kind in self.columns:
+            values = df[name].values
+            if kind == 'timestamp':
+                records[name] = values.astype('datetime64[ms]').astype(np.int64)
+            elif kind == 'category':
+                codes = pd.Categorical(values, categories=self.categories[name]).codes
+                if (codes < 0).any():
+                    unknown = pd.unique(values[codes < 0])[:5].tolist()
+                    raise ValueError(f"{name} values not in the stream header: {unknown}")
+                records[name] = codes
+            else:
+                records[name] = values
+        return records.tobytes(), np.arange(len(df) + 1) * self.record.itemsize
+
+    def frame(self, payload, offsets, a, b):
+        """Bytes to write for rows a..b of an encoded chunk"""
+        body = memoryview(payload)[offsets[a]:offsets[b]]
+        if self.fmt == 'binary':
+            return np.uint32(b - a).tobytes() + body.tobytes()
+        return body
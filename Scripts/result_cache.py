@@ -0,0 +1,110 @@
+"""
+Content-addressed cache of analyzer results
+Entries are keyed by a fingerprint of the input data, the detector, the
+machine and the parameters; each entry is one pickle file, and the least
+recently used entries are evicted once the cache outgrows its size limit
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'energy_analyzer')
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+SAMPLE_BLOCKS = 16
+CACHE_VERSION = 1  # bump when a detector's output changes for the same input and parameters
+
+
+def input_fingerprint(path, blocks=SAMPLE_BLOCKS, block_size=1 << 16):
+    """Hash of the size, mtime and evenly spaced sample blocks of a file
+
+    For a directory (a partitioned Parquet/Feather dataset) every file
+    contributes its relative path, size and mtime, and the sample blocks are
+    spread over the files. The last block of each file is always included,
+    so appended rows change the fingerprint even between sample points.
+    """
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        files = [path]
+    per_file = max(1, blocks // max(1, len(files)))
+    digest = hashlib.sha1()
+    for name in files:
+        stat = os.stat(name)
+        digest.update(f"{os.path.relpath(name, path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        with open(name, 'rb') as f:
+            for offset in [stat.st_size * k // per_file for k in range(per_file)] + [stat.st_size - block_size]:
+                f.seek(max(0, offset))
+                digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Detector results on disk, one pickle per key
+
+    get() refreshes an entry's mtime, which is the recency evict() goes by.
+    With refresh, lookups miss but results are still stored, replacing the
+    old entries.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, refresh=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(fingerprint, detector, machine=None, **params):
+        payload = {'version': CACHE_VERSION, 'input': fingerprint, 'detector': detector, 'machine': machine,
+                   'params': params}
+        return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        path = self.path(key)
+        value = None
+        if not self.refresh and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+                os.utime(path)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        with open(f"{path}.{os.getpid()}.tmp", 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes; returns how many"""
+        if not os.path.isdir(self.directory):
+            return 0
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,113 @@
+"""
+Rolling-window features shared by the per-machine detectors
+Trailing mean, std, min/max and deviation (pandas rolling with
+min_periods=1) from cumulative sums and sliding min/max filters over
+contiguous arrays, cached per (machine, column, window)
+"""
+
+import numpy as np
+
+STATISTICS = ('mean', 'std', 'min', 'max', 'deviation')
+
+
+def trailing_stats(values, window, statistics=STATISTICS, first=0):
+    """Statistics of the trailing `window` values at positions first..end of `values`
+
+    Values before `first` only fill the windows (the tail of a previous
+    chunk). Windows shorter than `window` at the start use what is there;
+    std needs two values and is NaN before that. One pass of cumulative sums
+    serves mean, std and deviation; min/max use sliding filters. Expects
+    finite values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = {}
+    if n == 0:
+        return {name: values[first:] for name in statistics}
+
+    if {'mean', 'std', 'deviation'} & set(statistics):
+        # Centre before the cumulative sums to limit cancellation. Window sums
+        # are differences of contiguous cumsum slices; only the first
+        # window - 1 windows are truncated, so only they need their own count.
+        # Buffers are reused in place: on long machines, fresh temporaries
+        # cost as much as the arithmetic
+        offset = values.mean()
+        centered = values - offset
+        short = max(0, min(window - 1, n) - first)
+        counts = np.arange(first + 1, first + 1 + short, dtype=np.float64)
+        cs = np.zeros(n + 1)
+
+        def window_sums(x):
+            np.cumsum(x, out=cs[1:])
+            sums = cs[first + 1:].copy()
+            sums[short:] -= cs[first + 1 + short - window:n + 1 - window]
+            return sums
+
+        sums = window_sums(centered)
+        mean = sums / window
+        mean[:short] = sums[:short] / counts
+        mean += offset
+        if 'mean' in statistics:
+            out['mean'] = mean
+        if 'deviation' in statistics:
+            out['deviation'] = np.abs(np.subtract(values[first:], mean))
+        if 'std' in statistics:
+            sums *= sums
+            sums[short:] /= window
+            sums[:short] /= counts
+            np.multiply(centered, centered, out=centered)
+            var = window_sums(centered)
+            var -= sums
+            with np.errstate(invalid='ignore', divide='ignore'):
+                var[short:] /= window - 1
+                var[:short] /= counts - 1
+            np.maximum(var, 0.0, out=var)
+            std = np.sqrt(var, out=var)
+            std[:short][counts < 2] = np.nan
+            if window < 2:
+                std[:] = np.nan
+            out['std'] = std
+
+    # Repeating the first value in front leaves every truncated window's
+    # min/max unchanged; the filter centred at i + window // 2 then covers
+    # exactly the trailing window of i
+    if 'min' in statistics or 'max' in statistics:
+        from scipy import ndimage
+
+        padded = np.concatenate((np.full(window - 1, values[0]), values))
+        for name, sliding in (('min', ndimage.minimum_filter1d), ('max', ndimage.maximum_filter1d)):
+            if name in statistics:
+                out[name] = sliding(padded, window)[window // 2 + first:window // 2 + n]
+    return out
+
+
+class FeatureEngine:
+    """Rolling features computed once per (machine, column, window) and reused
+
+    Each detector asks for the statistics it needs; the first request of a
+    key computes them, later requests (from any detector) only compute the
+    statistics that are still missing.
+    """
+
+    def __init__(self):
+        self.cache = {}
+
+    def rolling(self, machine_id, data, column, window, statistics=STATISTICS):
+        entry = self.cache.setdefault((machine_id, column, window), {})
+        missing = [name for name in statistics if name not in entry]
+        if missing:
+            entry.update(trailing_stats(np.asarray(data[column]), window, missing))
+        return {name: entry[name] for name in statistics}
+
+    def compute(self, machine_id, data, windows, statistics=STATISTICS):
+        """Features of several columns at once: {column: [window, ...]} -> {(column, window): {statistic: array}}"""
+        return {(column, window): self.rolling(machine_id, data, column, window, statistics)
+                for column, sizes in windows.items() for window in sizes}
+
+    def clear(self, machine_id=None):
+        """Drop the cached features of one machine, or all of them"""
+        if machine_id is None:
+            self.cache.clear()
+        else:
+            for key in [key for key in self.cache if key[0] == machine_id]:
+                del self.cache[key]
@@ -0,0 +1,124 @@
+"""
+Spectral analysis of the current signal
+Time-resolved harmonics (Welch power spectra of fixed windows, THD against
+the load-cycle fundamental) and all-lag autocorrelation via the FFT, both
+batched across machines
+"""
+
+import numpy as np
+from scipy.fft import irfft, next_fast_len, rfft
+
+WINDOW_SECONDS = 86400   # one THD value per day
+SEGMENT_SECONDS = 14400  # Welch segments (>= 3 load cycles), 50% overlap
+HARMONIC_ORDERS = np.arange(2, 10)
+MAX_LAG = 2000           # autocorrelation lags, in samples
+
+
+def sample_interval(timestamps, limit=10_000):
+    """Median spacing of the first `limit` timestamps, in seconds"""
+    ms = np.asarray(timestamps[:limit], dtype='datetime64[ms]').astype(np.int64)
+    return float(np.median(np.diff(ms))) / 1000 if len(ms) > 1 else np.nan
+
+
+def window_sizes(interval, window=WINDOW_SECONDS, segment=SEGMENT_SECONDS):
+    """Window and Welch segment lengths in samples"""
+    window_n = max(4, int(round(window / interval)))
+    return window_n, min(window_n, max(4, int(round(segment / interval))))
+
+
+def window_spectra(values, window_n, segment_n, interval):
+    """Welch power spectral densities of consecutive windows
+
+    `values` is (machines, samples); every full window of `window_n` samples
+    is split into half-overlapping segments whose spectra are combined by
+    their median, which ignores the few segments that straddle a day/night
+    load step. All real FFTs run in one call. Returns the frequencies and a
+    (machines, windows, bins) float32 array.
+    """
+    # scipy.signal takes about a second to import; cached runs never need it
+    from scipy.signal import welch
+
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    count = values.shape[1] // window_n
+    blocks = values[:, :count * window_n].reshape(values.shape[0], count, window_n)
+    freqs, psd = welch(blocks, fs=1.0 / interval, nperseg=segment_n, average='median', axis=-1)
+    return freqs, psd.astype(np.float32)
+
+
+def harmonic_content(freqs, psd):
+    """Fundamental, THD and harmonic amplitudes of power spectra
+
+    The fundamental is the strongest peak above the two lowest bins (the
+    slow load drift), searched only where its 9th harmonic still fits. Tone
+    powers are summed over the Hann main lobe (bin +/- 1). Works on any
+    leading shape of `psd`; returns fundamental frequency, THD in percent
+    and the amplitudes of HARMONIC_ORDERS, per spectrum.
+    """
+    psd = np.asarray(psd, dtype=np.float64)
+    df = freqs[1] - freqs[0]
+    top = max(3, (psd.shape[-1] - 2) // HARMONIC_ORDERS[-1])
+    f0 = 2 + np.argmax(psd[..., 2:top], axis=-1)
+
+    def tone_power(bins):
+        bins = np.minimum(bins, psd.shape[-1] - 2)
+        return sum(np.take_along_axis(psd, bins + d, axis=-1) for d in (-1, 0, 1)) * df
+
+    fundamental = tone_power(f0[..., None])[..., 0]
+    harmonics = tone_power(f0[..., None] * HARMONIC_ORDERS)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        thd = np.where(fundamental > 0, np.sqrt(harmonics.sum(axis=-1) / fundamental) * 100, 0.0)
+    return freqs[f0], thd, np.sqrt(2 * harmonics)
+
+
+def lag_sums(x, start, max_lag):
+    """Pair sums of a = x[t - k] and b = x[t] for every lag k = 0..max_lag
+
+    `x` is (rows, samples). Pairs run over t >= max(start, k), so values
+    before `start` only serve as the lagged side (the tail of a previous
+    chunk). Returns a (6, rows, max_lag + 1) array of n, sum a, sum b,
+    sum a^2, sum b^2 and sum ab; the sum ab of every lag comes from a single
+    real FFT (Wiener-Khinchin), the others from cumulative sums.
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    length = x.shape[1]
+    lags = np.arange(max_lag + 1)
+    nfft = next_fast_len(length + max_lag + 1)
+    cross = irfft(rfft(x[:, start:], nfft) * np.conj(rfft(x, nfft)), nfft)
+    sab = cross[:, (lags - start) % nfft]
+
+    lo = np.minimum(np.maximum(start, lags), length)
+    c1 = np.pad(np.cumsum(x, axis=1), ((0, 0), (1, 0)))
+    c2 = np.pad(np.cumsum(x * x, axis=1), ((0, 0), (1, 0)))
+    head = np.maximum(length - lags, 0)
+    n = np.broadcast_to((length - lo).astype(np.float64), sab.shape)
+    sa = c1[:, head] - c1[:, lo - np.minimum(lags, lo)]
+    sb = c1[:, [length]] - c1[:, lo]
+    saa = c2[:, head] - c2[:, lo - np.minimum(lags, lo)]
+    sbb = c2[:, [length]] - c2[:, lo]
+    return np.stack((n, sa, sb, saa, sbb, sab))
+
+
+def lag_correlation(sums):
+    """Pearson correlation per lag from lag_sums (pandas Series.autocorr)"""
+    n, sa, sb, saa, sbb, sab = sums
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (n * saa - sa * sa) * (n * sbb - sb * sb)
+        r = (n * sab - sa * sb) / np.sqrt(variance)
+    return np.where((n >= 2) & (variance > 0), r, np.nan)
+
+
+def autocorrelation(values, max_lag=MAX_LAG):
+    """Autocorrelation at lags 0..max_lag of each row of a (machines, samples) array"""
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    centered = values - values.mean(axis=1, keepdims=True)
+    return lag_correlation(lag_sums(centered, 0, min(max_lag, values.shape[1])))
+
+
+def dominant_periods(acf, interval, count=3, min_height=0.1):
+    """Strongest local maxima of an autocorrelation function as periods"""
+    from scipy.signal import find_peaks
+
+    acf = np.nan_to_num(np.asarray(acf)[1:], nan=-1.0)
+    peaks, _ = find_peaks(acf, height=min_height, prominence=0.02)
+    peaks = peaks[np.argsort(acf[peaks])[::-1][:count]]
+    return [{'lag': int(k + 1), 'period_s': (k + 1) * interval, 'autocorrelation': float(acf[k])} for k in peaks]
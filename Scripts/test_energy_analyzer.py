@@ -0,0 +1,204 @@
+"""
+energy_analyzer.py on a small generated fleet: every way of running the
+detectors (in memory, out-of-core, incremental, fleet-wide, cached, from a
+columnar dataset) must agree, and the numeric building blocks must match
+the pandas definitions they replace
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from energy_analyzer import MACHINE_DETECTORS, REFERENCE_MACHINES, EnergyMLAnalyzer
+from energy_data_generator import EnergyDataGenerator, append_to
+from energy_streaming import LagCorrelation, RollingWindow
+from fleet_matrix import FleetMatrix
+from result_cache import ResultCache
+from rolling_features import FeatureEngine, trailing_stats
+from spectral_analysis import autocorrelation
+
+# 16 machines, so every reference machine up to Machine_15 exists
+MACHINES = 16
+INTERVAL = 60
+SEED = 7
+RUN_OPTIONS = ('all_machines', 'workers', 'checkpoint', 'threads')
+
+
+def generate(path, days=2, output_format='csv'):
+    generator = EnergyDataGenerator(MACHINES, days, INTERVAL, seed=SEED)
+    return generator.generate_data(str(path), output_format=output_format)
+
+
+def analyze(data_file, **options):
+    run = {name: options.pop(name) for name in RUN_OPTIONS if name in options}
+    analyzer = EnergyMLAnalyzer(str(data_file), chunk_size=5000, **options)
+    analyzer.run_all_analyses(**run)
+    return analyzer.results
+
+
+def assert_close(actual, expected, path='results'):
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys(), path
+        for key in expected:
+            assert_close(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, (list, tuple)):
+        assert len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_close(a, e, f"{path}[{i}]")
+    elif isinstance(expected, (float, np.floating)):
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-12, nan_ok=True), path
+    else:
+        assert actual == expected, path
+
+
+@pytest.fixture(scope='module')
+def data_file(tmp_path_factory):
+    return generate(tmp_path_factory.mktemp('fleet') / 'data.csv')
+
+
+@pytest.fixture(scope='module')
+def reference(data_file):
+    return analyze(data_file, threads=1)
+
+
+def test_out_of_core_matches_in_memory(data_file, reference):
+    assert_close(analyze(data_file, out_of_core=True), reference)
+
+
+def test_concurrent_detectors_match_sequential(data_file, reference):
+    assert_close(analyze(data_file, threads=2), reference)
+
+
+def test_all_machines_match_reference_machines(data_file, reference):
+    fleet = analyze(data_file, all_machines=True, workers=1)
+
+    assert len(fleet['machines']) == MACHINES
+    assert_close(fleet['peak_load_optimization'], reference['peak_load_optimization'])
+    for name, machine_id in REFERENCE_MACHINES.items():
+        key = MACHINE_DETECTORS[name][1]
+        assert_close(dict(fleet['machines'][machine_id][key], machine_id=machine_id), reference[key], key)
+
+
+def test_fleet_modes_agree(data_file):
+    single = analyze(data_file, all_machines=True, workers=1)
+
+    assert_close(analyze(data_file, all_machines=True, workers=2), single)
+    assert_close(analyze(data_file, all_machines=True, out_of_core=True), single)
+
+
+def test_incremental_run_matches_full_stream(tmp_path):
+    data_file = generate(tmp_path / 'data.csv', days=1)
+    checkpoint = str(tmp_path / 'results.checkpoint.pkl')
+    analyze(data_file, out_of_core=True, checkpoint=checkpoint)
+    append_to(data_file, 1, seed=SEED)
+
+    resumed = analyze(data_file, out_of_core=True, checkpoint=checkpoint)
+    full = analyze(data_file, out_of_core=True)
+
+    # Resumed runs score the new rows with the model fitted on the first day
+    for results in (resumed, full):
+        del results['voltage_anomalies']
+    assert_close(resumed, full)
+
+
+def test_cache_hit_returns_same_results(tmp_path, data_file, reference):
+    analyze(data_file, cache=ResultCache(str(tmp_path)))
+    cache = ResultCache(str(tmp_path))
+    cached = analyze(data_file, cache=cache)
+
+    assert (cache.hits, cache.misses) == (len(reference), 0)
+    assert_close(cached, reference)
+
+
+def test_cache_misses_after_input_edit(tmp_path, data_file, reference):
+    edited = tmp_path / 'data.csv'
+    df = pd.read_csv(data_file)
+    df.to_csv(edited, index=False)
+    analyze(edited, cache=ResultCache(str(tmp_path / 'cache')))
+
+    df.loc[df['machineId'] == 'Machine_12', 'current'] *= 1.1
+    df.to_csv(edited, index=False)
+    cache = ResultCache(str(tmp_path / 'cache'))
+    results = analyze(edited, cache=cache)
+
+    assert (cache.hits, cache.misses) == (0, len(reference))
+    assert_close(results, analyze(edited))
+    assert results['degradation'] != reference['degradation']
+
+
+def test_stored_anomaly_model_is_reused(tmp_path, data_file, reference):
+    model_dir = str(tmp_path / 'models')
+    first = analyze(data_file, detectors=['anomalies'], model_dir=model_dir)
+    (model_file,) = os.listdir(model_dir)
+    saved = os.path.getmtime(os.path.join(model_dir, model_file))
+    second = analyze(data_file, detectors=['anomalies'], model_dir=model_dir)
+
+    assert os.path.getmtime(os.path.join(model_dir, model_file)) == saved
+    assert_close(first, {'voltage_anomalies': reference['voltage_anomalies']})
+    assert_close(second, first)
+
+
+def test_columnar_input_matches_csv(tmp_path, reference):
+    pytest.importorskip('pyarrow')
+    dataset = generate(tmp_path / 'data.parquet', output_format='parquet')
+
+    assert_close(analyze(dataset, threads=1), reference)
+
+
+def test_trailing_stats_match_pandas_rolling():
+    values = np.random.default_rng(0).normal(50, 5, 500)
+    rolling = pd.Series(values).rolling(25, min_periods=1)
+    stats = trailing_stats(values, 25)
+
+    for name in ('mean', 'std', 'min', 'max'):
+        np.testing.assert_allclose(stats[name], getattr(rolling, name)().values, rtol=1e-9)
+    np.testing.assert_allclose(stats['deviation'], np.abs(values - rolling.mean().values), atol=1e-9)
+
+
+def test_rolling_window_matches_pandas_across_chunks():
+    # Chunks shorter than the window must still carry the whole tail
+    values = np.random.default_rng(1).normal(50, 5, 500)
+    window = RollingWindow(100)
+    means = [window.update(values[i:i + 30])[0] for i in range(0, len(values), 30)]
+
+    np.testing.assert_allclose(np.concatenate(means), pd.Series(values).rolling(100, min_periods=1).mean(),
+                               rtol=1e-9)
+
+
+def test_feature_engine_computes_each_statistic_once():
+    data = pd.DataFrame({'current': np.random.default_rng(2).normal(20, 2, 200)})
+    engine = FeatureEngine()
+    mean = engine.rolling('Machine_00', data, 'current', 10, ('mean',))['mean']
+    both = engine.rolling('Machine_00', data, 'current', 10, ('mean', 'std'))
+
+    assert both['mean'] is mean
+    np.testing.assert_allclose(both['std'][1:], data['current'].rolling(10, min_periods=1).std()[1:], rtol=1e-9)
+
+
+def test_autocorrelation_matches_pandas_autocorr():
+    values = np.cumsum(np.random.default_rng(3).normal(size=400))
+    acf = autocorrelation(values, max_lag=50)[0]
+    stream = LagCorrelation(50)
+    for i in range(0, len(values), 70):
+        stream.update(values[i:i + 70])
+
+    expected = [pd.Series(values).autocorr(lag) for lag in range(51)]
+    np.testing.assert_allclose(acf, expected, rtol=1e-9)
+    np.testing.assert_allclose(stream.result(), expected, rtol=1e-9)
+
+
+def test_fleet_matrix_correlation_matches_pandas():
+    rng = np.random.default_rng(4)
+    timestamps = pd.date_range('2024-01-01', periods=100, freq='min')
+    df = pd.DataFrame({
+        'timestamp': np.repeat(timestamps, 4),
+        'machineId': np.tile(['Machine_00', 'Machine_01', 'Machine_02', 'Machine_03'], 100),
+        'power': rng.normal(10, 2, 400).astype(np.float32).astype(np.float64),
+    }).drop(index=[5, 42, 43, 399])  # missing readings
+
+    matrix = FleetMatrix.from_frame(df, columns=['power'])
+    expected = df.pivot(index='timestamp', columns='machineId', values='power').corr()
+
+    np.testing.assert_allclose(matrix.corr('power'), expected.values, rtol=1e-9)
@@ -0,0 +1,65 @@
+"""
+Append mode of generate_energy_data.py and energy_data_generator.py:
+extending a dataset, once or repeatedly, must give the same file as
+generating the whole range at once
+"""
+
+import filecmp
+import os
+import subprocess
+import sys
+
+import pytest
+
+from energy_data_generator import EnergyDataGenerator
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(SCRIPTS, 'generate_energy_data.py')
+SENSOR_SCRIPT = os.path.join(SCRIPTS, 'energy_data_generator.py')
+
+
+def generate(engine, *args, cwd):
+    subprocess.run([sys.executable, SCRIPT, '--machines', '5', '--interval', '60', '--seed', '42',
+                    '--engine', engine, *args], cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+
+
+def generate_sensors(engine, *args, cwd):
+    subprocess.run([sys.executable, SENSOR_SCRIPT, '--machines', '13', '--interval', '600', '--seed', '42',
+                    '--engine', engine, *args], cwd=cwd, check=True, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL)
+
+
+@pytest.mark.parametrize('engine', ['loop', 'vectorized'])
+def test_append_across_year_boundary_matches_full_run(tmp_path, engine):
+    # 2024-09-25 + 20 days simulates 2024 only; the append reaches into 2025,
+    # whose maintenance windows must not move those of 2024
+    generate(engine, '--start-date', '2024-09-25', '--days', '20', '--output', 'appended.csv', cwd=tmp_path)
+    generate(engine, '--append-to', 'appended.csv', '--days', '100', cwd=tmp_path)
+    generate(engine, '--start-date', '2024-09-25', '--days', '120', '--output', 'full.csv', cwd=tmp_path)
+
+    assert filecmp.cmp(tmp_path / 'appended.csv', tmp_path / 'full.csv', shallow=False)
+
+
+@pytest.mark.parametrize('engine', ['loop', 'vectorized'])
+def test_repeated_appends_match_full_run(tmp_path, engine):
+    generate(engine, '--start-date', '2024-12-20', '--days', '5', '--output', 'appended.csv', cwd=tmp_path)
+    generate(engine, '--append-to', 'appended.csv', '--days', '10', cwd=tmp_path)
+    generate(engine, '--append-to', 'appended.csv', '--days', '10', cwd=tmp_path)
+    generate(engine, '--start-date', '2024-12-20', '--days', '25', '--output', 'full.csv', cwd=tmp_path)
+
+    assert filecmp.cmp(tmp_path / 'appended.csv', tmp_path / 'full.csv', shallow=False)
+
+
+@pytest.mark.parametrize('engine', ['loop', 'vectorized'])
+def test_sensor_repeated_appends_keep_degradation_slope(tmp_path, engine):
+    # Machine_12 degrades over the original 5 days; appends continue that
+    # slope instead of re-stretching it over the grown file
+    generate_sensors(engine, '--start', '2024-01-01', '--days', '5', '--output', 'appended.csv', cwd=tmp_path)
+    generate_sensors(engine, '--append-to', 'appended.csv', '--days', '3', cwd=tmp_path)
+    generate_sensors(engine, '--append-to', 'appended.csv', '--days', '3', cwd=tmp_path)
+
+    full = EnergyDataGenerator(13, 11, 600, '2024-01-01', seed=42, engine=engine)
+    full.degradation_horizon = full.samples_per_day * 5
+    full.generate_data(str(tmp_path / 'full.csv'))
+
+    assert filecmp.cmp(tmp_path / 'appended.csv', tmp_path / 'full.csv', shallow=False)